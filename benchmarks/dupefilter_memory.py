@@ -0,0 +1,79 @@
+# benchmarks/dupefilter_memory.py
+"""
+Memory per million URLs and time per request for CompactDupeFilter (hash set
+and Bloom modes) against Scrapy's stock RFPDupeFilter.
+
+    python benchmarks/dupefilter_memory.py [--urls 200000]
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+
+from scrapy.dupefilters import RFPDupeFilter
+from scrapy.http import Request
+from scrapy.utils.test import get_crawler
+
+from greek_scraper.dupefilters import CompactDupeFilter
+
+
+def make_urls(n):
+    # Shaped like a 5000-domain .gr crawl: many hosts, paths, a query string on some pages.
+    for i in range(n):
+        host = f"site{i % 5000}.gr"
+        if i % 3:
+            yield f"https://{host}/category/{i % 97}/article-{i}.html"
+        else:
+            yield f"https://www.{host}/search?q=ειδήσεις&page={i}&sort=date"
+
+
+def feed(dupefilter, n, batch=10000):
+    """Feeds n unique URLs; returns (seconds spent in request_seen, duplicates reported)."""
+    seen = 0
+    elapsed = 0.0
+    urls = make_urls(n)
+    while True:
+        requests = [Request(u) for _, u in zip(range(batch), urls)]
+        if not requests:
+            return elapsed, seen
+        t0 = time.perf_counter()
+        for request in requests:
+            seen += dupefilter.request_seen(request)
+        elapsed += time.perf_counter() - t0
+
+
+def measure(name, build, n):
+    # Timing pass, without tracemalloc overhead.
+    dupefilter = build()
+    elapsed, false_dupes = feed(dupefilter, n)
+    dupes = sum(dupefilter.request_seen(Request(u)) for _, u in zip(range(1000), make_urls(n)))
+    del dupefilter
+
+    # Memory pass: whatever is still allocated once the requests are gone belongs to the filter.
+    gc.collect()
+    tracemalloc.start()
+    dupefilter = build()
+    feed(dupefilter, n)
+    gc.collect()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"{name:<24}{retained / n * 1e6 / 2**20:>12.1f} MB{elapsed / n * 1e6:>12.2f} us"
+          f"{false_dupes:>12}{dupes:>10}/1000")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--urls', type=int, default=200000)
+    args = parser.parse_args()
+
+    crawler = get_crawler()
+    print(f"{args.urls} URLs; memory is extrapolated to one million URLs")
+    print(f"{'dupefilter':<24}{'per 1M URLs':>15}{'per request':>15}{'false dup':>12}{'re-check':>15}")
+    measure('RFPDupeFilter (stock)', lambda: RFPDupeFilter.from_crawler(crawler), args.urls)
+    measure('CompactDupeFilter hash', lambda: CompactDupeFilter(mode='hashset'), args.urls)
+    measure('CompactDupeFilter bloom', lambda: CompactDupeFilter(mode='bloom', error_rate=0.001), args.urls)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+# benchmarks/encoding_detection.py
+"""
+Micro-benchmark for RobustEncodingMiddleware on Greek pages in legacy
+encodings (windows-1253, ISO-8859-7) and UTF-8, with and without charset
+declarations, against the previous decode/chardet/re-encode approach.
+
+    python benchmarks/encoding_detection.py [--pages 200] [--size 200000]
+"""
+import argparse
+import time
+from urllib.parse import urlparse
+
+import chardet
+from scrapy.http import HtmlResponse, Request
+
+from greek_scraper.middlewares import RobustEncodingMiddleware
+
+PARAGRAPH = (
+    "Η Ελλάδα είναι χώρα της νοτιοανατολικής Ευρώπης. Η Αθήνα είναι η πρωτεύουσα "
+    "και η μεγαλύτερη πόλη της χώρας. Οι ειδήσεις της ημέρας, ο καιρός και τα αθλητικά "
+    "ενημερώνονται συνεχώς από τη συντακτική ομάδα. "
+)
+
+# name -> (body encoding, Content-Type header, <meta> tag)
+CASES = {
+    'cp1253 header': ('cp1253', 'text/html; charset=windows-1253', ''),
+    'iso-8859-7 meta': ('iso-8859-7', 'text/html', '<meta charset="iso-8859-7">'),
+    'cp1253 http-equiv': ('cp1253', 'text/html',
+                          '<meta http-equiv="Content-Type" content="text/html; charset=windows-1253">'),
+    'cp1253 undeclared': ('cp1253', 'text/html', ''),
+    'cp1253 labelled utf-8': ('cp1253', 'text/html; charset=utf-8', ''),
+    'utf-8 undeclared': ('utf-8', 'text/html', ''),
+}
+
+
+def make_page(encoding, meta, size):
+    body = []
+    total = 0
+    while total < size:
+        body.append(f"<p>{PARAGRAPH}</p>")
+        total += len(body[-1])
+    html = f"<html><head>{meta}<title>Ειδήσεις</title></head><body>{''.join(body)}</body></html>"
+    return html.encode(encoding)
+
+
+def legacy_process(response):
+    """The middleware as it was: full decode, chardet over the whole body, re-encode."""
+    if not response.encoding or response.encoding.lower() not in ['utf-8', 'utf8']:
+        try:
+            decoded = response.body.decode('utf-8')
+        except UnicodeDecodeError:
+            detected = chardet.detect(response.body)['encoding'] or 'utf-8'
+            decoded = response.body.decode(detected, errors='replace')
+        return response.replace(body=decoded.encode('utf-8'), encoding='utf-8')
+    return response
+
+
+def new_process(middleware, response):
+    """The new middleware, running the threaded detection inline so its cost is counted."""
+    result = middleware.process_response(response.request, response, None)
+    if not isinstance(result, HtmlResponse):
+        encoding = middleware._detect(response.body[:middleware.detect_bytes])
+        result = middleware._detected(encoding, urlparse(response.url).netloc, response)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=200)
+    parser.add_argument('--size', type=int, default=200000, help='approximate page size in characters')
+    args = parser.parse_args()
+
+    print("Pages of one case share a host, so the per-host cache kicks in after the first page.")
+    print(f"{'case':<24}{'legacy ms/page':>16}{'new ms/page':>14}{'speedup':>10}  {'legacy ok':>9}  {'new ok':>6}")
+    for name, (encoding, content_type, meta) in CASES.items():
+        body = make_page(encoding, meta, args.size)
+        expected = body.decode(encoding)
+        responses = [
+            HtmlResponse(url=f'https://bench.gr/{i}', body=body, headers={'Content-Type': content_type},
+                         request=Request(f'https://bench.gr/{i}'))
+            for i in range(args.pages)
+        ]
+
+        t0 = time.perf_counter()
+        for response in responses:
+            legacy_result = legacy_process(response)
+            legacy_result.text
+        legacy = (time.perf_counter() - t0) / args.pages * 1000
+
+        middleware = RobustEncodingMiddleware()
+        t0 = time.perf_counter()
+        for response in responses:
+            result = new_process(middleware, response)
+            result.text
+        new = (time.perf_counter() - t0) / args.pages * 1000
+
+        print(f"{name:<24}{legacy:>16.2f}{new:>14.2f}{legacy / new:>9.1f}x  "
+              f"{str(text_ok(legacy_result, expected)):>9}  {str(text_ok(result, expected)):>6}")
+
+
+def text_ok(response, expected):
+    return response.text.count('Ελλάδα') == expected.count('Ελλάδα')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+# benchmarks/import_time.py
+"""
+Cold-start benchmark: how long `import greek_scraper` takes in a fresh
+interpreter with no GPU stack present, and how long the first text backend
+selection takes afterwards.
+
+    python benchmarks/import_time.py [--runs 10]
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+# Runs in a fresh interpreter. Setting sys.modules['cupy'] = None makes any
+# `import cupy` raise ImportError, exactly as on a worker without CUDA wheels.
+PROBE = r'''
+import json, sys, time
+sys.modules['cupy'] = None
+t0 = time.perf_counter()
+import greek_scraper
+t1 = time.perf_counter()
+from greek_scraper.backends import get_backend
+name, _ = get_backend('cuda')
+t2 = time.perf_counter()
+print(json.dumps({
+    'import_s': t1 - t0,
+    'first_backend_s': t2 - t1,
+    'backend': name,
+}))
+'''
+
+GPU_MODULES_PROBE = r'''
+import json, sys
+import greek_scraper
+print(json.dumps(sorted(m for m in ('cupy', 'numpy', 'greek_scraper.gpu_processor', 'greek_scraper.cpu_processor') if m in sys.modules)))
+'''
+
+
+def run_probe(source):
+    out = subprocess.run([sys.executable, '-c', source], capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    results = [run_probe(PROBE) for _ in range(args.runs)]
+    imports = [r['import_s'] * 1000 for r in results]
+    backends = [r['first_backend_s'] * 1000 for r in results]
+
+    print(f"import greek_scraper (no CuPy): median {statistics.median(imports):.1f} ms, "
+          f"min {min(imports):.1f} ms over {args.runs} runs")
+    print(f"first backend selection:        median {statistics.median(backends):.1f} ms "
+          f"-> fell back to '{results[0]['backend']}'")
+    print(f"text modules loaded at import:  {run_probe(GPU_MODULES_PROBE) or 'none'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+# benchmarks/link_extraction.py
+"""
+Link extraction on a link-heavy news-portal page: the previous per-anchor
+CSS selector / urljoin / Request approach against extract_links.
+
+    python benchmarks/link_extraction.py [--pages 50] [--anchors 3000]
+"""
+import argparse
+import gc
+import time
+from urllib.parse import urlparse
+
+import scrapy
+from scrapy.http import HtmlResponse
+from scrapy.utils.response import get_base_url
+
+from greek_scraper.links import extract_links
+
+
+def make_page(anchors):
+    # Menus and "related" boxes repeat the same articles; some links carry tracking
+    # params, point at images/PDFs or at other hosts.
+    parts = ['<html><head><title>Ειδήσεις</title></head><body>']
+    for i in range(anchors):
+        kind = i % 10
+        if kind < 5:
+            href = f"/eidiseis/arthro-{i % 400}.html"
+        elif kind == 5:
+            href = f"/eidiseis/arthro-{i % 400}.html?utm_source=facebook&utm_medium=social"
+        elif kind == 6:
+            href = f"/media/photo-{i}.jpg"
+        elif kind == 7:
+            href = f"https://www.facebook.com/sharer.php?u={i}"
+        elif kind == 8:
+            href = f"/kathgoria/{i % 30}/#comments"
+        else:
+            href = "javascript:void(0)"
+        parts.append(f'<a href="{href}">Τίτλος άρθρου {i}</a>')
+    parts.append('</body></html>')
+    return ''.join(parts).encode('utf-8')
+
+
+def old_parse(response, host):
+    requests = []
+    for link in response.css('a::attr(href)').getall():
+        try:
+            full_url = response.urljoin(link)
+            parsed = urlparse(full_url)
+            if parsed.scheme in ['http', 'https'] and parsed.netloc == host:
+                requests.append(scrapy.Request(full_url))
+        except Exception:
+            continue
+    return requests
+
+
+def new_parse(response, host):
+    links = extract_links(response.selector.root, get_base_url(response), host)
+    return [scrapy.Request(url) for url in links]
+
+
+def run(name, parse, body, pages):
+    gc.collect()
+    collections = sum(s['collections'] for s in gc.get_stats())
+    t0 = time.perf_counter()
+    for _ in range(pages):
+        # A fresh response per page, as in a crawl: the HTML is parsed every time.
+        response = HtmlResponse('https://www.example.gr/index.html', body=body, encoding='utf-8')
+        requests = parse(response, 'www.example.gr')
+    elapsed = time.perf_counter() - t0
+    collections = sum(s['collections'] for s in gc.get_stats()) - collections
+    print(f"{name:<18}{elapsed / pages * 1000:>10.2f} ms{len(requests):>12}{collections:>14}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=50)
+    parser.add_argument('--anchors', type=int, default=3000)
+    args = parser.parse_args()
+
+    body = make_page(args.anchors)
+    print(f"{args.anchors} anchors per page, {args.pages} pages")
+    print(f"{'approach':<18}{'per page':>13}{'requests':>12}{'gc passes':>14}")
+    run('css + urljoin', old_parse, body, args.pages)
+    run('extract_links', new_parse, body, args.pages)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,239 @@
+# benchmarks/mock_sites.py
+"""
+Synthetic Greek sites for the benchmark suite, served from local HTTP
+servers so crawls run offline and repeatably.
+
+Every site is a dict {path: (body bytes, Content-Type)} generated from a
+fixed seed. The same layout on disk (one directory per site, with a
+_headers.json mapping paths to Content-Type) is a recorded corpus: write the
+synthetic sites out with --write, or save real pages in that layout, and
+point the suite at it with --corpus.
+
+    python benchmarks/mock_sites.py --write corpus/ [--scale 1.0]
+    python benchmarks/mock_sites.py --serve [--corpus corpus/]
+"""
+import argparse
+import json
+import os
+import random
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = (
+    "Αθήνα Θεσσαλονίκη κυβέρνηση βουλή υπουργός οικονομία ανάπτυξη εκλογές δήμος περιφέρεια "
+    "σχολείο πανεπιστήμιο φοιτητές εκπαίδευση υγεία νοσοκομείο γιατρός ασθενείς εμβόλιο έρευνα "
+    "καιρός βροχή θερμοκρασία καλοκαίρι χειμώνας θάλασσα νησιά τουρισμός επισκέπτες ξενοδοχεία "
+    "ομάδα αγώνας πρωτάθλημα γκολ προπονητής παίκτες γήπεδο νίκη ήττα ισοπαλία "
+    "πολιτισμός θέατρο μουσική συναυλία βιβλίο ποίηση ιστορία μουσείο αρχαία μνημεία "
+    "τεχνολογία εταιρεία επενδύσεις αγορά τιμές πληθωρισμός μισθοί συντάξεις φόροι τράπεζα "
+    "ο η το οι τα του της των στο στη στην με για από και αλλά όμως ενώ όταν μετά πριν "
+    "σήμερα χθες αύριο νέα νέος μεγάλη μικρό σημαντική πρώτη τελευταία ελληνική δημόσια "
+    "ανακοίνωσε δήλωσε συζήτησε αποφάσισε ξεκίνησε ολοκληρώθηκε παρουσίασε αναμένεται"
+).split()
+
+ENGLISH = (
+    "the government announced new measures for the economy while the weather stays warm "
+    "and visitors arrive at the islands for the summer season with rising prices"
+).split()
+
+
+def sentence(rng, words=WORDS):
+    s = ' '.join(rng.choice(words) for _ in range(rng.randint(8, 20)))
+    return s[0].upper() + s[1:] + '.'
+
+
+def article(rng, paragraphs, words=WORDS):
+    return ''.join(f"<p>{' '.join(sentence(rng, words) for _ in range(rng.randint(3, 6)))}</p>"
+                   for _ in range(paragraphs))
+
+
+def page(title, body, links, meta='', lang='el'):
+    nav = ''.join(f'<li><a href="{href}">{text}</a></li>' for href, text in links)
+    return (f'<!DOCTYPE html><html lang="{lang}"><head>{meta}<title>{title}</title></head><body>'
+            f'<header><ul>{nav}</ul></header><article><h1>{title}</h1>{body}</article>'
+            f'<footer><a href="/about.html">Σχετικά</a> <a href="/static/logo.png">logo</a></footer>'
+            f'</body></html>')
+
+
+def link_graph(rng, n, fanout):
+    """A tree (so every page is reachable and the graph is deep) plus random cross links."""
+    links = []
+    for i in range(n):
+        children = [c for c in (2 * i + 1, 2 * i + 2) if c < n]
+        extra = rng.sample(range(n), min(n, fanout))
+        links.append(children + extra)
+    return links
+
+
+def news_site(rng, pages, encoding='utf-8', declare='meta', fanout=15, paragraphs=6):
+    """
+    `declare`: 'meta' (<meta charset>), 'header' (Content-Type charset),
+    'none' (the encoding has to be sniffed) or 'mixed' (alternating meta/none).
+    """
+    site = {}
+    graph = link_graph(rng, pages, fanout)
+    for i in range(pages):
+        mode = declare if declare != 'mixed' else ('meta', 'none')[i % 2]
+        meta = f'<meta charset="{encoding}">' if mode == 'meta' else ''
+        content_type = f'text/html; charset={encoding}' if mode == 'header' else 'text/html'
+        links = [(f'/arthro/{j}.html', f'Άρθρο {j}') for j in graph[i]]
+        links.append((f'/arthro/{i}.html?utm_source=rss', 'rss'))
+        html = page(f'Άρθρο {i}: {sentence(rng)}', article(rng, paragraphs), links, meta)
+        path = '/index.html' if i == 0 else f'/arthro/{i}.html'
+        site[path] = (html.encode(encoding, errors='xmlcharrefreplace'), content_type)
+    site['/about.html'] = (page('Σχετικά', article(rng, 2), [('/index.html', 'Αρχική')],
+                                f'<meta charset="{encoding}">').encode(encoding), 'text/html')
+    return site
+
+
+def large_pages_site(rng, pages, size):
+    site = {}
+    for i in range(pages):
+        body = []
+        total = 0
+        while total < size:
+            body.append(article(rng, 20))
+            total += len(body[-1])
+        links = [(f'/megalo/{j}.html', f'Σελίδα {j}') for j in range(pages) if j != i]
+        path = '/index.html' if i == 0 else f'/megalo/{i}.html'
+        site[path] = (page(f'Μεγάλη σελίδα {i}', ''.join(body), links, '<meta charset="utf-8">').encode(), 'text/html')
+    return site
+
+
+def mixed_language_site(rng, pages):
+    """Greek pages under /el/ and an English section under /en/ that links back into itself."""
+    site = {}
+    half = pages // 2
+    for i in range(half):
+        links = [(f'/el/{j}.html', f'Άρθρο {j}') for j in rng.sample(range(half), min(half, 10))]
+        links += [(f'/en/{j}.html', f'Article {j}') for j in rng.sample(range(half), min(half, 3))]
+        path = '/index.html' if i == 0 else f'/el/{i}.html'
+        site[path] = (page(f'Άρθρο {i}', article(rng, 5), links, '<meta charset="utf-8">').encode(), 'text/html')
+    for i in range(half):
+        links = [(f'/en/{j}.html', f'Article {j}') for j in rng.sample(range(half), min(half, 10))]
+        site[f'/en/{i}.html'] = (page(f'Article {i}', article(rng, 5, ENGLISH), links,
+                                      '<meta charset="utf-8">', lang='en').encode(), 'text/html')
+    return site
+
+
+def synthetic_sites(scale=1.0, seed=1821):
+    """name -> {path: (body, Content-Type)}. Page counts are multiplied by `scale`."""
+    def n(count):
+        return max(2, int(count * scale))
+
+    return {
+        'news-utf8': news_site(random.Random(seed), n(400)),
+        'legacy-cp1253': news_site(random.Random(seed + 1), n(200), encoding='cp1253', declare='mixed'),
+        'iso-8859-7': news_site(random.Random(seed + 2), n(200), encoding='iso-8859-7', declare='header'),
+        'large-pages': large_pages_site(random.Random(seed + 3), n(20), size=1_500_000),
+        'mixed-language': mixed_language_site(random.Random(seed + 4), n(160)),
+    }
+
+
+def write_corpus(sites, directory):
+    for name, site in sites.items():
+        root = os.path.join(directory, name)
+        headers = {}
+        for path, (body, content_type) in site.items():
+            target = os.path.join(root, path.lstrip('/'))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, 'wb') as f:
+                f.write(body)
+            headers[path] = content_type
+        with open(os.path.join(root, '_headers.json'), 'w', encoding='utf-8') as f:
+            json.dump(headers, f, indent=1, sort_keys=True)
+
+
+def load_corpus(directory):
+    """Reads sites written by write_corpus (or recorded in the same layout)."""
+    sites = {}
+    for name in sorted(os.listdir(directory)):
+        root = os.path.join(directory, name)
+        if not os.path.isdir(root):
+            continue
+        try:
+            with open(os.path.join(root, '_headers.json'), encoding='utf-8') as f:
+                headers = json.load(f)
+        except FileNotFoundError:
+            headers = {}
+        site = {}
+        for dirpath, _, files in os.walk(root):
+            for file in files:
+                if file == '_headers.json':
+                    continue
+                full = os.path.join(dirpath, file)
+                path = '/' + os.path.relpath(full, root).replace(os.sep, '/')
+                with open(full, 'rb') as f:
+                    site[path] = (f.read(), headers.get(path, 'text/html'))
+        sites[name] = site
+    return sites
+
+
+def get_sites(corpus=None, scale=1.0):
+    return load_corpus(corpus) if corpus else synthetic_sites(scale)
+
+
+def _handler(site):
+    class SiteHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            entry = site.get(self.path.split('?', 1)[0])
+            if entry is None:
+                body, content_type, status = b'not found', 'text/plain', 404
+            else:
+                (body, content_type), status = entry, 200
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return SiteHandler
+
+
+@contextmanager
+def serve(sites):
+    """Serves each site on its own 127.0.0.1 port (so each is its own domain). Yields {name: base URL}."""
+    servers = {}
+    try:
+        for name, site in sites.items():
+            server = ThreadingHTTPServer(('127.0.0.1', 0), _handler(site))
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, name=f'mock-{name}', daemon=True).start()
+            servers[name] = server
+        yield {name: f'http://127.0.0.1:{server.server_address[1]}' for name, server in servers.items()}
+    finally:
+        for server in servers.values():
+            server.shutdown()
+            server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--write', metavar='DIR', help='write the synthetic sites to DIR as a corpus')
+    parser.add_argument('--serve', action='store_true', help='serve the sites until interrupted')
+    parser.add_argument('--corpus', help='serve a corpus directory instead of the synthetic sites')
+    parser.add_argument('--scale', type=float, default=1.0)
+    args = parser.parse_args()
+
+    sites = get_sites(args.corpus, args.scale)
+    if args.write:
+        write_corpus(sites, args.write)
+        print(f"Wrote {sum(len(s) for s in sites.values())} pages in {len(sites)} sites to {args.write}")
+    if args.serve:
+        with serve(sites) as urls:
+            for name, url in urls.items():
+                print(f"{name:<16}{url}/index.html")
+            try:
+                threading.Event().wait()
+            except KeyboardInterrupt:
+                pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,468 @@
+# benchmarks/suite.py
+"""
+Offline benchmark suite. Serves the mock Greek sites (benchmarks/mock_sites.py)
+or a recorded corpus from local HTTP servers and measures:
+
+  crawl:<site>           run_scraper on one site, as a user would run it (speed 10)
+  crawl:multi            run_multi_scraper on every site at once
+  crawl:unthrottled      every site at once with no download delay or autothrottle:
+                         the processing ceiling rather than the politeness limit
+  stage:encoding         RobustEncodingMiddleware, chardet included
+  stage:links            extract_links
+  stage:extraction       trafilatura on one core (extract_text)
+  stage:text[<backend>]  TextPipeline cleaning, per importable backend
+  stage:dedup            fingerprint + NearDuplicateIndex.check
+  stage:storage          serialize + BufferedWriter to a temporary file
+  stage:httpcache[<backend>]
+                         store every page in an HTTP cache, reopen it, look each one up:
+                         lookup latency and disk footprint of Scrapy's filesystem storage,
+                         SqliteCacheStorage, and SqliteCacheStorage with HTTPCACHE_TEXT_ONLY
+
+Each scenario runs in a fresh process, so peak RSS and CPU time (extraction
+workers included) belong to that scenario alone. Results are written as JSON;
+--compare prints the change against an earlier results file.
+
+    python benchmarks/suite.py [--scale 1.0] [--corpus DIR] [--only 'stage:*'] [--repeat 1]
+                               [--output results.json] [--compare baseline.json [--tolerance 0.1]]
+"""
+import argparse
+import fnmatch
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import mock_sites
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+
+# Lower is better for these, higher for pages_per_sec.
+COMPARED = ('pages_per_sec', 'cpu_ms_per_page', 'peak_rss_mb', 'output_bytes')
+
+
+# ---- child side: one scenario per process ----
+
+def cpu_time():
+    """CPU seconds of this process and its finished children (the extraction workers, once stopped)."""
+    self_, children = resource.getrusage(resource.RUSAGE_SELF), resource.getrusage(resource.RUSAGE_CHILDREN)
+    return self_.ru_utime + self_.ru_stime + children.ru_utime + children.ru_stime
+
+
+def peak_rss_mb():
+    self_, children = resource.getrusage(resource.RUSAGE_SELF), resource.getrusage(resource.RUSAGE_CHILDREN)
+    return max(self_.ru_maxrss, children.ru_maxrss) / 1024  # Largest single process; kilobytes on Linux
+
+
+class Clock:
+    """Wall and CPU time of the measured region only, not of building its inputs."""
+
+    def __init__(self):
+        self.wall = time.perf_counter()
+        self.cpu = cpu_time()
+
+    def stop(self):
+        return {'seconds': time.perf_counter() - self.wall, 'cpu_seconds': cpu_time() - self.cpu}
+
+
+def html_pages(sites):
+    return [(name, path, body, content_type) for name, site in sites.items()
+            for path, (body, content_type) in site.items() if content_type.startswith('text/html')]
+
+
+def responses(sites):
+    from scrapy.http import HtmlResponse, Request
+    return [HtmlResponse(url=f'http://{name}.bench.gr{path}', body=body, headers={'Content-Type': content_type},
+                         request=Request(f'http://{name}.bench.gr{path}'))
+            for name, path, body, content_type in html_pages(sites)]
+
+
+def decoded_pages(sites):
+    return [response.text for response in responses(sites)]
+
+
+def extracted_texts(spec, sites):
+    """Extracted text of every page, computed once per suite run and shared by the later stages."""
+    path = os.path.join(spec['workdir'], 'texts.json')
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    from greek_scraper.extraction import extract_text
+    texts = [extract_text(html) for html in decoded_pages(sites)]
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(texts, f, ensure_ascii=False)
+    return texts
+
+
+def stage_encoding(spec, sites):
+    from urllib.parse import urlparse
+    from greek_scraper.middlewares import RobustEncodingMiddleware
+    pages = responses(sites)
+    middleware = RobustEncodingMiddleware()
+    clock = Clock()
+    for response in pages:
+        result = middleware.process_response(response.request, response, None)
+        if not hasattr(result, 'text'):  # Deferred: run the threaded detection inline so it is counted
+            encoding = middleware._detect(response.body[:middleware.detect_bytes])
+            result = middleware._detected(encoding, urlparse(response.url).netloc, response)
+        result.text
+    return {'pages': len(pages), **clock.stop()}
+
+
+def stage_links(spec, sites):
+    from scrapy.utils.response import get_base_url
+    from greek_scraper.links import extract_links
+    pages = responses(sites)
+    for response in pages:
+        response.text  # Decoding is the encoding stage's cost
+    clock = Clock()
+    links = 0
+    for response in pages:
+        links += len(extract_links(response.selector.root, get_base_url(response), response.url.split('/')[2]))
+    return {'pages': len(pages), **clock.stop(), 'links': links}
+
+
+def stage_extraction(spec, sites):
+    from greek_scraper.extraction import extract_text
+    pages = decoded_pages(sites)
+    clock = Clock()
+    texts = [extract_text(html) for html in pages]
+    measured = clock.stop()
+    with open(os.path.join(spec['workdir'], 'texts.json'), 'w', encoding='utf-8') as f:
+        json.dump(texts, f, ensure_ascii=False)
+    return {'pages': len(pages), **measured, 'text_chars': sum(map(len, texts))}
+
+
+def stage_text(spec, sites):
+    from greek_scraper.backends import load_backend
+    texts = extracted_texts(spec, sites)
+    processor = load_backend(spec['backend'])
+    batch_size = 250  # TEXT_BATCH_SIZE default
+    clock = Clock()
+    for i in range(0, len(texts), batch_size):
+        processor.process_batch(texts[i:i + batch_size])
+    return {'pages': len(texts), **clock.stop()}
+
+
+def stage_dedup(spec, sites):
+    from greek_scraper.dedup import NearDuplicateIndex, fingerprint
+    texts = extracted_texts(spec, sites)
+    index = NearDuplicateIndex()
+    clock = Clock()
+    duplicates = sum(index.check(i, *fingerprint(text)) is not None for i, text in enumerate(texts))
+    return {'pages': len(texts), **clock.stop(), 'duplicates': duplicates}
+
+
+def stage_storage(spec, sites):
+    from greek_scraper.writer import BufferedWriter
+    texts = extracted_texts(spec, sites)
+    items = [{'url': f'http://{name}.bench.gr{path}', 'text': text}
+             for (name, path, _, _), text in zip(html_pages(sites), texts)]
+    path = os.path.join(spec['workdir'], 'storage.jsonl')
+    clock = Clock()
+    writer = BufferedWriter(path)
+    for item in items:
+        if not writer.write(writer.serialize(item)):
+            writer.wait_for_space()
+    writer.close()
+    return {'pages': len(items), **clock.stop(), 'output_bytes': writer.bytes_written}
+
+
+HTTPCACHE_BACKENDS = {
+    'filesystem': {'HTTPCACHE_STORAGE': 'scrapy.extensions.httpcache.FilesystemCacheStorage'},
+    'sqlite': {'HTTPCACHE_STORAGE': 'greek_scraper.httpcache.SqliteCacheStorage'},
+    'sqlite-text': {'HTTPCACHE_STORAGE': 'greek_scraper.httpcache.SqliteCacheStorage', 'HTTPCACHE_TEXT_ONLY': True},
+}
+
+
+def disk_usage(directory):
+    """(allocated bytes, file count) under `directory`: blocks, so per-file overhead counts."""
+    allocated = files = 0
+    for root, _, names in os.walk(directory):
+        for name in names:
+            allocated += os.stat(os.path.join(root, name)).st_blocks * 512
+            files += 1
+    return allocated, files
+
+
+def stage_httpcache(spec, sites):
+    import random
+    from scrapy import Spider
+    from scrapy.utils.misc import load_object
+    from scrapy.utils.test import get_crawler
+
+    class CacheSpider(Spider):
+        name = 'bench'
+
+    cachedir = os.path.join(os.path.dirname(spec['output']), 'httpcache')
+    crawler = get_crawler(CacheSpider, {'HTTPCACHE_DIR': cachedir, **HTTPCACHE_BACKENDS[spec['backend']]})
+    spider = CacheSpider.from_crawler(crawler)
+    storage_class = load_object(crawler.settings['HTTPCACHE_STORAGE'])
+    pages = responses(sites)
+
+    storage = storage_class(crawler.settings)
+    storage.open_spider(spider)
+    start = time.perf_counter()
+    for response in pages:
+        storage.store_response(spider, response.request, response)
+    storage.close_spider(spider)  # Included: the SQLite writer commits here
+    store_seconds = time.perf_counter() - start
+
+    requests = [response.request for response in pages]
+    random.Random(0).shuffle(requests)
+    storage = storage_class(crawler.settings)
+    storage.open_spider(spider)
+    latencies = []
+    clock = Clock()
+    for request in requests:
+        start = time.perf_counter()
+        cached = storage.retrieve_response(spider, request)
+        latencies.append(time.perf_counter() - start)
+        assert cached is not None, request.url
+    measured = clock.stop()
+    storage.close_spider(spider)
+
+    latencies.sort()
+    allocated, files = disk_usage(cachedir)
+    return {'pages': len(requests), **measured, 'store_seconds': round(store_seconds, 3),
+            'lookup_p50_us': round(latencies[len(latencies) // 2] * 1e6, 1),
+            'lookup_p99_us': round(latencies[int(len(latencies) * 0.99)] * 1e6, 1),
+            'output_bytes': allocated, 'files': files}
+
+
+def crawl_metrics(spec):
+    with open(spec['metrics_file'], encoding='utf-8') as f:
+        counters = json.load(f)['counters']
+    pages = sum(v for k, v in counters.items() if k.startswith('pages_total'))
+    items = sum(v for k, v in counters.items() if k.startswith('items_total'))
+    return int(pages), int(items)
+
+
+def output_bytes(path):
+    directory, base = os.path.split(path)
+    stem = base.split('.', 1)[0]
+    return sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory) if f.startswith(stem))
+
+
+def crawl(spec, sites):
+    from greek_scraper.cli import run_scraper, run_multi_scraper
+    urls = [url + '/index.html' for url in spec['urls']]
+    clock = Clock()
+    if len(urls) == 1:
+        run_scraper(urls[0], output_file=spec['output'], threads=4, speed=10, metrics_file=spec['metrics_file'])
+    else:
+        run_multi_scraper(urls, output_file=spec['output'], threads_per_domain=4, batch_size=len(urls), speed=10,
+                          metrics_file=spec['metrics_file'])
+    measured = clock.stop()
+    pages, items = crawl_metrics(spec)
+    return {'pages': pages, 'items': items, **measured, 'output_bytes': output_bytes(spec['output'])}
+
+
+def crawl_unthrottled(spec, sites):
+    from scrapy.crawler import CrawlerProcess
+    from greek_scraper.spider import ScraperSpider
+
+    class UnthrottledSpider(ScraperSpider):
+        custom_settings = {**ScraperSpider.custom_settings, 'DOWNLOAD_DELAY': 0, 'ADAPTIVE_THROTTLE_ENABLED': False,
+                           'RANDOMIZE_DOWNLOAD_DELAY': False, 'CONCURRENT_REQUESTS_PER_DOMAIN': 16}
+
+    process = CrawlerProcess({'LOG_LEVEL': 'ERROR', 'METRICS_FILE': spec['metrics_file']})
+    for url in spec['urls']:
+        process.crawl(UnthrottledSpider, seed_domains=[url + '/index.html'], output_file=spec['output'],
+                      use_cpu=True, target_language='greek')
+    clock = Clock()
+    process.start()
+    measured = clock.stop()
+    pages, items = crawl_metrics(spec)
+    return {'pages': pages, 'items': items, **measured, 'output_bytes': output_bytes(spec['output'])}
+
+
+RUNNERS = {
+    'crawl': crawl,
+    'crawl-unthrottled': crawl_unthrottled,
+    'encoding': stage_encoding,
+    'links': stage_links,
+    'extraction': stage_extraction,
+    'text': stage_text,
+    'dedup': stage_dedup,
+    'storage': stage_storage,
+    'httpcache': stage_httpcache,
+}
+
+
+def run_child(spec_path):
+    with open(spec_path, encoding='utf-8') as f:
+        spec = json.load(f)
+    sites = mock_sites.get_sites(spec['corpus'], spec['scale'])
+    result = RUNNERS[spec['runner']](spec, sites)
+    result['peak_rss_mb'] = round(peak_rss_mb(), 1)
+    with open(spec['result'], 'w', encoding='utf-8') as f:
+        json.dump(result, f)
+
+
+# ---- parent side ----
+
+def scenarios(site_urls, backends):
+    found = [(f'crawl:{name}', 'crawl', {'urls': [url]}) for name, url in site_urls.items()]
+    found.append(('crawl:multi', 'crawl', {'urls': list(site_urls.values())}))
+    found.append(('crawl:unthrottled', 'crawl-unthrottled', {'urls': list(site_urls.values())}))
+    # extraction first: it leaves the texts behind for the stages after it
+    found += [('stage:encoding', 'encoding', {}), ('stage:links', 'links', {}),
+              ('stage:extraction', 'extraction', {})]
+    found += [(f'stage:text[{backend}]', 'text', {'backend': backend}) for backend in backends]
+    found += [('stage:dedup', 'dedup', {}), ('stage:storage', 'storage', {})]
+    found += [(f'stage:httpcache[{backend}]', 'httpcache', {'backend': backend}) for backend in HTTPCACHE_BACKENDS]
+    return found
+
+
+def usable_backends():
+    from greek_scraper.backends import TEXT_BACKENDS, load_backend
+    usable = []
+    for name in TEXT_BACKENDS:
+        try:
+            load_backend(name)
+            usable.append(name)
+        except ImportError:
+            continue
+    return usable
+
+
+def run_scenario(name, runner, extra, args, workdir):
+    runs = []
+    for attempt in range(args.repeat):
+        rundir = tempfile.mkdtemp(dir=workdir)  # Fresh cwd: Scrapy's HTTP cache and JOBDIR land here
+        spec = {'runner': runner, 'corpus': args.corpus, 'scale': args.scale, 'workdir': workdir,
+                'output': os.path.join(rundir, 'out.jsonl'), 'metrics_file': os.path.join(rundir, 'metrics.json'),
+                'result': os.path.join(rundir, 'result.json'), **extra}
+        spec_path = os.path.join(rundir, 'spec.json')
+        with open(spec_path, 'w', encoding='utf-8') as f:
+            json.dump(spec, f)
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [REPO_ROOT, os.environ.get('PYTHONPATH')])))
+        proc = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', spec_path], cwd=rundir, env=env,
+                              stdout=None if args.verbose else subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        if proc.returncode != 0 or not os.path.exists(spec['result']):
+            print(f"{name}: failed (exit {proc.returncode})\n{proc.stderr[-2000:]}", file=sys.stderr)
+            return None
+        with open(spec['result'], encoding='utf-8') as f:
+            runs.append(json.load(f))
+        shutil.rmtree(rundir, ignore_errors=True)
+
+    result = sorted(runs, key=lambda r: r['seconds'])[len(runs) // 2]  # Median run by wall time
+    pages = max(1, result['pages'])
+    result['pages_per_sec'] = round(result['pages'] / result['seconds'], 2) if result['seconds'] else None
+    result['cpu_ms_per_page'] = round(result['cpu_seconds'] / pages * 1000, 3)
+    if len(runs) > 1:
+        result['seconds_stdev'] = statistics.stdev(r['seconds'] for r in runs)
+    return result
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], cwd=REPO_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_table(results):
+    print(f"{'scenario':<30}{'pages':>8}{'pages/s':>10}{'cpu ms/page':>13}{'peak RSS MB':>13}{'output bytes':>14}")
+    for name, r in results.items():
+        print(f"{name:<30}{r['pages']:>8}{r['pages_per_sec'] or 0:>10.1f}{r['cpu_ms_per_page']:>13.2f}"
+              f"{r['peak_rss_mb']:>13.1f}{r.get('output_bytes', ''):>14}")
+    caches = {name: r for name, r in results.items() if 'lookup_p50_us' in r}
+    if caches:
+        print(f"\n{'HTTP cache':<30}{'lookup p50 us':>15}{'lookup p99 us':>15}{'store s':>10}{'disk bytes':>14}"
+              f"{'files':>8}")
+        for name, r in caches.items():
+            print(f"{name:<30}{r['lookup_p50_us']:>15.1f}{r['lookup_p99_us']:>15.1f}{r['store_seconds']:>10.2f}"
+                  f"{r['output_bytes']:>14}{r['files']:>8}")
+
+
+def compare(results, baseline_path, tolerance):
+    """Prints the relative change per metric. Returns the number of regressions beyond `tolerance`."""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)
+    print(f"\nAgainst {baseline_path} ({baseline['meta'].get('revision')}):")
+    regressions = 0
+    for name, r in results.items():
+        old = baseline['results'].get(name)
+        if old is None:
+            continue
+        changes = []
+        for metric in COMPARED:
+            if not r.get(metric) or not old.get(metric):
+                continue
+            change = r[metric] / old[metric] - 1
+            worse = -change if metric == 'pages_per_sec' else change
+            flag = ' REGRESSION' if worse > tolerance else ''
+            regressions += bool(flag)
+            changes.append(f"{metric} {change:+.1%}{flag}")
+        print(f"  {name:<24}{', '.join(changes)}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', type=float, default=1.0, help='multiply the synthetic sites\' page counts')
+    parser.add_argument('--corpus', help='recorded corpus directory (see mock_sites.py) instead of synthetic sites')
+    parser.add_argument('--only', action='append', help='scenario name pattern, e.g. "stage:*" (repeatable)')
+    parser.add_argument('--repeat', type=int, default=1, help='runs per scenario; the median is reported')
+    parser.add_argument('--output', help='results file (default: benchmarks/results/<git revision>.json)')
+    parser.add_argument('--compare', metavar='BASELINE', help='earlier results file to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='relative change counted as a regression')
+    parser.add_argument('--verbose', action='store_true', help='show the scraper\'s own output')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return run_child(args.child)
+
+    sites = mock_sites.get_sites(args.corpus, args.scale)
+    workdir = tempfile.mkdtemp(prefix='greek_scraper-bench-')
+    results = {}
+    try:
+        with mock_sites.serve(sites) as site_urls:
+            for name, runner, extra in scenarios(site_urls, usable_backends()):
+                if args.only and not any(fnmatch.fnmatch(name, pattern) for pattern in args.only):
+                    continue
+                print(f"running {name} ...", file=sys.stderr)
+                result = run_scenario(name, runner, extra, args, workdir)
+                if result is not None:
+                    results[name] = result
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    revision = git_revision()
+    report = {
+        'meta': {
+            'revision': revision,
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count(),
+            'corpus': args.corpus or 'synthetic',
+            'scale': args.scale,
+            'pages': {name: len(site) for name, site in sites.items()},
+            'repeat': args.repeat,
+        },
+        'results': results,
+    }
+    output = args.output or os.path.join(BENCH_DIR, 'results', f"{revision or time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=1)
+
+    print_table(results)
+    print(f"\nResults written to {output}")
+    if args.compare and compare(results, args.compare, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,25 @@
 # greek_scraper/__init__.py
 
 from .cli import run_scraper, run_multi_scraper
+from .sources import read_domains
 
 # Default configurations
 _config = {
     'use_gpu': False,
+    'backend': None,  # Text backend override: 'cuda', 'cpu-numpy' or 'cpu-python'
     'output_path': 'scraped_data.jsonl',
+    'frontier_path': None,  # SQLite frontier for crash-resumable crawls
+    'validators_path': None,  # SQLite validator store for conditional re-crawls
+    'metrics_port': 0,  # Local Prometheus endpoint, 0 disables
+    'metrics_file': None,  # Periodic JSON stats file
+    'profile_file': None,  # Sampling profiler output (folded stacks)
     'language': 'greek',
     'threads': 1,
+    'active_domains': 10,  # Domains crawled at once by multi_scrape
+    'processes': 1,  # Worker processes for multi_scrape; more than 1 shards the domains
+    'shard_queue_path': None,  # Coordination database of a sharded crawl (default: next to the output)
+    'autodiscover': False,  # Also crawl the best-linked domains found in outlinks
+    'max_domains': 5000,  # Domains crawled in total when autodiscovering
     'speed': 5,  # Default scraping speed (1-10)
     'separator': ',',
 }
@@ -20,57 +32,203 @@ def scrape(domain):
         output_file=_config['output_path'],
         language=_config['language'],
         threads=_config['threads'],
-        speed=_config['speed']
+        speed=_config['speed'],
+        backend=_config['backend'],
+        frontier_path=_config['frontier_path'],
+        validators_path=_config['validators_path'],
+        metrics_port=_config['metrics_port'],
+        metrics_file=_config['metrics_file'],
+        profile_file=_config['profile_file'],
+        autodiscover=_config['autodiscover'],
+        max_domains=_config['max_domains']
     )
 
 def multi_scrape(domains, separator=','):
-    """Scrapes multiple domains from an array."""
+    """Scrapes multiple domains from a list, any iterable, or a `separator`-joined string."""
     if isinstance(domains, str):
         domains = domains.split(separator)
+    if _config['processes'] > 1:
+        from .shards import run_sharded_scraper  # Imported here: workers run it with python -m
+        return run_sharded_scraper(
+            domains,
+            workers=_config['processes'],
+            queue_path=_config['shard_queue_path'],
+            use_gpu=_config['use_gpu'],
+            output_file=_config['output_path'],
+            language=_config['language'],
+            threads_per_domain=_config['threads'],
+            batch_size=_config['active_domains'],
+            speed=_config['speed'],
+            backend=_config['backend'],
+            frontier_path=_config['frontier_path'],
+            validators_path=_config['validators_path'],
+            metrics_port=_config['metrics_port'],
+            metrics_file=_config['metrics_file'],
+            profile_file=_config['profile_file'],
+            autodiscover=_config['autodiscover'],
+            max_domains=_config['max_domains']
+        )
     return run_multi_scraper(
         domains,
         use_gpu=_config['use_gpu'],
         output_file=_config['output_path'],
         language=_config['language'],
-        threads=_config['threads'],
-        speed=_config['speed']
+        threads_per_domain=_config['threads'],
+        batch_size=_config['active_domains'],
+        speed=_config['speed'],
+        backend=_config['backend'],
+        frontier_path=_config['frontier_path'],
+        validators_path=_config['validators_path'],
+        metrics_port=_config['metrics_port'],
+        metrics_file=_config['metrics_file'],
+        profile_file=_config['profile_file'],
+        autodiscover=_config['autodiscover'],
+        max_domains=_config['max_domains']
     )
 
 def from_file(filepath, separator=','):
-    """Reads domains from a file and scrapes them."""
+    """
+    Scrapes the domains in a file (separated by `separator` and/or one per
+    line, optionally gzip/bz2/xz/zstd compressed), read lazily with duplicates dropped.
+    """
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            domains = [line.strip() for line in f.read().split(separator) if line.strip()]
-        return multi_scrape(domains, separator)
+        domains = read_domains(filepath, separator)
     except FileNotFoundError:
         print(f"[greek_scraper] ERROR: File '{filepath}' not found.")
         return None
+    return multi_scrape(domains, separator)
+
+def _stream_options():
+    return dict(
+        use_gpu=_config['use_gpu'],
+        language=_config['language'],
+        threads_per_domain=_config['threads'],
+        batch_size=_config['active_domains'],
+        speed=_config['speed'],
+        backend=_config['backend'],
+        frontier_path=_config['frontier_path'],
+        validators_path=_config['validators_path'],
+        metrics_port=_config['metrics_port'],
+        metrics_file=_config['metrics_file'],
+        profile_file=_config['profile_file'],
+        autodiscover=_config['autodiscover'],
+        max_domains=_config['max_domains']
+    )
+
+def iter_scrape(domains=None, filepath=None, separator=','):
+    """
+    Yields cleaned items as they are scraped instead of writing output_path.
+    Takes domains (a list, a generator or a `separator`-joined string) or a
+    domain file. The crawl runs in a child process with bounded buffering.
+    """
+    if isinstance(domains, str):
+        domains = domains.split(separator)
+    from .stream import iter_items  # Imported here: the child process runs it with python -m
+    return iter_items(domains, filepath, separator, **_stream_options())
+
+def aiter_scrape(domains=None, filepath=None, separator=','):
+    """Async iterator version of iter_scrape: `async for item in aiter_scrape(...)`."""
+    if isinstance(domains, str):
+        domains = domains.split(separator)
+    from .stream import aiter_items
+    return aiter_items(domains, filepath, separator, **_stream_options())
 
 def gpu(enabled):
     """Enable or disable GPU processing."""
     _config['use_gpu'] = bool(enabled)
     print(f"[greek_scraper] GPU Processing: {'Enabled' if enabled else 'Disabled'}")
 
+def backend(name):
+    """Force a text backend ('cuda', 'cpu-numpy', 'cpu-python'). None picks one automatically."""
+    from .backends import TEXT_BACKENDS
+    if name is not None and name not in TEXT_BACKENDS:
+        print(f"[greek_scraper] ERROR: Unknown backend '{name}'. Choose from: {', '.join(TEXT_BACKENDS)}")
+        return
+    _config['backend'] = name
+    print(f"[greek_scraper] Text Backend: {name or 'auto'}")
+
 def output_path(path):
     """Set the output file path."""
     _config['output_path'] = path
     print(f"[greek_scraper] Output Path Set: {path}")
 
+def frontier_path(path):
+    """Set the crawl frontier file. Re-running with the same file resumes where the last run stopped."""
+    _config['frontier_path'] = path
+    print(f"[greek_scraper] Frontier Path Set: {path}")
+
+def validators_path(path):
+    """Keep ETag/Last-Modified validators in an SQLite file so later runs only re-download changed pages."""
+    _config['validators_path'] = path
+    print(f"[greek_scraper] Validators Path Set: {path}")
+
+def metrics_port(port):
+    """Serve crawl metrics in Prometheus text format on http://127.0.0.1:<port>/metrics (0 disables)."""
+    try:
+        _config['metrics_port'] = max(0, int(port))
+        print(f"[greek_scraper] Metrics Port Set: {_config['metrics_port'] or 'disabled'}")
+    except ValueError:
+        print("[greek_scraper] ERROR: Invalid metrics port. Must be an integer.")
+
+def metrics_file(path):
+    """Rewrite a JSON file with the crawl metrics every few seconds."""
+    _config['metrics_file'] = path
+    print(f"[greek_scraper] Metrics File Set: {path}")
+
+def profile_file(path):
+    """Sample the crawler's call stacks and write them to `path` (folded format, for flame graphs)."""
+    _config['profile_file'] = path
+    print(f"[greek_scraper] Profile File Set: {path}")
+
 def language(lang):
     """Set the scraping language (default: Greek)."""
     _config['language'] = lang
     print(f"[greek_scraper] Language Set: {lang}")
 
 def threads(num):
-    """Set the number of threads (1 thread = 1 domain)."""
+    """Set the starting number of concurrent requests per host; the adaptive throttle adjusts it from there."""
     try:
         _config['threads'] = max(1, int(num))
         print(f"[greek_scraper] Threads Set: {_config['threads']}")
     except ValueError:
         print("[greek_scraper] ERROR: Invalid thread count. Must be an integer.")
 
+def active_domains(num):
+    """Set how many domains multi_scrape crawls at once."""
+    try:
+        _config['active_domains'] = max(1, int(num))
+        print(f"[greek_scraper] Active Domains Set: {_config['active_domains']}")
+    except ValueError:
+        print("[greek_scraper] ERROR: Invalid domain count. Must be an integer.")
+
+def processes(num):
+    """Split multi_scrape over this many worker processes, each with its own output shard."""
+    try:
+        _config['processes'] = max(1, int(num))
+        print(f"[greek_scraper] Processes Set: {_config['processes']}")
+    except ValueError:
+        print("[greek_scraper] ERROR: Invalid process count. Must be an integer.")
+
+def shard_queue_path(path):
+    """Coordination database of a sharded crawl. Re-running with the same file resumes it."""
+    _config['shard_queue_path'] = path
+    print(f"[greek_scraper] Shard Queue Path Set: {path}")
+
+def autodiscover(enabled, max_domains=None):
+    """Follow links to other domains of the target TLD, best-linked first, up to max_domains in total."""
+    _config['autodiscover'] = bool(enabled)
+    if max_domains is not None:
+        try:
+            _config['max_domains'] = max(1, int(max_domains))
+        except ValueError:
+            print("[greek_scraper] ERROR: Max domains must be an integer.")
+    if _config['autodiscover']:
+        print(f"[greek_scraper] Autodiscover Set: up to {_config['max_domains']} domains")
+    else:
+        print("[greek_scraper] Autodiscover Set: off")
+
 def speed(value):
-    """Scale the scraping speed (1-10)."""
+    """Scale the starting request rate per host (1-10); the adaptive throttle adjusts it from there."""
     try:
         _config['speed'] = min(10, max(1, int(value)))
         print(f"[greek_scraper] Speed Set: {_config['speed']}")
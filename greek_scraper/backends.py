@@ -0,0 +1,70 @@
+# greek_scraper/backends.py
+import importlib
+
+# Text backends, imported only when a pipeline first asks for one.
+# name -> (module, class)
+TEXT_BACKENDS = {
+    'cuda': ('greek_scraper.gpu_processor', 'GPUTextProcessor'),
+    'cpu-numpy': ('greek_scraper.cpu_processor', 'CPUTextProcessor'),
+    'cpu-python': ('greek_scraper.backends', 'PythonTextProcessor'),
+}
+
+# Order in which backends are tried when the preferred one cannot be loaded.
+FALLBACK_ORDER = ['cuda', 'cpu-numpy', 'cpu-python']
+
+_loaded = {}
+
+
+class PythonTextProcessor:
+    """Dependency-free backend, used when neither CuPy nor NumPy can be imported."""
+
+    def process_batch(self, texts):
+        return [''.join(c for c in t if is_greek_char(ord(c))) for t in texts]
+
+
+def is_greek_char(char_code):
+    # Same ranges as the GPU kernel
+    c = char_code
+    return (c >= 0x0370 and c <= 0x03FF) or \
+        (c >= 0x1F00 and c <= 0x1FFF)  # Basic and Extended Greek Ranges
+
+
+def load_backend(name):
+    """Imports and instantiates a single backend. Raises ImportError if it is unusable here."""
+    if name in _loaded:
+        return _loaded[name]
+    if name not in TEXT_BACKENDS:
+        raise ValueError(f"Unknown text backend '{name}'. Choose from: {', '.join(TEXT_BACKENDS)}")
+
+    module_name, class_name = TEXT_BACKENDS[name]
+    try:
+        module = importlib.import_module(module_name)
+        processor = getattr(module, class_name)()
+    except ImportError:
+        raise
+    except Exception as e:
+        # e.g. CuPy is installed but there is no usable CUDA device
+        raise ImportError(f"Text backend '{name}' failed to initialize: {e}") from e
+
+    _loaded[name] = processor
+    return processor
+
+
+def get_backend(preferred=None):
+    """
+    Returns (name, processor) for the preferred backend, falling back along
+    FALLBACK_ORDER to the first one that can be imported.
+    """
+    order = list(FALLBACK_ORDER)
+    if preferred:
+        if preferred not in TEXT_BACKENDS:
+            raise ValueError(f"Unknown text backend '{preferred}'. Choose from: {', '.join(TEXT_BACKENDS)}")
+        order = [preferred] + order[order.index(preferred) + 1:]
+
+    for name in order:
+        try:
+            return name, load_backend(name)
+        except ImportError:
+            continue
+    # cpu-python has no dependencies, so this is only reached if it was explicitly skipped.
+    return 'cpu-python', load_backend('cpu-python')
@@ -2,35 +2,58 @@
 
 from scrapy.crawler import CrawlerProcess
 from greek_scraper.spider import ScraperSpider
-from scrapy.crawler import CrawlerProcess
-from twisted.internet import reactor, threads
+from greek_scraper.pipelines import StoragePipeline
+from greek_scraper.writer import acquire_shared_writer, release_shared_writer
+from greek_scraper.frontier import acquire_frontier, release_frontier
+from greek_scraper.extraction import acquire_pool, release_pool
+from greek_scraper.scheduler import DomainScheduler
+from greek_scraper.metrics import start_exporters, stop_exporters
+from greek_scraper.discovery import acquire_discovery, release_discovery, discovery_options
+from greek_scraper.resolver import installed_resolver
 import time
 
-def run_scraper(domain, use_gpu=False, output_file="scraped_data.jsonl", language="greek", threads=1, speed=5):
-    """Runs the scraper on a single domain."""
+def run_scraper(domain, use_gpu=False, output_file="scraped_data.jsonl", language="greek", threads=1, speed=5, backend=None, frontier_path=None, validators_path=None, metrics_port=0, metrics_file=None, profile_file=None, autodiscover=False, max_domains=5000):
+    """Runs the scraper on a single domain, then on the domains it links to if `autodiscover` is on."""
     process = CrawlerProcess({
         'USER_AGENT': 'Mozilla/5.0',
         'ROBOTSTXT_OBEY': True,
-        'CONCURRENT_REQUESTS_PER_DOMAIN': threads,  # Threads affect per-domain concurrency
-        'DOWNLOAD_DELAY': max(0.05, 1.0 / speed),  # Adjust delay based on speed (lower is faster)
-        'AUTOTHROTTLE_ENABLED': True,
-        'AUTOTHROTTLE_START_DELAY': 0.25,
-        'AUTOTHROTTLE_MAX_DELAY': 1.0,
+        'CONCURRENT_REQUESTS_PER_DOMAIN': threads,  # Starting per-host concurrency, adapted by the throttle
+        'DOWNLOAD_DELAY': max(0.05, 1.0 / speed),  # Starting per-host delay (lower is faster), adapted too
+        'AUTOTHROTTLE_ENABLED': False,  # AdaptiveThrottleMiddleware sets the slot delays instead
         'RANDOMIZE_DOWNLOAD_DELAY': False,
         'LOG_LEVEL': 'ERROR',
+        'TEXT_BACKEND': backend,  # cuda / cpu-numpy / cpu-python, None picks from use_gpu
+        'FRONTIER_PATH': frontier_path,  # SQLite file to checkpoint/resume the crawl, None disables
+        'VALIDATORS_PATH': validators_path,  # SQLite ETag/Last-Modified store for conditional re-crawls, None disables
+        'METRICS_PORT': metrics_port,  # Local Prometheus endpoint, 0 disables
+        'METRICS_FILE': metrics_file,  # JSON stats file rewritten every METRICS_INTERVAL seconds, None disables
+        'METRICS_PROFILE_FILE': profile_file,  # Folded stacks from the sampling profiler, None disables
+        'DNS_RESOLVER': 'greek_scraper.resolver.CachingResolver',  # Caches failed lookups too, shared by every spider
         'ITEM_PIPELINES': {
+            'greek_scraper.pipelines.ExtractionPipeline': 200,
             'greek_scraper.pipelines.TextPipeline': 300,
+            'greek_scraper.pipelines.DedupPipeline': 350,
             'greek_scraper.pipelines.StoragePipeline': 400,
         },
         'DOWNLOADER_MIDDLEWARES': {
+            'greek_scraper.middlewares.DeadHostMiddleware': 50,
+            'greek_scraper.middlewares.LanguageFilterMiddleware': 90,
             'greek_scraper.middlewares.RobustEncodingMiddleware': 543,
             'scrapy.downloadermiddlewares.retry.RetryMiddleware': None,
             'greek_scraper.middlewares.CustomRetryMiddleware': 544,
+            'greek_scraper.middlewares.ConditionalRequestMiddleware': 580,
+            'greek_scraper.middlewares.ResponseSizeMiddleware': 585,
+            'greek_scraper.middlewares.AdaptiveThrottleMiddleware': 950,
+        },
+        'EXTENSIONS': {
+            'greek_scraper.metrics.MetricsExtension': 500,
         }
     })
 
     worker_args = {
         'seed_domains': [domain],
+        'autodiscover': autodiscover,
+        'max_domains': max_domains,
         'use_cpu': not use_gpu,
         'output_file': output_file,
         'target_language': language
@@ -39,47 +62,125 @@ def run_scraper(domain, use_gpu=False, output_file="scraped_data.jsonl", languag
     process.crawl(ScraperSpider, **worker_args)
     process.start()
 
-def run_multi_scraper(domains, use_gpu=False, output_file="scraped_data.jsonl", language="greek", threads_per_domain=2, batch_size=10, speed=5):
-    """Runs the scraper on multiple domains in parallel, efficiently handling concurrency."""
+def run_multi_scraper(domains, use_gpu=False, output_file="scraped_data.jsonl", language="greek", threads_per_domain=2, batch_size=10, speed=5, backend=None, frontier_path=None, validators_path=None, metrics_port=0, metrics_file=None, profile_file=None, size_estimates=None, domain_source=None, on_domain_done=None, autodiscover=False, max_domains=5000, settings=None):
+    """
+    Runs the scraper on multiple domains in parallel, keeping `batch_size` domains
+    crawling at once and starting the next one as soon as any of them finishes.
+    `domains` can be any iterable; it is read as slots free up.
+    `size_estimates` (domain -> expected pages) starts the biggest domains first.
+    `domain_source(n)` supplies more domains once the list is used up and
+    `on_domain_done(domain, ok)` is told when each one ends (see shards.py).
+    With `autodiscover`, the best-linked domains found along the way follow,
+    up to `max_domains` in total. `settings` are extra Scrapy settings applied
+    over the ones below.
+    """
     
-    process = CrawlerProcess({
+    crawl_settings = {
         'USER_AGENT': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36',
         'ROBOTSTXT_OBEY': True,
-        'CONCURRENT_REQUESTS_PER_DOMAIN': threads_per_domain,  # threading per domain
-        'DOWNLOAD_DELAY': max(0.05, 1.0 / speed),  # Prevents excessive requests
-        'AUTOTHROTTLE_ENABLED': True,
-        'AUTOTHROTTLE_START_DELAY': 0.25,
-        'AUTOTHROTTLE_MAX_DELAY': 1.0,
+        'CONCURRENT_REQUESTS_PER_DOMAIN': threads_per_domain,  # Starting per-host concurrency, adapted by the throttle
+        'DOWNLOAD_DELAY': max(0.05, 1.0 / speed),  # Starting per-host delay (lower is faster), adapted too
+        'AUTOTHROTTLE_ENABLED': False,  # AdaptiveThrottleMiddleware sets the slot delays instead
         'RANDOMIZE_DOWNLOAD_DELAY': False,
         'LOG_LEVEL': 'ERROR',
         'COOKIES_ENABLED': False,
+        'TEXT_BACKEND': backend,  # cuda / cpu-numpy / cpu-python, None picks from use_gpu
+        'FRONTIER_PATH': frontier_path,  # SQLite file to checkpoint/resume the crawl, None disables
+        'VALIDATORS_PATH': validators_path,  # SQLite ETag/Last-Modified store for conditional re-crawls, None disables
+        'METRICS_PORT': metrics_port,  # Local Prometheus endpoint, 0 disables
+        'METRICS_FILE': metrics_file,  # JSON stats file rewritten every METRICS_INTERVAL seconds, None disables
+        'METRICS_PROFILE_FILE': profile_file,  # Folded stacks from the sampling profiler, None disables
+        'DNS_RESOLVER': 'greek_scraper.resolver.CachingResolver',  # Caches failed lookups too, shared by every spider
         'ITEM_PIPELINES': {
+            'greek_scraper.pipelines.ExtractionPipeline': 200,
             'greek_scraper.pipelines.TextPipeline': 300,
+            'greek_scraper.pipelines.DedupPipeline': 350,
             'greek_scraper.pipelines.StoragePipeline': 400,
         },
         'DOWNLOADER_MIDDLEWARES': {
+            'greek_scraper.middlewares.DeadHostMiddleware': 50,
+            'greek_scraper.middlewares.LanguageFilterMiddleware': 90,
             'greek_scraper.middlewares.RobustEncodingMiddleware': 543,
             'scrapy.downloadermiddlewares.retry.RetryMiddleware': None,
             'greek_scraper.middlewares.CustomRetryMiddleware': 544,
+            'greek_scraper.middlewares.ConditionalRequestMiddleware': 580,
+            'greek_scraper.middlewares.ResponseSizeMiddleware': 585,
+            'greek_scraper.middlewares.AdaptiveThrottleMiddleware': 950,
+        },
+        'EXTENSIONS': {
+            'greek_scraper.metrics.MetricsExtension': 500,
         }
-    })
+    }
+    crawl_settings.update(settings or {})
+    process = CrawlerProcess(crawl_settings)
+
+    # Imported here so CrawlerProcess above gets to install the configured reactor first.
+    from twisted.internet import reactor
+
+    # Extraction workers for every spider, held here so they aren't stopped and forked again
+    # between domains. Started first so they fork before the writer thread exists.
+    pool = acquire_pool(process.settings.getint('EXTRACTION_WORKERS', 0) or None,
+                        process.settings.get('EXTRACTION_START_METHOD'))
+
+    # One writer for the whole process: every spider's StoragePipeline shares it, and
+    # holding a reference here keeps it open between batches.
+    sink = acquire_shared_writer(output_file, **StoragePipeline.writer_options(process.settings))
 
     worker_args = {
+        'autodiscover': autodiscover,
+        'max_domains': max_domains,
+        'promote_domains': False,  # Discovered domains get their own spider from the scheduler below
         'use_cpu': not use_gpu,
         'output_file': output_file,
         'target_language': language
     }
 
-    def run_batch(start_index=0):
-        """Process domains in batches to prevent overload."""
-        batch = domains[start_index:start_index + batch_size]
-        if not batch:
-            return
+    # Holding the frontier open here keeps it from being reopened for every domain.
+    frontier = None
+    if frontier_path:
+        frontier = acquire_frontier(frontier_path,
+                                    flush_interval=process.settings.getfloat('FRONTIER_FLUSH_INTERVAL', 1.0),
+                                    flush_ops=process.settings.getint('FRONTIER_FLUSH_OPS', 5000))
+        if size_estimates is None:
+            size_estimates = frontier.queued_counts()  # On resume, domains with the most work left go first
+
+    # Discovery index for the whole run: once the domain list runs out, the scheduler
+    # asks it for the best-linked domains seen so far.
+    discovery = None
+    if autodiscover:
+        discovery = acquire_discovery(**discovery_options(process.settings))
+        list_source = domain_source
+
+        def domain_source(n):
+            domains = list_source(n) if list_source is not None else []
+            return domains or discovery.promote(n, max_domains)
+
+    # Metrics endpoint/file/profiler for the whole run, not restarted with every domain.
+    exporters = start_exporters(process.settings)
 
-        for domain in batch:
-            process.crawl(ScraperSpider, seed_domains=[domain], **worker_args)
+    scheduler = DomainScheduler(process, ScraperSpider, domains, max_active=batch_size,
+                                size_estimates=size_estimates, on_done=reactor.stop, source=domain_source,
+                                on_domain_done=on_domain_done, **worker_args)
 
-        reactor.callLater(10, run_batch, start_index + batch_size)  # Delay next batch to prevent overload
+    def start():
+        # CrawlerProcess installs the resolver as it starts: the scheduler looks the seed
+        # hosts up ahead of the crawl and skips the ones that turn out dead.
+        scheduler.resolver = installed_resolver()
+        scheduler.start()
 
-    reactor.callWhenRunning(run_batch)  # Start batch processing when Scrapy initializes
-    threads.deferToThread(process.start)  # Run Scrapy in a separate thread to prevent blocking
\ No newline at end of file
+    reactor.callWhenRunning(start)  # Start crawling when Scrapy initializes
+    try:
+        process.start(stop_after_crawl=False)  # The scheduler stops the reactor after the last domain
+    finally:
+        release_shared_writer(sink)
+        release_pool(pool)
+        if frontier is not None:
+            release_frontier(frontier)
+        if discovery is not None:
+            release_discovery(discovery)
+        stop_exporters(exporters)  # After the writer closed: the last JSON update has the final totals
+        if scheduler.dead:
+            print(f"[greek_scraper] Skipped {scheduler.dead} domains whose host does not resolve")
+        for domain, count in sorted(sink.domain_counts.items()):
+            print(f"[greek_scraper] {domain}: {count} items")
+        print(f"[greek_scraper] Total: {sink.items_written} items, {sink.bytes_written} bytes -> {output_file}")
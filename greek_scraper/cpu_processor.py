@@ -0,0 +1,41 @@
+# greek_scraper/cpu_processor.py
+import numpy as np
+
+
+def greek_mask(code_points):
+    """Vectorized Greek range check - same ranges as the GPU kernel."""
+    return ((code_points >= 0x0370) & (code_points <= 0x03FF)) | \
+        ((code_points >= 0x1F00) & (code_points <= 0x1FFF))  # Basic and Extended Greek
+
+
+class CPUTextProcessor:
+    """NumPy batch engine with the same interface as GPUTextProcessor."""
+
+    def process_batch(self, texts):
+        try:
+            if not texts:
+                return texts
+
+            # Pack the whole batch into one uint32 code-point buffer plus an offsets array.
+            offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+            np.cumsum([len(t) for t in texts], out=offsets[1:])
+            if offsets[-1] == 0:
+                return texts  # Avoid processing empty inputs
+
+            # surrogatepass: a lone surrogate (response.text can contain them) is a code point like any
+            # other here, and being outside the Greek ranges it is filtered out.
+            code_points = np.frombuffer(''.join(texts).encode('utf-32-le', errors='surrogatepass'), dtype=np.uint32)
+
+            # One vectorized pass over the buffer, then compact it.
+            mask = greek_mask(code_points)
+            kept = code_points[mask]
+
+            # Offsets of each text inside the compacted buffer.
+            kept_offsets = np.zeros(len(mask) + 1, dtype=np.int64)
+            np.cumsum(mask, out=kept_offsets[1:])
+            kept_offsets = kept_offsets[offsets].tolist()
+
+            cleaned = kept.tobytes().decode('utf-32-le')
+            return [cleaned[kept_offsets[i]:kept_offsets[i + 1]] for i in range(len(texts))]
+        except Exception as e:
+            return texts  # Fallback to original input if vectorized filtering fails
@@ -0,0 +1,115 @@
+# greek_scraper/dedup.py
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+
+SHINGLE_SIZE = 5  # Characters: the Greek filter leaves no word boundaries to split on
+NUM_PERM = 64
+
+_rng = np.random.default_rng(0x67726565)  # Fixed seed: signatures are comparable across runs
+_PERM_A = (_rng.integers(1, 2**63, NUM_PERM, dtype=np.uint64) * np.uint64(2) + np.uint64(1)).reshape(-1, 1)
+_PERM_B = _rng.integers(0, 2**63, NUM_PERM, dtype=np.uint64).reshape(-1, 1)
+_CHUNK = 8192  # Shingles per step, bounds the (NUM_PERM x chunk) temporary
+
+
+def exact_hash(text):
+    return hashlib.blake2b(text.encode('utf-8', errors='replace'), digest_size=8).digest()
+
+
+def shingle_hashes(text, k=SHINGLE_SIZE):
+    """Distinct 64-bit hashes of every k-character shingle of `text`."""
+    cp = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32).astype(np.uint64)
+    n = max(1, len(cp) - k + 1)
+    k = min(k, len(cp))
+    h = np.zeros(n, dtype=np.uint64)
+    for j in range(k):  # Polynomial rolling hash, all shingles at once (wraps mod 2**64)
+        h = h * np.uint64(0x100000001B3) + cp[j:j + n]
+    # murmur3 finalizer so nearby shingles spread over all bits
+    h ^= h >> np.uint64(33)
+    h *= np.uint64(0xFF51AFD7ED558CCD)
+    h ^= h >> np.uint64(33)
+    return np.unique(h)
+
+
+def minhash(text):
+    """NUM_PERM-value MinHash signature (uint32) of the text's character shingles."""
+    shingles = shingle_hashes(text)
+    signature = np.full(NUM_PERM, np.iinfo(np.uint64).max, dtype=np.uint64)
+    for start in range(0, len(shingles), _CHUNK):
+        chunk = shingles[start:start + _CHUNK]
+        np.minimum(signature, ((_PERM_A * chunk + _PERM_B) >> np.uint64(32)).min(axis=1), out=signature)
+    return signature.astype(np.uint32)
+
+
+def fingerprint(text):
+    """(exact hash, MinHash signature) of a text. Pure CPU work, safe to run in a thread."""
+    return exact_hash(text), minhash(text)
+
+
+class NearDuplicateIndex:
+    """
+    Bounded in-memory index of recently seen documents: exact hashes plus an
+    LSH table over MinHash signatures (`bands` x `rows` values). Candidates
+    sharing a band are confirmed when their estimated Jaccard similarity is at
+    least `threshold`. Past `max_docs`, the least recently matched documents
+    are evicted.
+    """
+
+    def __init__(self, max_docs=100000, threshold=0.8, bands=16, rows=4):
+        if bands * rows > NUM_PERM:
+            raise ValueError(f"bands * rows must be at most {NUM_PERM}")
+        self.max_docs = max(1, max_docs)
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = rows
+        self.docs = OrderedDict()  # doc_id -> (exact, signature)
+        self.exact = {}            # exact hash -> doc_id
+        self.buckets = {}          # (band, band bytes) -> [doc_id, ...]
+
+    def __len__(self):
+        return len(self.docs)
+
+    def _band_keys(self, signature):
+        r = self.rows
+        return [(b, signature[b * r:(b + 1) * r].tobytes()) for b in range(self.bands)]
+
+    def check(self, doc_id, exact, signature):
+        """
+        Returns ('exact' | 'near', original doc_id) if the document duplicates
+        one in the index, else None. Unique documents are added.
+        """
+        original = self.exact.get(exact)
+        if original is not None:
+            self.docs.move_to_end(original)
+            return 'exact', original
+
+        keys = self._band_keys(signature)
+        checked = set()
+        for key in keys:
+            for candidate in self.buckets.get(key, ()):
+                if candidate in checked:
+                    continue
+                checked.add(candidate)
+                if np.count_nonzero(self.docs[candidate][1] == signature) >= self.threshold * len(signature):
+                    self.docs.move_to_end(candidate)
+                    return 'near', candidate
+
+        self.docs[doc_id] = (exact, signature)
+        self.exact[exact] = doc_id
+        for key in keys:
+            self.buckets.setdefault(key, []).append(doc_id)
+        if len(self.docs) > self.max_docs:
+            self._evict()
+        return None
+
+    def _evict(self):
+        doc_id, (exact, signature) = self.docs.popitem(last=False)
+        if self.exact.get(exact) == doc_id:
+            del self.exact[exact]
+        for key in self._band_keys(signature):
+            bucket = self.buckets.get(key)
+            if bucket is not None:
+                bucket.remove(doc_id)
+                if not bucket:
+                    del self.buckets[key]
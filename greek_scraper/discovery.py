@@ -0,0 +1,191 @@
+# greek_scraper/discovery.py
+import heapq
+import threading
+from array import array
+from functools import lru_cache
+from urllib.parse import urlsplit
+
+from greek_scraper.dupefilters import BloomFilter, url_hash
+
+# One index per process, shared by every spider of a multi-domain run so a
+# domain found by several of them is seeded only once.
+_shared_index = None
+_shared_lock = threading.Lock()
+_extractor = None
+
+
+def _tld_extractor():
+    global _extractor
+    if _extractor is None:
+        import tldextract
+        _extractor = tldextract.TLDExtract(suffix_list_urls=())  # Bundled suffix list: no network access
+    return _extractor
+
+
+@lru_cache(maxsize=1 << 16)
+def registrable_domain(host):
+    """'www.news.in.gr' -> 'in.gr'. None for IPs, localhost and unknown suffixes."""
+    if not host:
+        return None
+    parts = _tld_extractor()(host.lower())
+    if not parts.domain or not parts.suffix:
+        return None
+    return f"{parts.domain}.{parts.suffix}"
+
+
+class InLinkCounter:
+    """
+    Approximate number of distinct referring domains per domain, in fixed memory:
+
+    - (source, target) pairs are deduplicated by two generations of Bloom
+      filters, the older one dropped when the newer fills up,
+    - counts live in a count-min sketch of `depth` x `width` uint32 cells
+      (conservative update, so estimates only ever over-count slightly),
+    - the best `top_k` domains are kept by name, with a URL to seed them from.
+    """
+
+    def __init__(self, width=1 << 18, depth=4, top_k=10000, pair_capacity=1 << 21):
+        self.width = width
+        self.rows = [array('I', bytes(4 * width)) for _ in range(depth)]
+        self.top_k = top_k
+        self.pair_capacity = pair_capacity
+        self.pairs = [BloomFilter(pair_capacity, 0.01)]
+        self.candidates = {}  # domain -> [estimate, seed URL], at most 2 * top_k
+
+    def _cells(self, domain):
+        h = url_hash(domain)
+        h1, h2 = h & 0xFFFFFFFF, (h >> 32) | 1
+        width = self.width
+        return [(row, (h1 + i * h2) % width) for i, row in enumerate(self.rows)]
+
+    def estimate(self, domain):
+        return min(row[i] for row, i in self._cells(domain))
+
+    def add(self, source, target, url):
+        """Counts a link from domain `source` to domain `target`. Returns the new estimate, or None for a repeat."""
+        pair = url_hash(f"{source} {target}")
+        if any(pair in pairs for pairs in self.pairs[:-1]) or not self.pairs[-1].add(pair):
+            return None
+        if self.pairs[-1].count >= self.pair_capacity:
+            self.pairs = [self.pairs[-1], BloomFilter(self.pair_capacity, 0.01)]
+
+        cells = self._cells(target)
+        count = min(row[i] for row, i in cells) + 1
+        for row, i in cells:
+            if row[i] < count:
+                row[i] = count
+
+        entry = self.candidates.get(target)
+        if entry is not None:
+            entry[0] = count
+        else:
+            self.candidates[target] = [count, url]
+            if len(self.candidates) > 2 * self.top_k:
+                keep = heapq.nlargest(self.top_k, self.candidates.items(), key=lambda kv: kv[1][0])
+                self.candidates = dict(keep)
+        return count
+
+    def top(self, n, min_count=1):
+        """Up to `n` (domain, estimate, seed URL) with the most referring domains, best first."""
+        ranked = heapq.nlargest(n, self.candidates.items(), key=lambda kv: kv[1][0])
+        return [(domain, count, url) for domain, (count, url) in ranked if count >= min_count]
+
+    def discard(self, domain):
+        self.candidates.pop(domain, None)
+
+    @property
+    def nbytes(self):
+        return (sum(len(row) * row.itemsize for row in self.rows)
+                + sum(len(pairs.bits) for pairs in self.pairs))
+
+
+class DomainDiscovery:
+    """
+    Autodiscovery state of a process: outlinks counted per registrable
+    domain, and the domains already seeded (from the seed list or promoted
+    from the counter) so none is crawled twice.
+    """
+
+    def __init__(self, min_inlinks=2, **counter_options):
+        self.counter = InLinkCounter(**counter_options)
+        self.min_inlinks = min_inlinks
+        self.seeded = set()  # Registrable domains taken by a spider or handed out by promote
+        self.promoted = set()  # Handed out by promote, not yet claimed by the spider seeding them
+        self.refs = 0
+
+    def record(self, source_host, sites, accept=None):
+        """
+        Counts the external `sites` (scheme://host) linked from a page on
+        `source_host`; `accept(domain)` filters targets (e.g. by TLD).
+        Returns how many new (source, target) pairs were counted.
+        """
+        source = registrable_domain(urlsplit(f"//{source_host}").hostname) or source_host
+        counted = 0
+        for site in sites:
+            try:
+                domain = registrable_domain(urlsplit(site).hostname)
+            except ValueError:
+                continue  # Malformed host or port
+            if domain is None or domain == source or domain in self.seeded:
+                continue
+            if accept is not None and not accept(domain):
+                continue
+            if self.counter.add(source, domain, site) is not None:
+                counted += 1
+        return counted
+
+    def claim(self, url):
+        """Marks the domain of seed `url` as taken. False if it already was."""
+        parts = urlsplit(url)
+        domain = registrable_domain(parts.hostname) or parts.netloc.lower()
+        if domain in self.promoted:
+            self.promoted.discard(domain)
+            return True
+        if domain in self.seeded:
+            return False
+        self.seeded.add(domain)
+        self.counter.discard(domain)
+        return True
+
+    def promote(self, n, max_domains):
+        """Seed URLs for up to `n` of the best-linked unseeded domains, stopping at `max_domains` seeded."""
+        n = min(n, max_domains - len(self.seeded))
+        if n <= 0:
+            return []
+        urls = []
+        for domain, _, url in self.counter.top(n, self.min_inlinks):
+            self.counter.discard(domain)
+            self.seeded.add(domain)
+            self.promoted.add(domain)
+            urls.append(url)
+        return urls
+
+
+def discovery_options(settings):
+    """DomainDiscovery arguments from the AUTODISCOVER_* settings."""
+    return {
+        'min_inlinks': settings.getint('AUTODISCOVER_MIN_INLINKS', 2),
+        'width': settings.getint('AUTODISCOVER_SKETCH_WIDTH', 1 << 18),
+        'depth': settings.getint('AUTODISCOVER_SKETCH_DEPTH', 4),
+        'top_k': settings.getint('AUTODISCOVER_CANDIDATES', 10000),
+        'pair_capacity': settings.getint('AUTODISCOVER_PAIR_CAPACITY', 1 << 21),
+    }
+
+
+def acquire_discovery(**kwargs):
+    """Returns the process-wide DomainDiscovery, creating it on first use."""
+    global _shared_index
+    with _shared_lock:
+        if _shared_index is None:
+            _shared_index = DomainDiscovery(**kwargs)
+        _shared_index.refs += 1
+        return _shared_index
+
+
+def release_discovery(index):
+    """Drops one reference; the last one frees the index."""
+    global _shared_index
+    with _shared_lock:
+        index.refs -= 1
+        if index.refs <= 0 and _shared_index is index:
+            _shared_index = None
@@ -0,0 +1,301 @@
+# greek_scraper/dupefilters.py
+import hashlib
+import json
+import math
+import os
+import threading
+from array import array
+
+from scrapy.dupefilters import BaseDupeFilter
+from w3lib.url import canonicalize_url
+
+# Persistent stores shared by every dupefilter in the process that uses the same path
+_shared_stores = {}
+_shared_lock = threading.Lock()
+
+
+def canonical_url(url):
+    """Canonical form used for dedup: sorted query, no fragment, lower-case scheme and host."""
+    return canonicalize_url(url)
+
+
+def url_hash(key):
+    """Unsigned 64-bit hash of a dedup key. 0 is reserved for empty slots."""
+    h = int.from_bytes(hashlib.blake2b(key.encode('utf-8', errors='replace'), digest_size=8).digest(), 'big')
+    return h or 1
+
+
+class HashSet:
+    """
+    Open-addressing set of 64-bit hashes in one flat array('Q'): 8 bytes per slot,
+    kept at most `max_load` full, so roughly 12-16 bytes per URL.
+    """
+
+    def __init__(self, capacity=1 << 16, max_load=0.7):
+        size = 1 << max(4, math.ceil(math.log2(max(16, capacity / max_load))))
+        self.max_load = max_load
+        self.count = 0
+        self._alloc(size)
+
+    def _alloc(self, size):
+        self.table = array('Q', bytes(8 * size))
+        self.mask = size - 1
+        self.limit = int(size * self.max_load)
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def nbytes(self):
+        return self.table.itemsize * len(self.table)
+
+    def add(self, h):
+        """Inserts a hash. Returns True if it was not in the set before."""
+        table = self.table
+        mask = self.mask
+        i = h & mask
+        while True:
+            v = table[i]
+            if v == 0:
+                table[i] = h
+                self.count += 1
+                if self.count > self.limit:
+                    self._grow()
+                return True
+            if v == h:
+                return False
+            i = (i + 1) & mask
+
+    def __contains__(self, h):
+        table = self.table
+        mask = self.mask
+        i = h & mask
+        while True:
+            v = table[i]
+            if v == 0:
+                return False
+            if v == h:
+                return True
+            i = (i + 1) & mask
+
+    def _grow(self):
+        old = self.table
+        self._alloc(len(old) * 2)
+        self.count = 0
+        for h in old:
+            if h:
+                self.add(h)
+
+    def dump(self, f):
+        f.write(json.dumps({'kind': 'hashset', 'count': self.count, 'size': len(self.table),
+                            'max_load': self.max_load}).encode('ascii') + b'\n')
+        self.table.tofile(f)
+
+    @classmethod
+    def load(cls, header, f):
+        obj = cls.__new__(cls)
+        obj.max_load = header['max_load']
+        obj.count = header['count']
+        obj.table = array('Q')
+        obj.table.fromfile(f, header['size'])
+        obj.mask = header['size'] - 1
+        obj.limit = int(header['size'] * obj.max_load)
+        return obj
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over 64-bit hashes (double hashing for the k probes)."""
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = max(1, int(capacity))
+        self.error_rate = error_rate
+        self.nbits = max(8, math.ceil(-self.capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.k = max(1, round(self.nbits / self.capacity * math.log(2)))
+        self.bits = bytearray((self.nbits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, h):
+        h1 = h & 0xFFFFFFFF
+        h2 = (h >> 32) | 1
+        nbits = self.nbits
+        return [(h1 + i * h2) % nbits for i in range(self.k)]
+
+    def __contains__(self, h):
+        bits = self.bits
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in self._positions(h))
+
+    def add(self, h):
+        bits = self.bits
+        new = False
+        for p in self._positions(h):
+            byte, bit = p >> 3, 1 << (p & 7)
+            if not bits[byte] & bit:
+                bits[byte] |= bit
+                new = True
+        if new:
+            self.count += 1
+        return new
+
+
+class ScalableBloomFilter:
+    """
+    Bloom filter that adds a new, twice as large stage whenever the current one
+    is full, tightening each stage's error rate so the overall false-positive
+    rate stays below `error_rate` however many URLs arrive.
+    """
+
+    GROWTH = 2
+    TIGHTENING = 0.5
+
+    def __init__(self, capacity=1 << 16, error_rate=0.001):
+        self.initial_capacity = capacity
+        self.error_rate = error_rate
+        self.filters = []
+        self._add_stage()
+
+    def _add_stage(self):
+        n = len(self.filters)
+        self.filters.append(BloomFilter(self.initial_capacity * self.GROWTH ** n,
+                                        self.error_rate * (1 - self.TIGHTENING) * self.TIGHTENING ** n))
+
+    def __len__(self):
+        return sum(f.count for f in self.filters)
+
+    @property
+    def nbytes(self):
+        return sum(len(f.bits) for f in self.filters)
+
+    def __contains__(self, h):
+        return any(h in f for f in self.filters)
+
+    def add(self, h):
+        if h in self:
+            return False
+        current = self.filters[-1]
+        if current.count >= current.capacity:
+            self._add_stage()
+            current = self.filters[-1]
+        current.add(h)
+        return True
+
+    def dump(self, f):
+        f.write(json.dumps({
+            'kind': 'bloom',
+            'initial_capacity': self.initial_capacity,
+            'error_rate': self.error_rate,
+            'stages': [{'count': s.count, 'size': len(s.bits)} for s in self.filters],
+        }).encode('ascii') + b'\n')
+        for stage in self.filters:
+            f.write(stage.bits)
+
+    @classmethod
+    def load(cls, header, f):
+        obj = cls.__new__(cls)
+        obj.initial_capacity = header['initial_capacity']
+        obj.error_rate = header['error_rate']
+        obj.filters = []
+        for stage in header['stages']:
+            obj._add_stage()
+            obj.filters[-1].bits = bytearray(f.read(stage['size']))
+            obj.filters[-1].count = stage['count']
+        return obj
+
+
+def load_store(path):
+    with open(path, 'rb') as f:
+        header = json.loads(f.readline())
+        if header['kind'] == 'bloom':
+            return ScalableBloomFilter.load(header, f)
+        return HashSet.load(header, f)
+
+
+def acquire_store(path, factory):
+    """Returns the process-wide store for `path`, loading it (or calling `factory`) on first use."""
+    key = os.path.abspath(path)
+    with _shared_lock:
+        entry = _shared_stores.get(key)
+        if entry is None:
+            store = load_store(path) if os.path.exists(path) else factory()
+            entry = _shared_stores[key] = [store, 0]
+        entry[1] += 1
+        return entry[0]
+
+
+def release_store(path):
+    """Drops one reference; the last one writes the store back to `path`. Returns True if it wrote."""
+    key = os.path.abspath(path)
+    with _shared_lock:
+        entry = _shared_stores[key]
+        entry[1] -= 1
+        if entry[1] > 0:
+            return False
+        del _shared_stores[key]
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        entry[0].dump(f)
+    os.replace(tmp_path, path)
+    return True
+
+
+class CompactDupeFilter(BaseDupeFilter):
+    """
+    Request dupefilter that stores 8-byte hashes of canonicalized URLs instead
+    of Scrapy's SHA1 hex fingerprints in a Python set.
+
+    DUPEFILTER_MODE='hashset' (default) is exact up to 64-bit hash collisions;
+    'bloom' uses a scalable Bloom filter with DUPEFILTER_ERROR_RATE false
+    positives, about half the memory again. DUPEFILTER_PATH (or JOBDIR) makes
+    the filter persistent across runs; spiders in one process that point at the
+    same path share a single filter, which is written back when the last closes.
+    """
+
+    def __init__(self, path=None, mode='hashset', capacity=1 << 16, error_rate=0.001, debug=False):
+        self.path = path
+        self.mode = mode
+        self.debug = debug
+        self.logdupes = True
+        self._closed = False
+
+        def factory():
+            if mode == 'bloom':
+                return ScalableBloomFilter(capacity, error_rate)
+            return HashSet(capacity)
+
+        self.store = acquire_store(path, factory) if path else factory()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        path = settings.get('DUPEFILTER_PATH')
+        if not path and settings.get('JOBDIR'):
+            path = os.path.join(settings.get('JOBDIR'), 'urls.seen.bin')
+        return cls(
+            path=path,
+            mode=settings.get('DUPEFILTER_MODE', 'hashset'),
+            capacity=settings.getint('DUPEFILTER_CAPACITY', 1 << 16),
+            error_rate=settings.getfloat('DUPEFILTER_ERROR_RATE', 0.001),
+            debug=settings.getbool('DUPEFILTER_DEBUG'),
+        )
+
+    def request_key(self, request):
+        url = canonical_url(request.url)
+        if request.method == 'GET' and not request.body:
+            return url
+        return f"{request.method} {url} {hashlib.blake2b(request.body, digest_size=8).hexdigest()}"
+
+    def request_seen(self, request):
+        return not self.store.add(url_hash(self.request_key(request)))
+
+    def close(self, reason):
+        if self.path and not self._closed:
+            self._closed = True
+            release_store(self.path)
+
+    def log(self, request, spider):
+        if self.debug:
+            spider.logger.debug(f"Filtered duplicate request: {request}")
+        elif self.logdupes:
+            spider.logger.debug(f"Filtered duplicate request: {request} - no more duplicates will be shown "
+                                f"(see DUPEFILTER_DEBUG to show all duplicates)")
+            self.logdupes = False
+        spider.crawler.stats.inc_value('dupefilter/filtered', spider=spider)
@@ -0,0 +1,138 @@
+# greek_scraper/extraction.py
+import multiprocessing
+import os
+import signal
+import threading
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from twisted.internet.defer import Deferred
+from twisted.python.failure import Failure
+
+# Process-wide pools keyed by (workers, start_method), shared by every spider in
+# a multi-domain run so they don't each fork a full set of workers.
+_shared_pools = {}
+_shared_lock = threading.Lock()
+
+
+class ExtractionTimeout(Exception):
+    """A document took longer than the per-document timeout to extract."""
+
+
+def default_workers():
+    """One worker per usable core, leaving one for the reactor."""
+    if hasattr(os, 'sched_getaffinity'):
+        cores = len(os.sched_getaffinity(0))  # Honors container CPU pinning
+    else:
+        cores = os.cpu_count() or 1
+    return max(1, cores - 1)
+
+
+def _on_alarm(signum, frame):
+    raise ExtractionTimeout()
+
+
+def extract_text(html, timeout=None):
+    """Runs trafilatura on one document. Called in a worker process."""
+    from trafilatura import extract  # Inherited from the parent with fork, imported once per worker otherwise
+
+    # Tasks run on the worker's main thread, so a timer signal can interrupt a
+    # pathological page and free the worker for the next one.
+    use_alarm = bool(timeout) and hasattr(signal, 'setitimer')
+    if use_alarm:
+        signal.signal(signal.SIGALRM, _on_alarm)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        text = extract(html) or ""
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    return unicodedata.normalize('NFKC', text).strip()
+
+
+class ExtractionPool:
+    """
+    ProcessPoolExecutor whose results come back to the reactor as Deferreds.
+    A pool broken by a crashed worker is replaced on the next submit.
+    """
+
+    def __init__(self, workers=None, start_method=None):
+        self.workers = workers or default_workers()
+        self.start_method = start_method
+        self.refs = 0
+        self.closed = False
+        self.executor = self._new_executor()
+
+    def _new_executor(self):
+        context = multiprocessing.get_context(self.start_method)
+        executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+        if context.get_start_method() == 'fork':
+            # Forked workers all start on the first submit and copy this process. Start them
+            # now, before the crawl's threads are busy, with trafilatura already imported so
+            # every worker shares it instead of importing its own copy.
+            import trafilatura  # noqa: F401
+            executor.submit(default_workers)
+        return executor
+
+    def submit(self, html, timeout=None):
+        """Extracts `html` in a worker. Must be called on the reactor thread."""
+        from twisted.internet import reactor
+
+        try:
+            future = self.executor.submit(extract_text, html, timeout)
+        except BrokenProcessPool:
+            # The old pool's threads have already given up; join them before forking again.
+            self.executor.shutdown(wait=True)
+            self.executor = self._new_executor()
+            future = self.executor.submit(extract_text, html, timeout)
+
+        d = Deferred(lambda _: future.cancel())  # Cancelling drops it if no worker has started it
+        future.add_done_callback(lambda f: reactor.callFromThread(self._fire, d, f))
+        if timeout:
+            # Backstop for platforms without SIGALRM, where the worker can't interrupt itself.
+            d.addTimeout(timeout * 2, reactor)
+        return d
+
+    @staticmethod
+    def _fire(d, future):
+        if d.called:
+            return  # Timed out already
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            d.errback(Failure(error))
+        else:
+            d.callback(future.result())
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+
+def acquire_pool(workers=None, start_method=None):
+    """Returns the process-wide extraction pool for these options, starting it on first use."""
+    key = (workers or default_workers(), start_method)
+    with _shared_lock:
+        pool = _shared_pools.get(key)
+        if pool is None or pool.closed:
+            pool = ExtractionPool(*key)
+            _shared_pools[key] = pool
+        pool.refs += 1
+        return pool
+
+
+def release_pool(pool):
+    """Drops one reference; the last one shuts the workers down. Returns True if it closed."""
+    with _shared_lock:
+        pool.refs -= 1
+        if pool.refs > 0:
+            return False
+        key = (pool.workers, pool.start_method)
+        if _shared_pools.get(key) is pool:
+            del _shared_pools[key]
+    pool.close()
+    return True
@@ -0,0 +1,354 @@
+# greek_scraper/formats.py
+import abc
+import gzip
+import json
+import os
+import pickle
+import time
+
+# Output formats understood by open_sink. Compression libraries (zstandard,
+# pyarrow) are optional and only imported when their format is selected.
+# 'pipe' hands items to another process instead of a file (see stream.py).
+OUTPUT_FORMATS = ['jsonl', 'jsonl.gz', 'jsonl.zst', 'parquet', 'pipe']
+
+_SUFFIXES = {
+    'jsonl': '.jsonl',
+    'jsonl.gz': '.jsonl.gz',
+    'jsonl.zst': '.jsonl.zst',
+    'parquet': '.parquet',
+}
+
+
+def detect_format(path):
+    """Guesses the output format from the file name, defaulting to plain JSONL."""
+    name = path.lower()
+    if name.startswith('pipe:'):
+        return 'pipe'
+    if name.endswith('.parquet'):
+        return 'parquet'
+    if name.endswith('.gz'):
+        return 'jsonl.gz'
+    if name.endswith('.zst'):
+        return 'jsonl.zst'
+    return 'jsonl'
+
+
+def open_sink(path, output_format=None, shard_max_bytes=None, shard_max_records=None,
+              compression_level=None, row_group_size=10000):
+    """Creates the sink that writes `path` in `output_format` (guessed from the name if None)."""
+    output_format = output_format or detect_format(path)
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format '{output_format}'. Choose from: {', '.join(OUTPUT_FORMATS)}")
+    if output_format == 'pipe':
+        return PipeSink(path)
+    if output_format == 'parquet':
+        return ParquetSink(path, shard_max_bytes=shard_max_bytes, shard_max_records=shard_max_records,
+                           compression_level=compression_level, row_group_size=row_group_size)
+    return JsonlSink(path, output_format=output_format, shard_max_bytes=shard_max_bytes,
+                     shard_max_records=shard_max_records, compression_level=compression_level)
+
+
+def record_chars(record):
+    """Rough in-memory size of a dict record, for buffer limits."""
+    return sum(len(v) if isinstance(v, str) else sum(len(x) for x in v) if isinstance(v, list) else 8
+               for v in record.values())
+
+
+class ShardedSink(abc.ABC):
+    """
+    Shared bookkeeping for sinks: numbered shard names, size/record based
+    rotation and the JSON manifest listing every shard that was written.
+    """
+
+    output_format = None
+    sharded = True
+
+    def __init__(self, path, shard_max_bytes=None, shard_max_records=None):
+        self.path = path
+        self.shard_max_bytes = shard_max_bytes
+        self.shard_max_records = shard_max_records
+        self.base = self._strip_suffix(path)
+        self.manifest_path = f"{self.base}.manifest.json"
+        self.shards = self._load_manifest()
+        self.shard_index = len(self.shards)
+        self.shard_path = None
+        self.shard_records = 0
+        self.closed_bytes = sum(s['bytes'] for s in self.shards)
+
+    @property
+    def bytes_written(self):
+        return self.closed_bytes + self.current_bytes()
+
+    def record_size(self, record):
+        return len(record)
+
+    @abc.abstractmethod
+    def current_bytes(self):
+        """Bytes written to the open shard so far."""
+
+    def _strip_suffix(self, path):
+        for suffix in sorted(_SUFFIXES.values(), key=len, reverse=True):
+            if path.lower().endswith(suffix):
+                return path[:-len(suffix)]
+        return os.path.splitext(path)[0]
+
+    def _next_shard_path(self):
+        # Skip names left behind by earlier runs that never made it into a manifest.
+        while True:
+            candidate = f"{self.base}-{self.shard_index:05d}{_SUFFIXES[self.output_format]}"
+            self.shard_index += 1
+            if not os.path.exists(candidate):
+                return candidate
+
+    def _should_rotate(self):
+        if self.shard_max_records and self.shard_records >= self.shard_max_records:
+            return True
+        if self.shard_max_bytes and self.current_bytes() >= self.shard_max_bytes:
+            return True
+        return False
+
+    def _finish_shard(self, size):
+        self.shards.append({
+            'path': os.path.basename(self.shard_path),
+            'records': self.shard_records,
+            'bytes': size,
+            'closed_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        })
+        self.closed_bytes += size
+        self.shard_path = None
+        self.shard_records = 0
+        self._write_manifest()
+
+    def _load_manifest(self):
+        if not self.sharded or not os.path.exists(self.manifest_path):
+            return []
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f).get('shards', [])
+        except (OSError, ValueError):
+            return []
+
+    def _write_manifest(self):
+        manifest = {
+            'format': self.output_format,
+            'records': sum(s['records'] for s in self.shards),
+            'bytes': sum(s['bytes'] for s in self.shards),
+            'shards': self.shards,
+        }
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+
+class JsonlSink(ShardedSink):
+    """
+    JSON Lines, optionally gzip or zstd compressed as a stream. Without any
+    shard limit it appends to `path` itself, exactly like the plain writer did.
+    """
+
+    def __init__(self, path, output_format='jsonl', shard_max_bytes=None, shard_max_records=None,
+                 compression_level=None):
+        self.output_format = output_format
+        self.sharded = bool(shard_max_bytes or shard_max_records)
+        self.compression_level = compression_level
+        super().__init__(path, shard_max_bytes=shard_max_bytes, shard_max_records=shard_max_records)
+        self.raw = None
+        self.stream = None
+        self.start_offset = 0
+
+    def serialize(self, item):
+        return json.dumps(item, ensure_ascii=False) + "\n"
+
+    def current_bytes(self):
+        return self.raw.tell() - self.start_offset if self.raw is not None else 0
+
+    def write(self, records):
+        if self.stream is None:
+            self._open()
+        self.stream.write(''.join(records).encode('utf-8', errors='replace'))
+        self.shard_records += len(records)
+        if self.sharded and self._should_rotate():
+            self._close_shard()
+
+    def sync(self):
+        if self.stream is None:
+            return
+        self.stream.flush()
+        self.raw.flush()
+        os.fsync(self.raw.fileno())
+
+    def flush(self):
+        if self.stream is not None:
+            self.stream.flush()
+            self.raw.flush()
+
+    def close(self):
+        if self.stream is not None:
+            self._close_shard()
+
+    def _open(self):
+        self.shard_path = self._next_shard_path() if self.sharded else self.path
+        self.raw = open(self.shard_path, 'ab')
+        self.start_offset = self.raw.tell()  # Appending to an existing file
+        if self.output_format == 'jsonl.gz':
+            level = 6 if self.compression_level is None else self.compression_level
+            self.stream = gzip.GzipFile(fileobj=self.raw, mode='ab', compresslevel=level)
+        elif self.output_format == 'jsonl.zst':
+            import zstandard  # Optional dependency, only needed for .zst output
+            level = 3 if self.compression_level is None else self.compression_level
+            self.stream = zstandard.ZstdCompressor(level=level).stream_writer(self.raw, closefd=False)
+        else:
+            self.stream = self.raw
+
+    def _close_shard(self):
+        if self.stream is not self.raw:
+            self.stream.close()  # Writes the gzip trailer / final zstd frame
+        self.raw.flush()
+        size = self.current_bytes()
+        self.raw.close()
+        self.raw = None
+        self.stream = None
+        if self.sharded:
+            self._finish_shard(size)
+        else:
+            self.closed_bytes += size
+            self.shard_records = 0
+
+
+class ParquetSink(ShardedSink):
+    """
+    Columnar output through pyarrow. Rows are grouped into row groups of
+    `row_group_size`; every shard is a complete Parquet file, so records only
+    become readable once their shard is closed.
+    """
+
+    output_format = 'parquet'
+
+    def __init__(self, path, shard_max_bytes=None, shard_max_records=None, compression_level=None,
+                 row_group_size=10000):
+        import pyarrow  # Optional dependency, only needed for Parquet output
+        import pyarrow.parquet
+        self.pa = pyarrow
+        self.pq = pyarrow.parquet
+        self.compression_level = compression_level
+        self.row_group_size = max(1, row_group_size)
+        super().__init__(path, shard_max_bytes=shard_max_bytes, shard_max_records=shard_max_records)
+        # Fixed types for the fields items are known to carry, so a group where one is always
+        # empty or missing doesn't decide its type for the rest of the shard.
+        self.item_types = {
+            'url': pyarrow.string(),
+            'text': pyarrow.string(),
+            'links': pyarrow.list_(pyarrow.string()),
+            'duplicate': pyarrow.string(),
+            'duplicate_of': pyarrow.string(),
+        }
+        self.schema = None
+        self.writer = None
+        self.rows = []
+
+    def serialize(self, item):
+        return dict(item)
+
+    def record_size(self, record):
+        return record_chars(record)
+
+    def current_bytes(self):
+        if self.shard_path is None or not os.path.exists(self.shard_path):
+            return 0
+        return os.path.getsize(self.shard_path)
+
+    def write(self, records):
+        self.rows.extend(records)
+        while len(self.rows) >= self.row_group_size:
+            self._write_row_group(self.rows[:self.row_group_size])
+            self.rows = self.rows[self.row_group_size:]
+            if self._should_rotate():
+                self._close_shard()
+
+    def sync(self):
+        pass  # A Parquet file is only readable once its footer is written on close
+
+    def flush(self):
+        pass
+
+    def close(self):
+        if self.rows:
+            self._write_row_group(self.rows)
+            self.rows = []
+        if self.writer is not None:
+            self._close_shard()
+
+    def _write_row_group(self, rows):
+        schema = self._schema_for(rows)
+        if self.writer is not None and schema != self.schema:
+            self._close_shard()  # A Parquet file has a single schema: the new one starts a new shard
+        self.schema = schema
+        table = self.pa.Table.from_pylist(rows, schema=schema)  # Columns these rows lack are null
+        if self.writer is None:
+            self.shard_path = self._next_shard_path()
+            self.writer = self.pq.ParquetWriter(self.shard_path, self.schema, compression='zstd',
+                                                compression_level=self.compression_level)
+        self.writer.write_table(table, row_group_size=self.row_group_size)
+        self.shard_records += len(rows)
+
+    def _schema_for(self, rows):
+        """
+        The current schema plus the columns `rows` add, from the keys of every
+        row (Table.from_pylist would only look at the first). A column typed
+        null (no value seen yet) takes the first real type, and one whose
+        values changed type takes the new one.
+        """
+        is_null = self.pa.types.is_null
+        types = {field.name: field.type for field in self.schema} if self.schema is not None else {}
+        for name in dict.fromkeys(name for row in rows for name in row):
+            if name in self.item_types:
+                types[name] = self.item_types[name]
+                continue
+            inferred = self.pa.array([row.get(name) for row in rows]).type
+            current = types.get(name)
+            if current is None or is_null(current) or not is_null(inferred):
+                types[name] = inferred
+        return self.pa.schema(list(types.items()))
+
+    def _close_shard(self):
+        self.writer.close()
+        self.writer = None
+        self._finish_shard(os.path.getsize(self.shard_path))
+
+
+class PipeSink:
+    """
+    Sends each chunk of records, pickled, over an inherited pipe
+    ('pipe:<fd>') to the process reading it (see stream.py). A reader that
+    falls behind blocks the writer thread, which in turn holds back the
+    pipelines: nothing piles up in between.
+    """
+
+    output_format = 'pipe'
+
+    def __init__(self, path):
+        from multiprocessing.connection import Connection
+        self.path = path
+        self.conn = Connection(int(path.split(':', 1)[1]), readable=False)
+        self.bytes_written = 0
+
+    def serialize(self, item):
+        return dict(item)
+
+    def record_size(self, record):
+        return record_chars(record)
+
+    def write(self, records):
+        data = pickle.dumps(records, protocol=pickle.HIGHEST_PROTOCOL)
+        self.conn.send_bytes(data)
+        self.bytes_written += len(data)
+
+    def sync(self):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.conn.close()  # The reader sees the end of the stream
@@ -0,0 +1,270 @@
+# greek_scraper/frontier.py
+import hashlib
+import os
+import queue
+import sqlite3
+import threading
+
+from greek_scraper.dupefilters import HashSet
+
+# URL states
+QUEUED = 0
+DONE = 1
+FAILED = 2
+
+# Domain states
+DOMAIN_ACTIVE = 1
+DOMAIN_FINISHED = 2
+
+# Process-wide frontiers keyed by absolute database path, shared by every spider
+# that resumes from the same file.
+_shared_frontiers = {}
+_shared_lock = threading.Lock()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS urls (
+    fp INTEGER PRIMARY KEY,
+    url TEXT NOT NULL,
+    domain TEXT NOT NULL,
+    depth INTEGER NOT NULL DEFAULT 0,
+    state INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS urls_domain_state ON urls (domain, state);
+CREATE TABLE IF NOT EXISTS domains (
+    domain TEXT PRIMARY KEY,
+    state INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+def url_fingerprint(url):
+    """Signed 64-bit hash of a URL, used as the SQLite rowid."""
+    return int.from_bytes(hashlib.blake2b(url.encode('utf-8', errors='replace'), digest_size=8).digest(),
+                          'big', signed=True)
+
+
+def hashset_key(fp):
+    """A fingerprint as a HashSet entry: unsigned, and never 0 (its empty slot)."""
+    return (fp & 0xFFFFFFFFFFFFFFFF) or 1
+
+
+class Frontier:
+    """
+    On-disk crawl frontier in SQLite: which URLs are queued, done or failed and
+    which domains are active or finished, so a crashed run can resume without
+    re-fetching.
+
+    Updates are collected in memory and committed in batches by a dedicated
+    thread every `flush_interval` seconds or `flush_ops` updates, so the reactor
+    never waits on disk. Whether a URL was seen is answered from an in-memory
+    HashSet of every known fingerprint (about 12-16 bytes per URL), loaded
+    once when the frontier opens, so adding links never queries the database.
+    state() and domain_state() check the not-yet-committed updates first and
+    then the database through a separate read connection (WAL mode lets it
+    read while the writer commits); they belong to the startup/resume path.
+    """
+
+    def __init__(self, path, flush_interval=1.0, flush_ops=5000):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.flush_ops = max(1, flush_ops)
+        self.refs = 0
+        self.last_error = None
+
+        self._write_conn = self._connect()  # Used only by the writer thread after this
+        self._write_conn.executescript(SCHEMA)
+        self._write_conn.commit()
+        self._read_conn = self._connect()
+        self._known = self._load_known()
+
+        self._lock = threading.Lock()
+        self._pending = {}   # fp -> (url, domain, depth, state), not yet handed to the writer
+        self._flushing = {}  # fp -> ..., being committed right now
+        self._pending_domains = {}
+        self._wakeup = queue.Queue()
+        self._closed = False
+
+        self._thread = threading.Thread(target=self._run, name='greek_scraper-frontier', daemon=True)
+        self._thread.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def _load_known(self):
+        count = self._read_conn.execute('SELECT COUNT(*) FROM urls').fetchone()[0]
+        known = HashSet(capacity=max(1 << 16, count))
+        for (fp,) in self._read_conn.execute('SELECT fp FROM urls'):
+            known.add(hashset_key(fp))
+        return known
+
+    # ---- lookups (reactor thread) ----
+
+    def state(self, url):
+        """
+        Returns QUEUED/DONE/FAILED for a known URL, or None if the frontier never saw it.
+
+        Unknown URLs and uncommitted updates are answered from memory; the state
+        of a committed URL is read from disk, so this is for the startup/resume
+        path and tools, not for per-link checks while crawling (use seen()).
+        """
+        fp = url_fingerprint(url)
+        if hashset_key(fp) not in self._known:
+            return None
+        with self._lock:
+            entry = self._pending.get(fp) or self._flushing.get(fp)
+        if entry is not None:
+            return entry[3]
+        row = self._read_conn.execute('SELECT state FROM urls WHERE fp = ?', (fp,)).fetchone()
+        return row[0] if row else None
+
+    def seen(self, url):
+        return hashset_key(url_fingerprint(url)) in self._known
+
+    def domain_state(self, domain):
+        """Like state(), for a domain; read from disk, so called once per domain at start."""
+        with self._lock:
+            if domain in self._pending_domains:
+                return self._pending_domains[domain]
+        row = self._read_conn.execute('SELECT state FROM domains WHERE domain = ?', (domain,)).fetchone()
+        return row[0] if row else None
+
+    def queued(self, domain=None, batch_size=1000):
+        """Yields (url, depth) for every URL still queued, read from disk in short batches."""
+        # Keyset pagination on fp: no read transaction stays open between batches.
+        where, params = 'state = ?', [QUEUED]
+        if domain is not None:
+            where, params = 'domain = ? AND state = ?', [domain, QUEUED]
+        last_fp = None
+        while True:
+            if last_fp is None:
+                rows = self._read_conn.execute(
+                    f'SELECT fp, url, depth FROM urls WHERE {where} ORDER BY fp LIMIT ?',
+                    params + [batch_size]).fetchall()
+            else:
+                rows = self._read_conn.execute(
+                    f'SELECT fp, url, depth FROM urls WHERE {where} AND fp > ? ORDER BY fp LIMIT ?',
+                    params + [last_fp, batch_size]).fetchall()
+            if not rows:
+                return
+            last_fp = rows[-1][0]
+            for _, url, depth in rows:
+                yield url, depth
+
+    def queued_counts(self):
+        """Number of URLs still queued per domain, as committed on disk."""
+        rows = self._read_conn.execute(
+            'SELECT domain, COUNT(*) FROM urls WHERE state = ? GROUP BY domain', (QUEUED,)).fetchall()
+        return dict(rows)
+
+    def counts(self):
+        """URL counts per state, as committed on disk."""
+        rows = self._read_conn.execute('SELECT state, COUNT(*) FROM urls GROUP BY state').fetchall()
+        return {state: count for state, count in rows}
+
+    # ---- updates (reactor thread, committed in the background) ----
+
+    def add(self, url, domain, depth=0):
+        """Records a newly discovered URL as queued. Returns False if it was already known."""
+        fp = url_fingerprint(url)
+        if not self._known.add(hashset_key(fp)):
+            return False
+        self._update(fp, (url, domain, depth, QUEUED))
+        return True
+
+    def mark(self, url, domain, state=DONE, depth=0):
+        fp = url_fingerprint(url)
+        self._known.add(hashset_key(fp))
+        self._update(fp, (url, domain, depth, state))
+
+    def mark_domain(self, domain, state):
+        with self._lock:
+            self._pending_domains[domain] = state
+            size = len(self._pending) + len(self._pending_domains)
+        if size >= self.flush_ops:
+            self._wakeup.put(True)
+
+    def _update(self, fp, entry):
+        with self._lock:
+            self._pending[fp] = entry
+            size = len(self._pending) + len(self._pending_domains)
+        if size >= self.flush_ops:
+            self._wakeup.put(True)
+
+    def close(self):
+        """Commits everything still pending and closes the database."""
+        if self._closed:
+            return
+        self._closed = True
+        self._wakeup.put(None)
+        self._thread.join()
+        self._read_conn.close()
+
+    # ---- writer thread ----
+
+    def _run(self):
+        try:
+            while True:
+                try:
+                    stop = self._wakeup.get(timeout=self.flush_interval) is None
+                except queue.Empty:
+                    stop = False
+                self._commit()
+                if stop:
+                    return
+        finally:
+            self._write_conn.close()
+
+    def _commit(self):
+        with self._lock:
+            if not self._pending and not self._pending_domains:
+                return
+            self._flushing, self._pending = self._pending, {}
+            domains, self._pending_domains = self._pending_domains, {}
+        try:
+            with self._write_conn:
+                # New URLs never overwrite a known state; explicit marks always do.
+                self._write_conn.executemany(
+                    'INSERT INTO urls (fp, url, domain, depth, state) VALUES (?, ?, ?, ?, ?) '
+                    'ON CONFLICT(fp) DO UPDATE SET state = excluded.state '
+                    'WHERE excluded.state != ?',
+                    [(fp, url, domain, depth, state, QUEUED)
+                     for fp, (url, domain, depth, state) in self._flushing.items()],
+                )
+                self._write_conn.executemany(
+                    'INSERT INTO domains (domain, state) VALUES (?, ?) '
+                    'ON CONFLICT(domain) DO UPDATE SET state = excluded.state',
+                    list(domains.items()),
+                )
+        except Exception as e:
+            self.last_error = e
+        finally:
+            with self._lock:
+                self._flushing = {}
+
+
+def acquire_frontier(path, **kwargs):
+    """Returns the process-wide frontier for `path`, opening it on first use."""
+    key = os.path.abspath(path)
+    with _shared_lock:
+        frontier = _shared_frontiers.get(key)
+        if frontier is None or frontier._closed:
+            frontier = Frontier(path, **kwargs)
+            _shared_frontiers[key] = frontier
+        frontier.refs += 1
+        return frontier
+
+
+def release_frontier(frontier):
+    """Drops one reference; the last one commits and closes the frontier. Returns True if it closed."""
+    with _shared_lock:
+        frontier.refs -= 1
+        if frontier.refs > 0:
+            return False
+        key = os.path.abspath(frontier.path)
+        if _shared_frontiers.get(key) is frontier:
+            del _shared_frontiers[key]
+    frontier.close()
+    return True
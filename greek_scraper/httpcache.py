@@ -0,0 +1,454 @@
+# greek_scraper/httpcache.py
+import hashlib
+import os
+import pickle
+import queue
+import sqlite3
+import threading
+import time
+import zlib
+
+from scrapy.http import Headers, HtmlResponse
+from scrapy.responsetypes import responsetypes
+from scrapy.utils.project import data_path
+
+from greek_scraper.metrics import metrics
+
+# Process-wide caches keyed by absolute database path, shared by every spider
+# of a multi-domain run.
+_shared_caches = {}
+_shared_lock = threading.Lock()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    fp INTEGER PRIMARY KEY,
+    url TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    headers BLOB NOT NULL,
+    body_id INTEGER NOT NULL,
+    stored REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_lru ON responses (accessed);
+CREATE INDEX IF NOT EXISTS responses_body ON responses (body_id);
+CREATE TABLE IF NOT EXISTS bodies (
+    id INTEGER PRIMARY KEY,
+    size INTEGER NOT NULL,
+    refs INTEGER NOT NULL,
+    codec INTEGER NOT NULL,
+    data BLOB NOT NULL
+);
+"""
+
+# Body codecs, as stored in bodies.codec.
+RAW, ZLIB, ZSTD = 0, 1, 2
+CODECS = {'none': RAW, 'zlib': ZLIB, 'zstd': ZSTD}
+
+# Text-only mode: elements dropped with their content, and the attributes kept.
+DROP_TAGS = ('script', 'style', 'noscript', 'template', 'svg', 'canvas', 'iframe', 'object', 'embed', 'form')
+KEEP_ATTRIBUTES = frozenset(('href', 'lang', 'class', 'id'))
+EVICT_BATCH = 500
+DECODE_CHUNK = 4096  # Compressed bytes fed to the brotli decoder at a time
+
+
+def _key(fingerprint):
+    """First 8 bytes of a 20-byte request fingerprint, as an SQLite INTEGER key."""
+    return int.from_bytes(fingerprint[:8], 'big', signed=True)
+
+
+def body_id(body):
+    return int.from_bytes(hashlib.blake2b(body, digest_size=8).digest(), 'big', signed=True)
+
+
+def _inflate(body, wbits, max_size):
+    data = zlib.decompressobj(wbits).decompress(body, max_size + 1 if max_size else 0)
+    if max_size and len(data) > max_size:
+        raise ValueError(f"Decoded body larger than {max_size} bytes")
+    return data
+
+
+def decode_content(body, encoding, max_size=0):
+    """
+    Undoes a single Content-Encoding. Raises ValueError for one it doesn't
+    know, or once the decoded body grows past `max_size` bytes (0: no limit),
+    so a compression bomb is given up on instead of inflated into memory.
+    """
+    encoding = encoding.strip().lower()
+    if encoding in (b'gzip', b'x-gzip'):
+        return _inflate(body, 16 + zlib.MAX_WBITS, max_size)
+    if encoding == b'deflate':
+        try:
+            return _inflate(body, zlib.MAX_WBITS, max_size)
+        except zlib.error:
+            return _inflate(body, -zlib.MAX_WBITS, max_size)  # Raw deflate, as some servers send it
+    if encoding == b'br':
+        import brotli
+        decompressor = brotli.Decompressor()
+        chunks, size = [], 0
+        for start in range(0, len(body), DECODE_CHUNK):  # Fed in small pieces so the limit is checked as it grows
+            chunk = decompressor.process(body[start:start + DECODE_CHUNK])
+            size += len(chunk)
+            if max_size and size > max_size:
+                raise ValueError(f"Decoded body larger than {max_size} bytes")
+            chunks.append(chunk)
+        return b''.join(chunks)
+    if encoding == b'zstd':
+        import zstandard
+        with zstandard.ZstdDecompressor().stream_reader(body) as reader:
+            data = reader.read(max_size + 1 if max_size else -1)
+        if max_size and len(data) > max_size:
+            raise ValueError(f"Decoded body larger than {max_size} bytes")
+        return data
+    raise ValueError(f"Unsupported Content-Encoding {encoding!r}")
+
+
+def reduce_html(body, encoding):
+    """
+    Markup of a page with only what text extraction and link following use:
+    no scripts, styles, forms or comments, and no attributes other than
+    href, lang, class and id. Returned as UTF-8.
+    """
+    from lxml import etree, html as lxml_html
+
+    root = lxml_html.document_fromstring(body, parser=lxml_html.HTMLParser(encoding=encoding))
+    etree.strip_elements(root, *DROP_TAGS, etree.Comment, etree.ProcessingInstruction, with_tail=False)
+    head = root.find('head')
+    if head is not None:
+        for child in list(head):
+            if child.tag not in ('title', 'base'):
+                head.remove(child)
+    for element in root.iter():
+        for name in [name for name in element.attrib if name not in KEEP_ATTRIBUTES]:
+            del element.attrib[name]
+    return lxml_html.tostring(root, encoding='utf-8', doctype='<!DOCTYPE html>')
+
+
+class SqliteCache:
+    """
+    Cached responses in a single SQLite file:
+
+    - bodies are stored once per distinct content (8-byte blake2b id) and
+      compressed with zstd or zlib; responses reference them,
+    - the compressed size is capped at `max_bytes`, evicting the least
+      recently used responses (and bodies left unreferenced) first,
+    - entries older than `expiration_secs` are misses, and purged at open.
+
+    Like ValidatorStore, writes are collected in memory and committed in
+    batches by a background thread; lookups go to a separate read connection.
+    """
+
+    def __init__(self, path, max_bytes=2 << 30, expiration_secs=0, compression=None, compression_level=None,
+                 flush_interval=1.0, flush_ops=500, flush_bytes=16 << 20):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.expiration_secs = expiration_secs
+        self.flush_interval = flush_interval
+        self.flush_ops = max(1, flush_ops)
+        self.flush_bytes = flush_bytes
+        self.refs = 0
+        self.last_error = None
+        self.evicted = 0
+        self._init_codec(compression, compression_level)
+
+        self._write_conn = self._connect()  # Used only by the writer thread after this
+        self._write_conn.executescript(SCHEMA)
+        self.total_bytes = 0
+        if expiration_secs > 0:
+            self._purge(time.time() - expiration_secs)
+        self._write_conn.commit()
+        self.total_bytes = self._write_conn.execute('SELECT total(size) FROM bodies').fetchone()[0]
+        self._read_conn = self._connect()
+
+        self._lock = threading.Lock()
+        self._pending = {}  # fp -> (url, status, headers, body id, stored time)
+        self._pending_bodies = {}  # body id -> (codec, data), bodies new to the database
+        self._pending_bytes = 0
+        self._touched = {}  # fp -> last hit time
+        self._wakeup = queue.Queue()
+        self._closed = False
+
+        self._thread = threading.Thread(target=self._run, name='greek_scraper-httpcache', daemon=True)
+        self._thread.start()
+
+    def _init_codec(self, compression, level):
+        if compression is None:
+            try:
+                import zstandard  # noqa: F401
+                compression = 'zstd'
+            except ImportError:
+                compression = 'zlib'
+        if compression not in CODECS:
+            raise ValueError(f"Unknown HTTPCACHE_COMPRESSION {compression!r}; use one of {', '.join(CODECS)}")
+        self.codec = CODECS[compression]
+        if self.codec == ZSTD:
+            import zstandard
+            self._compressor = zstandard.ZstdCompressor(level=3 if level is None else level)
+            self._decompressor = zstandard.ZstdDecompressor()
+        self.level = 6 if level is None else level
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def _compress(self, body):
+        if self.codec == ZSTD:
+            return self._compressor.compress(body)
+        if self.codec == ZLIB:
+            return zlib.compress(body, self.level)
+        return body
+
+    def _decompress(self, codec, data):
+        if codec == ZSTD:
+            if self.codec != ZSTD:  # Written by a run with zstd, read without it configured
+                import zstandard
+                return zstandard.ZstdDecompressor().decompress(data)
+            return self._decompressor.decompress(data)
+        if codec == ZLIB:
+            return zlib.decompress(data)
+        return bytes(data)
+
+    # ---- lookups (reactor thread) ----
+
+    def get(self, fingerprint):
+        """Returns (url, status, headers dict, body) for a live entry, or None."""
+        fp = _key(fingerprint)
+        with self._lock:
+            pending = self._pending.get(fp)
+            body = self._pending_bodies.get(pending[3]) if pending is not None else None
+        if pending is not None:
+            url, status, headers, bid, stored = pending
+            if body is None:  # Already in the database
+                body = self._read_conn.execute('SELECT codec, data FROM bodies WHERE id = ?', (bid,)).fetchone()
+                if body is None:
+                    return None
+        else:
+            row = self._read_conn.execute(
+                'SELECT r.url, r.status, r.headers, r.stored, b.codec, b.data FROM responses r '
+                'JOIN bodies b ON b.id = r.body_id WHERE r.fp = ?', (fp,)).fetchone()
+            if row is None:
+                return None
+            url, status, headers, stored, codec, data = row
+            body = (codec, data)
+        now = time.time()
+        if 0 < self.expiration_secs < now - stored:
+            return None
+        with self._lock:
+            self._touched[fp] = now
+        return url, status, pickle.loads(headers), self._decompress(*body)
+
+    # ---- updates (reactor thread, committed in the background) ----
+
+    def put(self, fingerprint, url, status, headers, body):
+        bid = body_id(body)
+        with self._lock:
+            known = bid in self._pending_bodies
+        if not known:
+            known = self._read_conn.execute('SELECT 1 FROM bodies WHERE id = ?', (bid,)).fetchone() is not None
+        data = None if known else self._compress(body)
+        entry = (url, status, pickle.dumps(headers, protocol=pickle.HIGHEST_PROTOCOL), bid, time.time())
+        with self._lock:
+            self._pending[_key(fingerprint)] = entry
+            if data is not None:
+                self._pending_bodies[bid] = (self.codec, data)
+                self._pending_bytes += len(data)
+            full = len(self._pending) >= self.flush_ops or self._pending_bytes >= self.flush_bytes
+        if full:
+            self._wakeup.put(True)
+
+    def close(self):
+        """Commits everything still pending and closes the database."""
+        if self._closed:
+            return
+        self._closed = True
+        self._wakeup.put(None)
+        self._thread.join()
+        self._read_conn.close()
+
+    # ---- writer thread ----
+
+    def _run(self):
+        try:
+            while True:
+                try:
+                    stop = self._wakeup.get(timeout=self.flush_interval) is None
+                except queue.Empty:
+                    stop = False
+                self._commit(final=stop)
+                if stop:
+                    return
+        finally:
+            self._write_conn.close()
+
+    def _commit(self, final=False):
+        with self._lock:
+            # Hit times only order evictions: they wait for a write or a full batch, so a
+            # read-mostly run doesn't wake the writer (and contend for the GIL) every second.
+            if not (self._pending or (self._touched and (final or len(self._touched) >= self.flush_ops))):
+                return
+            pending, self._pending = self._pending, {}
+            bodies, self._pending_bodies = self._pending_bodies, {}
+            touched, self._touched = self._touched, {}
+            self._pending_bytes = 0
+        conn = self._write_conn
+        try:
+            with conn:
+                for bid, (codec, data) in bodies.items():
+                    if conn.execute('INSERT INTO bodies (id, size, refs, codec, data) VALUES (?, ?, 0, ?, ?) '
+                                    'ON CONFLICT(id) DO NOTHING', (bid, len(data), codec, data)).rowcount:
+                        self.total_bytes += len(data)
+                replaced = []
+                for fp, (url, status, headers, bid, stored) in pending.items():
+                    old = conn.execute('SELECT body_id FROM responses WHERE fp = ?', (fp,)).fetchone()
+                    conn.execute('INSERT OR REPLACE INTO responses (fp, url, status, headers, body_id, stored, '
+                                 'accessed) VALUES (?, ?, ?, ?, ?, ?, ?)', (fp, url, status, headers, bid, stored, stored))
+                    conn.execute('UPDATE bodies SET refs = refs + 1 WHERE id = ?', (bid,))
+                    if old is not None:
+                        replaced.append(old[0])
+                self._unref(replaced)
+                conn.executemany('UPDATE responses SET accessed = ? WHERE fp = ?',
+                                 [(accessed, fp) for fp, accessed in touched.items()])
+                if self.max_bytes > 0 and self.total_bytes > self.max_bytes:
+                    self._evict(int(self.max_bytes * 0.9))
+        except Exception as e:
+            self.last_error = e
+
+    def _unref(self, body_ids):
+        """Drops one reference to each body in `body_ids`, deleting the bodies no response uses any more."""
+        if not body_ids:
+            return
+        conn = self._write_conn
+        conn.executemany('UPDATE bodies SET refs = refs - 1 WHERE id = ?', [(bid,) for bid in body_ids])
+        unique = list(set(body_ids))
+        for i in range(0, len(unique), EVICT_BATCH):
+            marks = ', '.join('?' * len(unique[i:i + EVICT_BATCH]))
+            self.total_bytes -= conn.execute(
+                f'SELECT total(size) FROM bodies WHERE refs <= 0 AND id IN ({marks})',
+                unique[i:i + EVICT_BATCH]).fetchone()[0]
+            conn.execute(f'DELETE FROM bodies WHERE refs <= 0 AND id IN ({marks})', unique[i:i + EVICT_BATCH])
+
+    def _evict(self, target):
+        """Deletes the least recently used responses until the bodies fit in `target` bytes."""
+        conn = self._write_conn
+        while self.total_bytes > target:
+            rows, freed = [], 0
+            for fp, bid, size in conn.execute('SELECT r.fp, r.body_id, b.size FROM responses r '
+                                              'JOIN bodies b ON b.id = r.body_id ORDER BY r.accessed'):
+                rows.append((fp, bid))
+                freed += size  # At most: bodies shared with newer responses stay
+                if freed >= self.total_bytes - target or len(rows) >= EVICT_BATCH:
+                    break
+            if not rows:
+                break
+            conn.executemany('DELETE FROM responses WHERE fp = ?', [(fp,) for fp, _ in rows])
+            self._unref([bid for _, bid in rows])
+            self.evicted += len(rows)
+
+    def _purge(self, before):
+        """Deletes the responses stored before time `before` (runs at open, before the writer thread starts)."""
+        conn = self._write_conn
+        rows = conn.execute('SELECT fp, body_id FROM responses WHERE stored < ?', (before,)).fetchall()
+        conn.executemany('DELETE FROM responses WHERE fp = ?', [(fp,) for fp, _ in rows])
+        self._unref([bid for _, bid in rows])
+
+
+def acquire_http_cache(path, **kwargs):
+    """Returns the process-wide cache for `path`, opening it on first use."""
+    key = os.path.abspath(path)
+    with _shared_lock:
+        cache = _shared_caches.get(key)
+        if cache is None or cache._closed:
+            cache = SqliteCache(path, **kwargs)
+            _shared_caches[key] = cache
+        cache.refs += 1
+        return cache
+
+
+def release_http_cache(cache):
+    """Drops one reference; the last one commits and closes the cache. Returns True if it closed."""
+    with _shared_lock:
+        cache.refs -= 1
+        if cache.refs > 0:
+            return False
+        key = os.path.abspath(cache.path)
+        if _shared_caches.get(key) is cache:
+            del _shared_caches[key]
+    cache.close()
+    return True
+
+
+class SqliteCacheStorage:
+    """
+    HTTPCACHE_STORAGE backend: one SQLite file per spider name under
+    HTTPCACHE_DIR instead of a directory per response, so large runs don't
+    run out of inodes, lookups stay one indexed read, and the cache has a size
+    cap (HTTPCACHE_MAX_BYTES).
+
+    Bodies are stored decoded (no Content-Encoding) and compressed by the
+    cache itself, which also lets identical bodies be stored once. With
+    HTTPCACHE_TEXT_ONLY, HTML pages are stored reduced to the markup text
+    extraction and link following need (see reduce_html).
+    """
+
+    def __init__(self, settings):
+        self.cachedir = data_path(settings['HTTPCACHE_DIR'], createdir=True)
+        self.text_only = settings.getbool('HTTPCACHE_TEXT_ONLY', False)
+        self.download_maxsize = settings.getint('DOWNLOAD_MAXSIZE')
+        level = settings.get('HTTPCACHE_COMPRESSION_LEVEL')
+        self.options = {
+            'max_bytes': settings.getint('HTTPCACHE_MAX_BYTES', 2 << 30),
+            'expiration_secs': settings.getint('HTTPCACHE_EXPIRATION_SECS'),
+            'compression': settings.get('HTTPCACHE_COMPRESSION') or None,
+            'compression_level': int(level) if level is not None else None,
+            'flush_interval': settings.getfloat('FRONTIER_FLUSH_INTERVAL', 1.0),
+        }
+        self.cache = None
+        self._fingerprinter = None
+
+    def open_spider(self, spider):
+        path = os.path.join(self.cachedir, f"{spider.name}.sqlite")
+        self.cache = acquire_http_cache(path, **self.options)
+        self._fingerprinter = spider.crawler.request_fingerprinter
+        path_label = os.path.abspath(path)
+        metrics.gauge('httpcache_bytes', lambda cache=self.cache: cache.total_bytes, path=path_label)
+        metrics.gauge('httpcache_evicted', lambda cache=self.cache: cache.evicted, path=path_label)
+
+    def close_spider(self, spider):
+        cache, self.cache = self.cache, None
+        if cache is None:
+            return
+        if cache.last_error is not None:
+            print(f"[greek_scraper] ERROR: HTTP cache write failed: {cache.last_error}")
+        release_http_cache(cache)
+
+    def retrieve_response(self, spider, request):
+        entry = self.cache.get(self._fingerprinter.fingerprint(request))
+        if entry is None:
+            metrics.inc('httpcache_lookups_total', result='miss')
+            return None
+        metrics.inc('httpcache_lookups_total', result='hit')
+        url, status, headers, body = entry
+        headers = Headers(headers)
+        respcls = responsetypes.from_args(headers=headers, url=url, body=body)
+        return respcls(url=url, headers=headers, status=status, body=body)
+
+    def store_response(self, spider, request, response):
+        headers = response.headers.copy()
+        body = response.body
+        encoding = headers.get(b'Content-Encoding')
+        if encoding and body:
+            try:
+                body = decode_content(body, encoding, request.meta.get('download_maxsize', self.download_maxsize))
+                del headers[b'Content-Encoding']
+            except Exception:
+                body = response.body  # Stored as received; HttpCompressionMiddleware decodes it on a hit
+        if self.text_only and isinstance(response, HtmlResponse) and body and b'Content-Encoding' not in headers:
+            try:
+                body = reduce_html(body, response.encoding)
+                headers[b'Content-Type'] = b'text/html; charset=utf-8'
+            except Exception:
+                pass  # Not parseable: stored as it is
+        headers.pop(b'Content-Length', None)
+        self.cache.put(self._fingerprinter.fingerprint(request), response.url, response.status,
+                       dict(headers), body)
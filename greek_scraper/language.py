@@ -0,0 +1,82 @@
+# greek_scraper/language.py
+import re
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+HTML_LANG_RE = re.compile(r"<html[^>]*?\slang\s*=\s*[\"']?\s*([a-zA-Z]{2,3})", re.IGNORECASE)
+# Markup, scripts and styles are mostly Latin letters whatever the page language. A sample can end
+# inside any of them, so each also runs to the end of the string (\Z) when it is not closed.
+MARKUP_RE = re.compile(r"<script\b.*?(?:</script\s*>|\Z)|<style\b.*?(?:</style\s*>|\Z)|<!--.*?(?:-->|\Z)|<[^>]*(?:>|\Z)",
+                       re.IGNORECASE | re.DOTALL)
+BODY_RE = re.compile(r"<body\b|</head\s*>", re.IGNORECASE)
+GREEK_RE = re.compile(r"[Ͱ-Ͽἀ-῿]")  # Same ranges as the backends' Greek filter
+LETTER_RE = re.compile(r"[^\W\d_]")
+
+
+def greek_ratio(html):
+    """(Greek letters / all letters, letter count) in the visible text of an HTML fragment."""
+    text = MARKUP_RE.sub(' ', html)
+    letters = LETTER_RE.subn('', text)[1]
+    if not letters:
+        return 0.0, 0
+    return GREEK_RE.subn('', text)[1] / letters, letters
+
+
+class LanguageDetector:
+    """
+    Cheap Greek / not-Greek decision per page from the `lang` attribute and
+    the Greek share of letters in a body sample, plus a record per URL
+    subtree (host + first path segment, e.g. /en) so subtrees that keep
+    yielding non-Greek pages stop being followed.
+    """
+
+    def __init__(self, sample_chars=20000, min_ratio=0.3, min_letters=200,
+                 subtree_min_pages=5, subtree_max_ratio=0.8, max_subtrees=100000, link_priority=-10):
+        self.sample_chars = sample_chars
+        self.min_ratio = min_ratio  # Greek share of letters at which a page counts as Greek
+        self.min_letters = min_letters  # Fewer letters than this: trust the lang attribute instead
+        self.subtree_min_pages = subtree_min_pages
+        self.subtree_max_ratio = subtree_max_ratio  # Non-Greek share at which a subtree is pruned
+        self.max_subtrees = max_subtrees
+        self.link_priority = link_priority  # Request priority for links found on non-Greek pages
+        self.subtrees = OrderedDict()  # (host, segment) -> [pages, non-Greek pages], LRU-bounded
+        self.pruned = set()
+
+    @staticmethod
+    def subtree(url):
+        parts = urlsplit(url)
+        path = parts.path.lstrip('/')
+        segment = path.split('/', 1)[0] if '/' in path else ''  # Files at the root belong to the root
+        return parts.netloc.lower(), segment.lower()
+
+    def is_greek(self, html):
+        """True unless the page is clearly not Greek."""
+        # The sample starts at <body>: a long head of inline CSS/JS would otherwise fill it with Latin letters.
+        body = BODY_RE.search(html)
+        start = body.start() if body is not None else 0
+        ratio, letters = greek_ratio(html[start:start + self.sample_chars])
+        if letters >= self.min_letters:
+            return ratio >= self.min_ratio
+        match = HTML_LANG_RE.search(html, 0, self.sample_chars)
+        if match is not None:
+            return match.group(1).lower() in ('el', 'gre', 'ell') or ratio >= self.min_ratio
+        return True  # Too little text to tell: keep it
+
+    def record(self, url, greek):
+        key = self.subtree(url)
+        counts = self.subtrees.get(key)
+        if counts is None:
+            counts = self.subtrees[key] = [0, 0]
+            if len(self.subtrees) > self.max_subtrees:
+                self.pruned.discard(self.subtrees.popitem(last=False)[0])
+        else:
+            self.subtrees.move_to_end(key)
+        counts[0] += 1
+        counts[1] += not greek
+        if counts[0] >= self.subtree_min_pages and counts[1] >= self.subtree_max_ratio * counts[0]:
+            self.pruned.add(key)
+        else:
+            self.pruned.discard(key)
+
+    def is_pruned(self, url):
+        return self.subtree(url) in self.pruned
@@ -0,0 +1,62 @@
+# greek_scraper/links.py
+import posixpath
+import re
+from urllib.parse import urljoin, urlsplit, urlunsplit
+
+from lxml import etree
+from scrapy.linkextractors import IGNORED_EXTENSIONS
+
+# Plain href strings straight from lxml: no Selector object per anchor.
+HREF_XPATH = etree.XPath('//a/@href', smart_strings=False)
+
+SCHEMES = frozenset(['http', 'https'])
+NON_PAGE_HREF_RE = re.compile(r'^\s*(?:#|mailto:|javascript:|tel:|data:|sms:|whatsapp:|viber:)', re.I)
+
+# Scrapy's LinkExtractor list plus web fonts and bare archives.
+ASSET_EXTENSIONS = frozenset('.' + ext for ext in IGNORED_EXTENSIONS + ['gz', 'woff', 'woff2', 'ttf', 'otf', 'eot'])
+
+# Analytics and click-id parameters that never change the page content.
+TRACKING_PARAM_RE = re.compile(
+    r'^(?:utm_[a-z]+|fbclid|gclid|gclsrc|dclid|msclkid|yclid|twclid|igshid|mc_cid|mc_eid|_ga|_gl|ref_src)$', re.I)
+
+
+def strip_tracking(query):
+    """Drops tracking parameters from a raw query string, keeping the rest in order."""
+    if not query:
+        return query
+    return '&'.join(p for p in query.split('&')
+                    if p and not TRACKING_PARAM_RE.match(p.split('=', 1)[0]))
+
+
+def extract_links(root, base_url, host, external=None):
+    """
+    Same-host http(s) page links under lxml `root`, resolved against
+    `base_url`, with fragments and tracking parameters removed, asset URLs
+    skipped and duplicates dropped. Returned in page order.
+
+    If `external` is a set, the scheme://host of every other host linked to
+    is added to it in the same pass (for autodiscovery).
+    """
+    host = host.lower()
+    seen = set()
+    links = []
+    for href in HREF_XPATH(root):
+        if not href or NON_PAGE_HREF_RE.match(href):
+            continue
+        try:
+            scheme, netloc, path, query, _ = urlsplit(urljoin(base_url, href.strip()))
+        except ValueError:
+            continue  # Malformed, e.g. a broken IPv6 host
+        if scheme not in SCHEMES:
+            continue
+        if netloc.lower() != host:
+            if external is not None and netloc:
+                external.add(f"{scheme}://{netloc.lower()}")
+            continue
+        if posixpath.splitext(path)[1].lower() in ASSET_EXTENSIONS:
+            continue
+        url = urlunsplit((scheme, netloc, path or '/', strip_tracking(query), ''))
+        if url not in seen:
+            seen.add(url)
+            links.append(url)
+    return links
@@ -0,0 +1,382 @@
+# greek_scraper/metrics.py
+import bisect
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from urllib.parse import urlparse
+
+from scrapy import signals
+from twisted.internet.task import LoopingCall
+
+# Seconds; covers a cached encoding lookup up to a slow trafilatura run.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+HELP = {
+    'pages_total': ('counter', 'Responses downloaded, per domain'),
+    'response_bytes_total': ('counter', 'Response body bytes downloaded, per domain'),
+    'items_total': ('counter', 'Items that passed every pipeline, per domain'),
+    'items_dropped_total': ('counter', 'Items dropped by a pipeline'),
+    'encoding_seconds': ('histogram', 'RobustEncodingMiddleware time per response'),
+    'extraction_seconds': ('histogram', 'Text extraction time per document, worker queueing included'),
+    'text_batch_seconds': ('histogram', 'TextPipeline time from batch flush to release'),
+    'text_batch_size': ('histogram', 'Items per TextPipeline batch'),
+    'writer_queue_depth': ('gauge', 'Chunks waiting for the output writer thread'),
+    'writer_bytes_written': ('gauge', 'Bytes written to the output file'),
+    'writer_items_written': ('gauge', 'Items written to the output file'),
+    'dns_lookups_total': ('counter', 'Host lookups by result: hit, negative (cached failure), shared or miss'),
+    'dns_failures_total': ('counter', 'Lookups that failed or timed out'),
+    'dns_lookup_seconds': ('histogram', 'Time per uncached host lookup'),
+    'dead_host_requests_total': ('counter', 'Requests dropped because their host is dead or blocked'),
+    'throttle_backoffs_total': ('counter', 'Per-host slowdowns by reason: throttled (429/503), error or slow'),
+    'throttle_hosts': ('gauge', 'Hosts tracked by the adaptive throttle'),
+    'throttle_window_total': ('gauge', 'Requests in flight allowed over all hosts (out of ADAPTIVE_THROTTLE_BUDGET)'),
+    'httpcache_lookups_total': ('counter', 'HTTP cache lookups by result: hit or miss'),
+    'httpcache_bytes': ('gauge', 'Compressed body bytes in the HTTP cache'),
+    'httpcache_evicted': ('gauge', 'Responses evicted from the HTTP cache to stay under HTTPCACHE_MAX_BYTES'),
+    'responses_skipped_total': ('counter', 'Responses skipped per domain, by reason: content_type, binary or too_large'),
+    'responses_truncated_total': ('counter', 'Response bodies cut at RESPONSE_MAX_BYTES, per domain'),
+}
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot: above the largest bound
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th observation (the largest bound if above it)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return self.buckets[-1]
+
+
+class Metrics:
+    """
+    Process-wide counters, histograms and gauges. Counters and histograms are
+    only updated on the reactor thread, so updates take no lock; gauges are
+    read from their owners (e.g. the writer thread's queue) when exported.
+    Labels are passed as keyword arguments, e.g. inc('pages_total', domain=d).
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.counters = defaultdict(float)  # (name, labels) -> value
+        self.histograms = {}                # (name, labels) -> Histogram
+        self.gauges = {}                    # (name, labels) -> callable
+
+    def inc(self, name, value=1, **labels):
+        self.counters[(name, tuple(labels.items()))] += value
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        key = (name, tuple(labels.items()))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram(buckets)
+        histogram.observe(value)
+
+    def gauge(self, name, fn, **labels):
+        self.gauges[(name, tuple(labels.items()))] = fn
+
+    def total(self, name):
+        """Sum of a counter over all its labels. Safe to call from other threads."""
+        return sum(v for (n, _), v in list(self.counters.items()) if n == name)
+
+    def by_label(self, name, label):
+        """{label value: counter value} for a counter with one label."""
+        return {dict(labels).get(label): v for (n, labels), v in list(self.counters.items()) if n == name}
+
+    def read_gauges(self):
+        values = {}
+        for key, fn in list(self.gauges.items()):
+            try:
+                values[key] = fn()
+            except Exception:
+                continue  # The owner may be closing
+        return values
+
+    def prometheus(self):
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        described = set()
+
+        def header(name):
+            if name not in described:
+                described.add(name)
+                kind, text = HELP.get(name, ('untyped', name))
+                lines.append(f"# HELP greek_scraper_{name} {text}")
+                lines.append(f"# TYPE greek_scraper_{name} {kind}")
+
+        for (name, labels), value in sorted(self.counters.items()):
+            header(name)
+            lines.append(f"greek_scraper_{name}{_labels(labels)} {value:g}")
+        for (name, labels), value in sorted(self.read_gauges().items()):
+            header(name)
+            lines.append(f"greek_scraper_{name}{_labels(labels)} {value:g}")
+        for (name, labels), h in sorted(self.histograms.items(), key=lambda kv: kv[0]):
+            header(name)
+            cumulative = 0
+            for bound, n in zip(h.buckets, h.counts):
+                cumulative += n
+                lines.append(f"greek_scraper_{name}_bucket{_labels(labels + (('le', f'{bound:g}'),))} {cumulative}")
+            lines.append(f"greek_scraper_{name}_bucket{_labels(labels + (('le', '+Inf'),))} {h.count}")
+            lines.append(f"greek_scraper_{name}_sum{_labels(labels)} {h.sum:g}")
+            lines.append(f"greek_scraper_{name}_count{_labels(labels)} {h.count}")
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self):
+        """Plain-dict view for the JSON stats file."""
+        def key(name, labels):
+            return name + _labels(labels)
+
+        return {
+            'time': time.time(),
+            'uptime': time.time() - self.started,
+            'counters': {key(n, l): v for (n, l), v in sorted(self.counters.items())},
+            'gauges': {key(n, l): v for (n, l), v in sorted(self.read_gauges().items())},
+            'histograms': {
+                key(n, l): {'count': h.count, 'sum': h.sum, 'p50': h.quantile(0.5), 'p99': h.quantile(0.99)}
+                for (n, l), h in sorted(self.histograms.items(), key=lambda kv: kv[0])
+            },
+        }
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels) + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+metrics = Metrics()
+
+
+class SamplingProfiler:
+    """
+    Samples the reactor thread's Python stack `hz` times a second from a
+    background thread and counts each distinct stack. `dump` writes them in
+    the folded format read by flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, thread_id, hz=100):
+        self.thread_id = thread_id
+        self.interval = 1.0 / max(1, hz)
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='greek_scraper-profiler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def dump(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+# Exporters are shared by every crawler of the process: key -> [stop callable, refs]
+_exporters = {}
+
+
+def _acquire_exporter(key, start):
+    exporter = _exporters.get(key)
+    if exporter is None:
+        exporter = _exporters[key] = [start(), 0]
+    exporter[1] += 1
+
+
+def _release_exporter(key):
+    exporter = _exporters.get(key)
+    if exporter is None:
+        return
+    exporter[1] -= 1
+    if exporter[1] <= 0:
+        del _exporters[key]
+        exporter[0]()
+
+
+def _start_http(port):
+    from twisted.internet import reactor
+    from twisted.web import resource, server
+
+    class MetricsResource(resource.Resource):
+        isLeaf = True
+
+        def render_GET(self, request):
+            request.setHeader(b'Content-Type', b'text/plain; version=0.0.4; charset=utf-8')
+            return metrics.prometheus().encode('utf-8')
+
+    listening = reactor.listenTCP(port, server.Site(MetricsResource()), interface='127.0.0.1')
+    print(f"[greek_scraper] Metrics at http://127.0.0.1:{listening.getHost().port}/metrics")
+    return listening.stopListening
+
+
+def _write_json(path, previous):
+    snapshot = metrics.snapshot()
+    # Per-domain pages/s since the previous write
+    pages = metrics.by_label('pages_total', 'domain')
+    elapsed = snapshot['time'] - previous.get('time', metrics.started)
+    if elapsed > 0:
+        last = previous.get('pages', {})
+        snapshot['pages_per_sec'] = {d: (n - last.get(d, 0)) / elapsed for d, n in sorted(pages.items())}
+    previous.update(time=snapshot['time'], pages=pages)
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, path)  # Readers never see a half-written file
+
+
+def _start_json(path, interval):
+    previous = {}
+    loop = LoopingCall(_write_json, path, previous)
+    loop.start(interval, now=False)
+
+    def stop():
+        loop.stop()
+        _write_json(path, previous)
+    return stop
+
+
+def _log_progress(previous):
+    now = time.time()
+    pages = metrics.total('pages_total')
+    rate = (pages - previous.get('pages', 0)) / max(1e-9, now - previous.get('time', metrics.started))
+    previous.update(time=now, pages=pages)
+    depth = sum(v for (n, _), v in metrics.read_gauges().items() if n == 'writer_queue_depth')
+    print(f"[greek_scraper] {pages:.0f} pages ({rate:.1f}/s), "
+          f"{metrics.total('response_bytes_total') / 1e6:.1f} MB downloaded, "
+          f"{metrics.total('items_total'):.0f} items, writer queue {depth:.0f}")
+
+
+def _start_profiler(path, hz):
+    profiler = SamplingProfiler(threading.get_ident(), hz)  # Called on the reactor thread
+    profiler.start()
+
+    def stop():
+        profiler.stop()
+        profiler.dump(path)
+    return stop
+
+
+def _start_log(interval):
+    loop = LoopingCall(_log_progress, {})
+    loop.start(interval, now=False)
+    return loop.stop
+
+
+def start_exporters(settings):
+    """
+    Starts the exporters the METRICS_* settings ask for, or takes another
+    reference on ones already running. Returns the keys for stop_exporters.
+    """
+    wanted = []
+    port = settings.getint('METRICS_PORT', 0)  # 0 disables the endpoint
+    if port:
+        wanted.append((('http', port), lambda: _start_http(port)))
+    path = settings.get('METRICS_FILE')
+    if path:
+        interval = settings.getfloat('METRICS_INTERVAL', 10.0)
+        wanted.append((('json', os.path.abspath(path)), lambda: _start_json(path, interval)))
+    log_interval = settings.getfloat('METRICS_LOG_INTERVAL', 30.0)  # 0 disables the progress line
+    if log_interval > 0:
+        wanted.append((('log', log_interval), lambda: _start_log(log_interval)))
+    profile_path = settings.get('METRICS_PROFILE_FILE')
+    if profile_path:
+        hz = settings.getint('METRICS_PROFILE_HZ', 100)
+        wanted.append((('profile', os.path.abspath(profile_path)), lambda: _start_profiler(profile_path, hz)))
+
+    keys = []
+    for key, start in wanted:
+        try:
+            _acquire_exporter(key, start)
+            keys.append(key)
+        except Exception as e:
+            print(f"[greek_scraper] ERROR: Could not start metrics exporter {key[0]}: {e}")
+    return keys
+
+
+def stop_exporters(keys):
+    """Drops one reference on each exporter; the last one stops it (final JSON write, profile dump)."""
+    for key in keys:
+        try:
+            _release_exporter(key)
+        except Exception as e:
+            print(f"[greek_scraper] ERROR: Could not stop metrics exporter {key[0]}: {e}")
+
+
+class MetricsExtension:
+    """
+    Counts pages, bytes and items per domain, and runs the metrics exporters
+    while the spider is open: a Prometheus endpoint on METRICS_PORT, a JSON
+    file rewritten every METRICS_INTERVAL seconds at METRICS_FILE, a progress
+    line every METRICS_LOG_INTERVAL seconds and, with METRICS_PROFILE_FILE,
+    the sampling profiler.
+    """
+
+    def __init__(self, settings):
+        self.settings = settings
+        self.exporters = []
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        ext = cls(crawler.settings)
+        crawler.signals.connect(ext.response_received, signal=signals.response_received)
+        crawler.signals.connect(ext.item_scraped, signal=signals.item_scraped)
+        crawler.signals.connect(ext.item_dropped, signal=signals.item_dropped)
+        crawler.signals.connect(ext.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(ext.spider_closed, signal=signals.spider_closed)
+        return ext
+
+    def response_received(self, response, request, spider):
+        domain = urlparse(response.url).netloc
+        metrics.inc('pages_total', domain=domain)
+        metrics.inc('response_bytes_total', len(response.body), domain=domain)
+
+    def item_scraped(self, item, response, spider):
+        metrics.inc('items_total', domain=urlparse(response.url).netloc)
+
+    def item_dropped(self, item, response, exception, spider):
+        metrics.inc('items_dropped_total')
+
+    def spider_opened(self, spider):
+        self.exporters = start_exporters(self.settings)
+
+    def spider_closed(self, spider):
+        stop_exporters(self.exporters)
+        self.exporters = []
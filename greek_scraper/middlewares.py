@@ -1,34 +1,447 @@
 # greek_scraper/middlewares.py
 import chardet
+import codecs
+import re
+import time
+from collections import OrderedDict
 from urllib.parse import urlparse
-from scrapy.exceptions import IgnoreRequest
-from twisted.internet.error import DNSLookupError
+from scrapy import signals
+from scrapy.http import TextResponse
+from scrapy.downloadermiddlewares.retry import get_retry_request
+from twisted.internet.defer import Deferred, TimeoutError
+from twisted.internet.threads import deferToThread
+from scrapy.exceptions import IgnoreRequest, NotConfigured, StopDownload
+from twisted.internet.error import (DNSLookupError, ConnectError, ConnectionLost, TCPTimedOutError,
+                                    TimeoutError as ConnectTimeoutError)
+from twisted.web.client import ResponseFailed
+from greek_scraper.validators import content_hash
+from greek_scraper.metrics import metrics
+from greek_scraper.resolver import dns_cache
+from greek_scraper.throttle import (BACKOFF_STATUSES, acquire_throttle, release_throttle, retry_after_seconds,
+                                    throttle_options)
+
+# Charset declarations are only looked for in the first bytes of the body.
+META_CHARSET_RE = re.compile(
+    rb"""<meta[^>]+?(?:charset\s*=\s*["']?\s*|content\s*=\s*["'][^"']*?charset\s*=\s*)([a-zA-Z0-9_:.+-]+)""",
+    re.IGNORECASE,
+)
+HEADER_CHARSET_RE = re.compile(r"charset\s*=\s*[\"']?([a-zA-Z0-9_:.+-]+)", re.IGNORECASE)
+NON_ASCII_RE = re.compile(rb"[\x80-\xff]")
+# Download errors that say the host is overloaded or unreachable (DNS failures are DeadHostMiddleware's).
+OVERLOAD_ERRORS = (TimeoutError, ConnectTimeoutError, TCPTimedOutError, ConnectError, ConnectionLost, ResponseFailed)
+# Media types worth downloading; a response without a Content-Type is let through and sniffed.
+ALLOWED_TYPES = ('text/html', 'application/xhtml+xml', 'text/plain', 'application/xml', 'text/xml')
+# First bytes of binary files often served as text/html: PDF, ZIP (and Office), OLE (old Office), PNG, GIF, JPEG.
+BINARY_MAGIC = (b'%PDF-', b'PK\x03\x04', b'\xd0\xcf\x11\xe0', b'\x89PNG', b'GIF8', b'\xff\xd8\xff')
+BOMS = [
+    (codecs.BOM_UTF8, 'utf-8'),
+    (codecs.BOM_UTF32_LE, 'utf-32-le'),
+    (codecs.BOM_UTF32_BE, 'utf-32-be'),
+    (codecs.BOM_UTF16_LE, 'utf-16-le'),
+    (codecs.BOM_UTF16_BE, 'utf-16-be'),
+]
 
 class RobustEncodingMiddleware:
+    """
+    Works out the encoding of text responses without transcoding the body.
+
+    BOM, HTTP header and <meta charset> are checked first. Only if none of them
+    gives a usable encoding is the body sniffed: a UTF-8 check on the first
+    `detect_bytes` bytes, then the host's cached encoding, then chardet on that
+    same prefix in a worker thread. A prefix that is all ASCII (a long head)
+    says nothing, so the sample starts at the first non-ASCII byte instead.
+    Only chardet results are cached per host; pages that are ASCII throughout
+    are read as UTF-8. The response is returned with its encoding set, and
+    Scrapy decodes it lazily when `.text` is first used.
+    """
+
+    def __init__(self, detect_bytes=32768, cache_size=10000):
+        self.detect_bytes = detect_bytes
+        self.cache_size = cache_size
+        self.host_encodings = OrderedDict()  # host -> detected encoding, LRU
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(
+            detect_bytes=crawler.settings.getint('ENCODING_DETECT_BYTES', 32768),
+            cache_size=crawler.settings.getint('ENCODING_CACHE_SIZE', 10000),
+        )
+
     def process_response(self, request, response, spider):
+        start = time.perf_counter()
+        result = self._process_response(response)
+        if isinstance(result, Deferred):
+            result.addBoth(self._timed, start)
+        else:
+            metrics.observe('encoding_seconds', time.perf_counter() - start)
+        return result
+
+    @staticmethod
+    def _timed(result, start):
+        metrics.observe('encoding_seconds', time.perf_counter() - start)
+        return result
+
+    def _process_response(self, response):
         content_type = response.headers.get('Content-Type', b'').decode('utf-8', errors='ignore').lower()
         is_text = any(x in content_type for x in ['text/html', 'text/plain', 'application/xml', 'application/xhtml+xml'])
-        if is_text:
-            if not response.encoding or response.encoding.lower() not in ['utf-8', 'utf8']:
-                try:
-                    decoded = response.body.decode('utf-8')
-                except UnicodeDecodeError:
-                    try:
-                        detected = chardet.detect(response.body)['encoding'] or 'utf-8'
-                        decoded = response.body.decode(detected, errors='replace')
-                    except Exception as e:
-                        return response.replace(body=b'', encoding='utf-8')
-                return response.replace(body=decoded.encode('utf-8'), encoding='utf-8')
+        if not is_text or not isinstance(response, TextResponse) or not response.body:
+            return response
+
+        prefix = response.body[:self.detect_bytes]
+        sample = self._sample(response.body, prefix)
+        encoding = self._declared_encoding(content_type, prefix, sample)
+        if encoding:
+            return self._with_encoding(response, encoding)
+        if sample is None:
+            return self._with_encoding(response, 'utf-8')  # All ASCII: any ASCII-compatible encoding reads it the same
+
+        # Strict UTF-8 first: a cached single-byte encoding decodes anything, so it
+        # cannot be trusted to reject a UTF-8 page from a host that mixes both.
+        if self._decodes(sample, 'utf-8'):
+            return self._with_encoding(response, 'utf-8')
+
+        host = urlparse(response.url).netloc
+        cached = self.host_encodings.get(host)
+        if cached and self._decodes(sample, cached):
+            self.host_encodings.move_to_end(host)
+            return self._with_encoding(response, cached)
+
+        # chardet is the expensive part: keep it off the reactor thread.
+        d = deferToThread(self._detect, sample)
+        d.addCallback(self._detected, host, response)
+        d.addErrback(lambda err: response.replace(body=b'', encoding='utf-8'))
+        return d
+
+    def _sample(self, body, prefix):
+        """The bytes to sniff: `prefix`, or if it is all ASCII, `detect_bytes` from the body's first non-ASCII byte."""
+        if not prefix.isascii():
+            return prefix
+        match = NON_ASCII_RE.search(body, len(prefix))
+        if match is None:
+            return None
+        return body[match.start():match.start() + self.detect_bytes]
+
+    def _declared_encoding(self, content_type, prefix, sample):
+        for bom, encoding in BOMS:
+            if prefix.startswith(bom):
+                return encoding
+
+        candidates = []
+        match = HEADER_CHARSET_RE.search(content_type)
+        if match:
+            candidates.append(match.group(1))
+        match = META_CHARSET_RE.search(prefix[:4096])
+        if match:
+            candidates.append(match.group(1).decode('ascii', errors='ignore'))
+
+        for name in candidates:
+            encoding = self._normalize(name)
+            # A declared UTF-8 is only trusted if the sample actually is UTF-8;
+            # plenty of Greek sites serve windows-1253 under a utf-8 header.
+            if encoding and (encoding != 'utf-8' or sample is None or self._decodes(sample, 'utf-8')):
+                return encoding
+        return None
+
+    def _normalize(self, name):
+        try:
+            return codecs.lookup(name).name
+        except LookupError:
+            return None
+
+    def _decodes(self, prefix, encoding):
+        try:
+            # final=False: the prefix may end in the middle of a multi-byte character
+            codecs.getincrementaldecoder(encoding)().decode(prefix, final=False)
+            return True
+        except (UnicodeDecodeError, LookupError):
+            return False
+
+    def _detect(self, prefix):
+        return chardet.detect(prefix)['encoding'] or 'utf-8'
+
+    def _detected(self, encoding, host, response):
+        encoding = self._normalize(encoding) or 'utf-8'
+        self._remember(host, encoding)
+        return self._with_encoding(response, encoding)
+
+    def _remember(self, host, encoding):
+        self.host_encodings[host] = encoding
+        self.host_encodings.move_to_end(host)
+        while len(self.host_encodings) > self.cache_size:
+            self.host_encodings.popitem(last=False)
+
+    def _with_encoding(self, response, encoding):
+        # Only the encoding changes; the body bytes are shared, not copied.
+        return response.replace(encoding=encoding)
+
+class ConditionalRequestMiddleware:
+    """
+    Revalidates pages known from earlier runs. Validators from the spider's
+    ValidatorStore (VALIDATORS_PATH) are sent as If-None-Match /
+    If-Modified-Since. A 304, or a 200 whose body hashes the same as last
+    time, reaches the spider with meta['unchanged'] set so it can skip
+    extraction. A no-op for spiders without a store.
+    """
+
+    def process_request(self, request, spider):
+        store = getattr(spider, 'validators', None)
+        if store is None or request.method != 'GET' or not self._is_page(request, spider):
+            return None
+        known = store.get(request.url)
+        request.meta['validators'] = known
+        if known is None:
+            return None
+        etag, last_modified, _ = known
+        if etag:
+            request.headers.setdefault(b'If-None-Match', etag)
+        if last_modified:
+            request.headers.setdefault(b'If-Modified-Since', last_modified)
+        request.meta['dont_cache'] = True  # The HTTP cache would answer without asking the server
+        allowed = request.meta.get('handle_httpstatus_list', [])
+        if 304 not in allowed:
+            request.meta['handle_httpstatus_list'] = allowed + [304]  # Let the 304 through to the spider
+        return None
+
+    def process_response(self, request, response, spider):
+        store = getattr(spider, 'validators', None)
+        if store is None or 'validators' not in request.meta:
+            return response
+        known = request.meta['validators']
+        domain = urlparse(request.url).netloc
+        stats = spider.crawler.stats
+
+        if response.status == 304 and known is not None:
+            store.record(request.url, domain,
+                         etag=self._header(response, b'ETag'),
+                         last_modified=self._header(response, b'Last-Modified'),
+                         changed=False)
+            stats.inc_value('validators/not_modified', spider=spider)
+            request.meta['unchanged'] = True
+            return response
+        if response.status != 200:
+            return response
+
+        body_hash = content_hash(response.body)
+        unchanged = known is not None and known[2] == body_hash
+        store.record(request.url, domain,
+                     etag=self._header(response, b'ETag'),
+                     last_modified=self._header(response, b'Last-Modified'),
+                     body_hash=body_hash, changed=not unchanged)
+        if unchanged:
+            stats.inc_value('validators/unchanged', spider=spider)
+            request.meta['unchanged'] = True
+        elif known is not None:
+            stats.inc_value('validators/changed', spider=spider)
         return response
 
-class CustomRetryMiddleware:
-    def process_spider_exception(self, response, exception, spider):
-        req = response.request
+    @staticmethod
+    def _is_page(request, spider):
+        # robots.txt fetches and other non-page requests would be revisited as pages on the next run.
+        return not request.url.endswith('/robots.txt') and request.callback in (None, spider.parse)
 
+    @staticmethod
+    def _header(response, name):
+        value = response.headers.get(name)
+        return value.decode('latin-1') if value else None
+
+class LanguageFilterMiddleware:
+    """
+    Drops requests already scheduled into URL subtrees that the spider's
+    LanguageDetector has since found to be non-Greek, before they are downloaded.
+    """
+
+    def process_request(self, request, spider):
+        language = getattr(spider, 'language', None)
+        if language is not None and language.pruned and language.is_pruned(request.url):
+            spider.crawler.stats.inc_value('language/pruned_requests', spider=spider)
+            raise IgnoreRequest(f"Non-Greek subtree: {request.url}")
+        return None
+
+class DeadHostMiddleware:
+    """
+    Drops requests, robots.txt fetches included, for hosts whose lookup
+    failed recently (see CachingResolver) or that the spider has blocked,
+    instead of letting each one wait for the resolver again.
+    """
+
+    def process_request(self, request, spider):
+        host = urlparse(request.url).hostname
+        if host is None:
+            return None
+        if host in getattr(spider, 'blocked_domains', ()) or dns_cache.is_dead(host):
+            spider.crawler.stats.inc_value('dns/dropped_requests', spider=spider)
+            metrics.inc('dead_host_requests_total')
+            raise IgnoreRequest(f"Dead host: {host}")
+        return None
+
+class ResponseSizeMiddleware:
+    """
+    Keeps pathological responses out of memory. From the headers, before the
+    body is downloaded, it skips content types not in RESPONSE_ALLOWED_TYPES
+    and bodies declared larger than the download limit; the first bytes are
+    sniffed for binary files served as text. Bodies are streamed and cut at
+    RESPONSE_MAX_BYTES (skipped instead if RESPONSE_TRUNCATE is False).
+    Compressed bodies may decode to RESPONSE_MAX_DECODED_BYTES, past which
+    HttpCompressionMiddleware drops them, and are cut like the rest. Skipped
+    and truncated responses are counted per domain.
+    """
+
+    def __init__(self, crawler):
+        settings = crawler.settings
+        self.max_bytes = settings.getint('RESPONSE_MAX_BYTES', 5 << 20)  # 0: no limit
+        self.truncate = settings.getbool('RESPONSE_TRUNCATE', True)
+        self.allowed_types = frozenset(t.lower() for t in settings.getlist('RESPONSE_ALLOWED_TYPES', ALLOWED_TYPES))
+        # Per-request download_maxsize: the raw and the decoded size past which Scrapy gives up on a body.
+        limits = [settings.getint('DOWNLOAD_MAXSIZE'), settings.getint('RESPONSE_MAX_DECODED_BYTES', 32 << 20)]
+        self.download_maxsize = min((n for n in limits if n > 0), default=0)
+        crawler.signals.connect(self.headers_received, signal=signals.headers_received)
+        crawler.signals.connect(self.bytes_received, signal=signals.bytes_received)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler)
+
+    def _allowed(self, content_type):
+        media_type = (content_type or b'').split(b';', 1)[0].strip().lower()
+        return not media_type or media_type.decode('latin-1') in self.allowed_types
+
+    def process_request(self, request, spider):
+        request.meta.pop('response_skipped', None)  # A redirect copies the meta of the request it replaces
+        request.meta.pop('response_received', None)
+        if self.download_maxsize:
+            request.meta.setdefault('download_maxsize', self.download_maxsize)
+        return None
+
+    def headers_received(self, headers, body_length, request, spider):
+        if request.url.endswith('/robots.txt'):
+            return
+        if not isinstance(body_length, int):
+            body_length = -1  # UNKNOWN_LENGTH: chunked, or read until the connection closes
+        maxsize = request.meta.get('download_maxsize', self.download_maxsize)
+        if not self._allowed(headers.get(b'Content-Type')):
+            self._skip(request, 'content_type')
+        if maxsize and body_length > maxsize or not self.truncate and body_length > self.max_bytes > 0:
+            self._skip(request, 'too_large')
+        request.meta['response_received'] = 0
+        request.meta['response_sniff'] = not headers.get(b'Content-Encoding')  # Compressed bytes say nothing
+
+    def bytes_received(self, data, request, spider):
+        meta = request.meta
+        if meta.pop('response_sniff', False) and data.startswith(BINARY_MAGIC):
+            self._skip(request, 'binary')
+        received = meta.get('response_received', 0) + len(data)
+        meta['response_received'] = received
+        if received > self.max_bytes > 0:
+            if not self.truncate:
+                self._skip(request, 'too_large')
+            raise StopDownload(fail=False)  # The body so far, this chunk included, becomes the response
+
+    def _skip(self, request, reason):
+        request.meta['response_skipped'] = reason
+        request.meta['dont_cache'] = True
+        raise StopDownload(fail=False)
+
+    def process_response(self, request, response, spider):
+        reason = request.meta.get('response_skipped')
+        if (reason is None and 'cached' in response.flags and not request.url.endswith('/robots.txt')
+                and not self._allowed(response.headers.get(b'Content-Type'))):
+            reason = 'content_type'  # Cached before the limits applied
+        if reason is None and len(response.body) > self.max_bytes > 0:
+            if self.truncate:
+                spider.crawler.stats.inc_value('response_limits/truncated', spider=spider)
+                metrics.inc('responses_truncated_total', domain=urlparse(response.url).netloc)
+                return response.replace(body=response.body[:self.max_bytes])
+            reason = 'too_large'
+        if reason is not None:
+            spider.crawler.stats.inc_value(f'response_limits/skipped/{reason}', spider=spider)
+            metrics.inc('responses_skipped_total', domain=urlparse(response.url).netloc, reason=reason)
+            raise IgnoreRequest(f"Skipped response ({reason}): {response.url}")
+        return response
+
+class AdaptiveThrottleMiddleware:
+    """
+    Reports every download's latency and outcome to the process-wide
+    AdaptiveThrottle (see throttle.py), which sets the concurrency and delay
+    of the host's downloader slot. Replaces AutoThrottle. 429/503 responses
+    are retried (RETRY_TIMES) once the host's backoff, Retry-After included,
+    has passed. Off with ADAPTIVE_THROTTLE_ENABLED = False.
+    """
+
+    def __init__(self, crawler):
+        if not crawler.settings.getbool('ADAPTIVE_THROTTLE_ENABLED', True):
+            raise NotConfigured
+        self.crawler = crawler
+        self.throttle = acquire_throttle(**throttle_options(crawler.settings))
+        self.states = {}  # Slot key (host) -> HostState, for the hosts this spider downloaded from
+        self.max_retry_times = crawler.settings.getint('RETRY_TIMES')
+        metrics.gauge('throttle_hosts', lambda throttle=self.throttle: len(throttle.hosts))
+        metrics.gauge('throttle_window_total', lambda throttle=self.throttle: throttle.allocated)
+        crawler.signals.connect(self.request_reached_downloader, signal=signals.request_reached_downloader)
+        crawler.signals.connect(self.spider_closed, signal=signals.spider_closed)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler)
+
+    def _state(self, request):
+        key = request.meta.get('download_slot')
+        if key is None:
+            return None
+        state = self.states.get(key)
+        if state is None:
+            state = self.states[key] = self.throttle.attach(key)
+        slot = self.crawler.engine.downloader.slots.get(key)
+        if slot is not None:
+            self.throttle.bind(state, slot)
+        return state
+
+    def request_reached_downloader(self, request, spider):
+        # Sent once the downloader has picked the request's slot (meta['download_slot']), creating
+        # it if needed, and before queueing the request on it: the slot gets the host's limits first.
+        self._state(request)
+
+    def process_response(self, request, response, spider):
+        if 'cached' in response.flags:
+            return response
+        state = self._state(request)
+        if state is None:
+            return response
+        status = response.status
+        retry_after = retry_after_seconds(response.headers.get(b'Retry-After')) if status in BACKOFF_STATUSES else None
+        self._slowed(self.throttle.on_response(state, request.meta.get('download_latency'), status, retry_after),
+                     spider)
+        if status in BACKOFF_STATUSES and not request.meta.get('dont_retry'):
+            retry = get_retry_request(request, spider=spider, reason=f'throttled ({status})',
+                                      max_retry_times=self.max_retry_times)
+            if retry is not None:
+                return retry  # Queued behind the slot's new delay
+        return response
+
+    def process_exception(self, request, exception, spider):
+        if isinstance(exception, OVERLOAD_ERRORS):
+            state = self._state(request)
+            if state is not None:
+                self._slowed(self.throttle.on_error(state), spider)
+        return None
+
+    def _slowed(self, reason, spider):
+        if reason is not None:
+            spider.crawler.stats.inc_value(f'throttle/backoff/{reason}', spider=spider)
+            metrics.inc('throttle_backoffs_total', reason=reason)
+
+    def spider_closed(self, spider):
+        for key in self.states:
+            self.throttle.detach(key)
+        self.states.clear()
+        release_throttle(self.throttle)
+
+class CustomRetryMiddleware:
+    def process_exception(self, request, exception, spider):
         if isinstance(exception, DNSLookupError):
-            domain = urlparse(req.url).netloc
-            spider.blocked_domains.add(domain)  # Add domain to blocked list
-            return  # Do not retry DNS errors, move on to the next request
+            host = urlparse(request.url).hostname
+            spider.blocked_domains.add(host)  # DeadHostMiddleware drops the host's queued requests
+            spider.crawler.stats.inc_value('dns/blocked_hosts', spider=spider)
+            return None  # Do not retry DNS errors, move on to the next request
 
         # For other exceptions, let Scrapy's default retry mechanism handle them (or your custom retry logic if needed)
-        return
\ No newline at end of file
+        return None
\ No newline at end of file
@@ -1,98 +1,311 @@
 # greek_scraper/pipelines.py
-import json
 from itemadapter import ItemAdapter # Import if not already in your pipelines.py
-from greek_scraper.gpu_processor import GPUTextProcessor # Import GPU Processor
+from greek_scraper.backends import get_backend # Backends are imported lazily
+from greek_scraper.writer import acquire_shared_writer, release_shared_writer
+from greek_scraper.extraction import acquire_pool, release_pool, ExtractionTimeout
+from greek_scraper.metrics import metrics, SIZE_BUCKETS
+from scrapy.exceptions import DropItem
+from twisted.internet.defer import Deferred, DeferredList, DeferredSemaphore, TimeoutError
 from twisted.internet.threads import deferToThread # Ensure this is imported if you moved it
+import time
 import unicodedata
+from urllib.parse import urlparse
+
+class ExtractionPipeline:
+    """
+    Runs trafilatura on item['html'] in a pool of worker processes, so text
+    extraction uses every core instead of the reactor's. At most
+    `max_in_flight` documents are queued for the workers; further items wait
+    here, which holds back the scraper (and so the downloader) until workers
+    catch up.
+    """
+
+    def __init__(self, workers=None, max_in_flight=None, timeout=20.0, start_method=None):
+        self.workers = workers
+        self.start_method = start_method
+        self.timeout = timeout or None  # Seconds per document, 0 disables
+        self.pool = acquire_pool(workers, start_method)
+        self.max_in_flight = max_in_flight or self.pool.workers * 4
+        self.slots = DeferredSemaphore(self.max_in_flight)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        return cls(
+            workers=settings.getint('EXTRACTION_WORKERS', 0) or None,  # 0: one per core, minus one
+            max_in_flight=settings.getint('EXTRACTION_MAX_IN_FLIGHT', 0) or None,
+            timeout=settings.getfloat('EXTRACTION_TIMEOUT', 20.0),
+            start_method=settings.get('EXTRACTION_START_METHOD'),
+        )
+
+    def process_item(self, item, spider):
+        adapter = ItemAdapter(item)
+        if 'html' not in adapter:
+            return item
+        html = adapter.pop('html')
+        if not html:
+            adapter['text'] = ""
+            return item
+
+        d = self.slots.run(self._extract, html)
+        d.addCallbacks(lambda text: adapter.__setitem__('text', text),
+                       lambda failure: self._extraction_failed(failure, adapter, spider))
+        d.addCallback(lambda _: item)
+        return d
+
+    def _extract(self, html):
+        start = time.perf_counter()
+        d = self.pool.submit(html, self.timeout)
+        d.addBoth(self._timed, start)
+        return d
+
+    @staticmethod
+    def _timed(result, start):
+        metrics.observe('extraction_seconds', time.perf_counter() - start)
+        return result
+
+    def _extraction_failed(self, failure, adapter, spider):
+        adapter['text'] = ""
+        if failure.check(ExtractionTimeout, TimeoutError):
+            spider.crawler.stats.inc_value('extraction/timeout', spider=spider)
+            spider.logger.warning(f"[ExtractionPipeline] Extraction timed out: {adapter.get('url')}")
+        else:
+            spider.crawler.stats.inc_value('extraction/error', spider=spider)
+            spider.logger.error(f"[ExtractionPipeline] Error extracting {adapter.get('url')}: {failure.getErrorMessage()}")
+
+    def close_spider(self, spider):
+        # Stopping the workers (if no other spider uses them) waits on processes; keep it off the reactor.
+        d = deferToThread(release_pool, self.pool)
+        d.addErrback(lambda err: spider.logger.error(f"[ExtractionPipeline] Error stopping workers: {err}"))
+        return d
 
 class TextPipeline:
-    def __init__(self, use_cpu=False, target_language=None): # Accept use_cpu and target_language in init
+    """
+    Batched cleaning stage. Items are held until their batch has been cleaned
+    off the reactor thread and only then passed on to the next pipeline, so
+    StoragePipeline always sees the cleaned text.
+    """
+
+    def __init__(self, use_cpu=False, target_language=None, backend=None, batch_size=250, max_latency_ms=50): # Accept use_cpu and target_language in init
         self.use_cpu = use_cpu
         self.target_language = target_language
-        if not self.use_cpu:
-            self.gpu_processor = GPUTextProcessor()
-        else:
-            self.gpu_processor = None # No GPU processor in CPU mode
-        self.batch = []
-        self.batch_size = 250
+        # Preferred text backend; nothing is imported until the first batch needs it.
+        self.preferred_backend = backend or ('cpu-numpy' if self.use_cpu else 'cuda')
+        self.backend_name = None
+        self.processor = None
+        self.batch = []  # (item, Deferred) pairs, only touched on the reactor thread
+        self.batch_size = max(1, batch_size)
+        self.max_latency = max(0, max_latency_ms) / 1000.0  # Flush a partial batch after this long
+        self._timer = None
+        self._in_flight = set()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        spider = crawler.spider
+        settings = crawler.settings
+        return cls(
+            use_cpu=getattr(spider, 'use_cpu', False),
+            target_language=getattr(spider, 'target_language', None),
+            backend=settings.get('TEXT_BACKEND'),
+            batch_size=settings.getint('TEXT_BATCH_SIZE', 250),
+            max_latency_ms=settings.getfloat('TEXT_BATCH_MAX_LATENCY_MS', 50),
+        )
 
     def process_item(self, item, spider):
-        self.batch.append(item)
+        d = Deferred()
+        self.batch.append((item, d))
         if len(self.batch) >= self.batch_size:
-            d = deferToThread(self._process_batch)
-            d.addErrback(lambda err: spider.logger.error(f"Batch error: {err}")) # Generic error message
-        return item
-    
-    def _filter_greek_text(self, text):
-        normalized = unicodedata.normalize('NFKC', text).strip()
-        return ''.join(c for c in normalized if self._is_greek_char(ord(c)))
-
-    def _process_batch(self):
-        texts = [itm['text'] for itm in self.batch]
-        cleaned_texts = []
-        if not self.use_cpu: # Use GPU processing if not in CPU mode
-            processed_texts = self.gpu_processor.process_batch(texts)
-            if processed_texts is None: # Handle potential GPU processing error
-                cleaned_texts = texts # Fallback to original texts if GPU processing fails
-            else:
-                cleaned_texts = processed_texts
+            self._flush_batch(spider)
+        elif self._timer is None:
+            from twisted.internet import reactor
+            self._timer = reactor.callLater(self.max_latency, self._flush_batch, spider)
+        return d
 
-            if self.target_language == 'gr' or self.target_language == 'greek': # Apply Greek filter if target language is Greek
-                 final_cleaned_texts = []
-                 for text in cleaned_texts:
-                     # Apply GPU Greek filtering AGAIN after initial cleanup (ensure only greek chars remain after overall cleaning) - optional, could be redundant if GPU filter is robust enough
-                     if not self.use_cpu and self.gpu_processor: # Use GPU filtering if GPU is enabled and processor available
-                        gpu_cleaned_texts_secondary = self.gpu_processor.process_batch([text]) # Process each text individually on GPU for greek filtering
-                        if self.gpu_processor:
-                            gpu_result = self.gpu_processor.process_batch([text])
-                            if gpu_result and gpu_result[0]:
-                                final_cleaned_texts.append(gpu_result[0])
-                            else:
-                                final_cleaned_texts.append(self._filter_greek_text(text))
-                        else:
-                            final_cleaned_texts.append(self._filter_greek_text(text))
-                     else: # CPU-based normalization and greek char filtering
-                         normalized_text_cpu = ''.join(c for c in unicodedata.normalize('NFKC', text).strip() if self._is_greek_char(ord(c))) # CPU based greek char filter
-                         final_cleaned_texts.append(normalized_text_cpu)
-                 cleaned_texts = final_cleaned_texts # Update cleaned_texts with greek filtered texts
-            else:
-                print("[TextPipeline] No language specific filtering applied.") # Generic scraping, no language filtering
-
-        else: # CPU mode - perform CPU based cleanup/normalization if needed. Now it only normalizes.
-            cleaned_texts = [unicodedata.normalize('NFKC', text).strip() for text in texts] # Basic CPU normalization
-
-        if not cleaned_texts:
-            self.batch = [] # Clear batch if cleaning resulted in None or empty list
-        else:
-            for itm, text in zip(self.batch, cleaned_texts):
-                itm['text'] = text
-            self.batch = []
+    def _flush_batch(self, spider):
+        if self._timer is not None and self._timer.active():
+            self._timer.cancel()
+        self._timer = None
+        if not self.batch:
+            return
+
+        # The worker thread only gets the texts; items are updated back on the reactor thread.
+        batch, self.batch = self.batch, []
+        metrics.observe('text_batch_size', len(batch), buckets=SIZE_BUCKETS)
+        start = time.perf_counter()
+        d = deferToThread(self._process_batch, [itm['text'] for itm, _ in batch])
+        d.addBoth(self._timed, start)  # Cleaning only, not the later pipelines
+        d.addCallback(self._release_batch, batch)
+        d.addErrback(self._release_uncleaned, batch, spider)
+        self._in_flight.add(d)
+        d.addBoth(self._forget, d)
+
+    def _release_batch(self, cleaned_texts, batch):
+        for (itm, item_d), text in zip(batch, cleaned_texts):
+            itm['text'] = text
+            item_d.callback(itm)
+
+    def _release_uncleaned(self, failure, batch, spider):
+        spider.logger.error(f"[TextPipeline] Batch error: {failure.getErrorMessage()}")
+        for itm, item_d in batch:
+            if not item_d.called:
+                item_d.callback(itm)
+
+    @staticmethod
+    def _timed(result, start):
+        metrics.observe('text_batch_seconds', time.perf_counter() - start)
+        return result
 
-    def _is_greek_char(self, char_code):
-        # CPU based greek character check - same ranges as GPU kernel
-        c = char_code
-        return (c >= 0x0370 and c <= 0x03FF) or \
-            (c >= 0x1F00 and c <= 0x1FFF)  # Basic and Extended Greek Ranges (Emoji range removed for CPU check)
+    def _forget(self, result, d):
+        self._in_flight.discard(d)
+        return result
+
+    def _get_processor(self):
+        if self.processor is None:
+            self.backend_name, self.processor = get_backend(self.preferred_backend)
+        return self.processor
+
+    def _process_batch(self, texts):
+        """Cleans a list of texts. Runs in a worker thread and touches no shared state."""
+        cleaned_texts = [unicodedata.normalize('NFKC', text).strip() for text in texts] # Basic normalization
+
+        if self.target_language == 'gr' or self.target_language == 'greek': # Apply Greek filter if target language is Greek
+            processed_texts = self._get_processor().process_batch(cleaned_texts) # Whole batch in one backend call
+            if processed_texts is not None: # Fallback to normalized texts if the backend fails
+                cleaned_texts = processed_texts
+
+        return cleaned_texts
 
     def close_spider(self, spider):
-        if self.batch:
-            # Process any remaining items synchronously before closing.
-            self._process_batch()
+        # Release any partial batch and wait for batches still being cleaned.
+        self._flush_batch(spider)
+        if self._in_flight:
+            return DeferredList(list(self._in_flight))
+
+class DedupPipeline:
+    """
+    Drops (DEDUP_ACTION='drop') or flags ('flag') pages whose cleaned text
+    exactly or nearly matches a recently seen page, such as tag, pagination and
+    print views of the same article. Fingerprints are computed off the reactor
+    thread and checked against a bounded NearDuplicateIndex.
+    """
+
+    def __init__(self, action='drop', threshold=0.8, max_docs=100000, min_chars=100, skip_links=False):
+        self.action = action
+        self.min_chars = min_chars  # Shorter texts (empty pages, stubs) are never treated as duplicates
+        self.skip_links = skip_links
+        from greek_scraper import dedup  # Imported here: it needs NumPy, which `import greek_scraper` must not load
+        self.fingerprint = dedup.fingerprint
+        self.index = dedup.NearDuplicateIndex(max_docs=max_docs, threshold=threshold)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        return cls(
+            action=settings.get('DEDUP_ACTION', 'drop'),
+            threshold=settings.getfloat('DEDUP_THRESHOLD', 0.8),
+            max_docs=settings.getint('DEDUP_INDEX_SIZE', 100000),
+            min_chars=settings.getint('DEDUP_MIN_CHARS', 100),
+            skip_links=settings.getbool('DEDUP_SKIP_LINKS'),
+        )
+
+    def process_item(self, item, spider):
+        adapter = ItemAdapter(item)
+        text = adapter.get('text') or ""
+        if len(text) < self.min_chars:
+            self._release_links(spider, adapter, follow=True)
+            return item
+
+        d = deferToThread(self.fingerprint, text)
+        d.addCallback(self._check, item, adapter, spider)
+        d.addErrback(self._fingerprint_failed, item, adapter, spider)
+        return d
+
+    def _check(self, fp, item, adapter, spider):
+        duplicate = self.index.check(adapter.get('url'), *fp)
+        if duplicate is None:
+            self._release_links(spider, adapter, follow=True)
+            return item
+
+        kind, original = duplicate
+        spider.crawler.stats.inc_value(f'dedup/{kind}', spider=spider)
+        self._release_links(spider, adapter, follow=False)  # Its links were already reachable from the original
+        if self.action == 'flag':
+            adapter['duplicate'] = kind
+            adapter['duplicate_of'] = original
+            return item
+        raise DropItem(f"{kind} duplicate of {original}")
+
+    def _fingerprint_failed(self, failure, item, adapter, spider):
+        if failure.check(DropItem):
+            return failure
+        spider.logger.error(f"[DedupPipeline] Error fingerprinting {adapter.get('url')}: {failure.getErrorMessage()}")
+        self._release_links(spider, adapter, follow=True)
+        return item
+
+    def _release_links(self, spider, adapter, follow):
+        if self.skip_links and hasattr(spider, 'release_links'):
+            spider.release_links(adapter.get('url'), follow)
 
 class StoragePipeline:
-    def __init__(self, jobdir=None, output_file='data.jsonl'): 
-        self.output_file_name_jsonl = output_file  
-        self.jsonl_file = open(self.output_file_name_jsonl, 'a', encoding='utf-8', errors='replace')
+    def __init__(self, jobdir=None, output_file='data.jsonl', **writer_options):
+        self.output_file_name_jsonl = output_file
+        # Items are serialized here and written in bulk by a background thread. Every
+        # pipeline writing to the same file in this process shares one writer.
+        # writer_options: see writer_options() below.
+        self.writer = acquire_shared_writer(self.output_file_name_jsonl, **writer_options)
+        writer = self.writer
+        metrics.gauge('writer_queue_depth', lambda: writer.queue_depth, path=self.output_file_name_jsonl)
+        metrics.gauge('writer_bytes_written', lambda: writer.bytes_written, path=self.output_file_name_jsonl)
+        metrics.gauge('writer_items_written', lambda: writer.items_written, path=self.output_file_name_jsonl)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(
+            jobdir=crawler.settings.get('JOBDIR'),
+            output_file=getattr(crawler.spider, 'output_file', 'data.jsonl'),
+            **cls.writer_options(crawler.settings)
+        )
+
+    @staticmethod
+    def writer_options(settings):
+        """BufferedWriter and output format options from the OUTPUT_* settings."""
+        fsync_interval = settings.get('OUTPUT_FSYNC_INTERVAL')
+        compression_level = settings.get('OUTPUT_COMPRESSION_LEVEL')
+        return {
+            'output_format': settings.get('OUTPUT_FORMAT'),
+            'shard_max_bytes': settings.getint('OUTPUT_SHARD_MAX_BYTES', 0) or None,
+            'shard_max_records': settings.getint('OUTPUT_SHARD_MAX_RECORDS', 0) or None,
+            'compression_level': None if compression_level is None else int(compression_level),
+            'row_group_size': settings.getint('OUTPUT_ROW_GROUP_SIZE', 10000),
+            'flush_items': settings.getint('OUTPUT_FLUSH_ITEMS', 500),
+            'flush_bytes': settings.getint('OUTPUT_FLUSH_BYTES', 1 << 20),
+            'flush_interval': settings.getfloat('OUTPUT_FLUSH_INTERVAL', 1.0),
+            'max_pending': settings.getint('OUTPUT_MAX_PENDING', 64),
+            'fsync_interval': None if fsync_interval is None else float(fsync_interval),
+        }
 
     def process_item(self, item, spider):
         try:
-            json.dump(item, self.jsonl_file, ensure_ascii=False)
-            self.jsonl_file.write("\n")
-            self.jsonl_file.flush()  # Flush after each write to persist data immediately
+            record = self.writer.serialize(item)
         except Exception as e:
-            spider.logger.error(f"[StoragePipeline] Error writing to file: {e}")
-        return item
+            spider.logger.error(f"[StoragePipeline] Error serializing item: {e}")
+            return item
+
+        if self.writer.write(record, domain=urlparse(item.get('url', '')).netloc):
+            return item
+        # Writer queue is full: hold this item until the writer thread catches up.
+        d = deferToThread(self.writer.wait_for_space)
+        d.addCallback(lambda _: item)
+        return d
 
     def close_spider(self, spider):
-        if self.jsonl_file:
-            self.jsonl_file.close()
\ No newline at end of file
+        # Final drain (if this is the last user of the file) runs off the reactor thread;
+        # Scrapy waits for the Deferred.
+        d = deferToThread(release_shared_writer, self.writer)
+        d.addCallback(lambda _: self._report_errors(spider))
+        d.addErrback(lambda err: spider.logger.error(f"[StoragePipeline] Error closing output file: {err}"))
+        return d
+
+    def _report_errors(self, spider):
+        if self.writer.last_error is not None:
+            spider.logger.error(f"[StoragePipeline] Error writing to file: {self.writer.last_error}")
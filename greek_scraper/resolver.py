@@ -0,0 +1,197 @@
+# greek_scraper/resolver.py
+import socket
+import time
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+from twisted.internet import defer
+from twisted.internet.error import DNSLookupError
+from twisted.internet.interfaces import IResolverSimple
+from twisted.internet.threads import deferToThreadPool
+from twisted.python.threadpool import ThreadPool
+from zope.interface import implementer
+
+from greek_scraper.metrics import metrics
+
+_installed = None  # The CachingResolver CrawlerProcess installed on the reactor, if it is ours
+
+
+class DNSCache:
+    """
+    host -> (expiry time, address), where address None records a failed
+    lookup. LRU-bounded; entries expire after the positive or negative TTL.
+    """
+
+    def __init__(self, size=100000, positive_ttl=300.0, negative_ttl=900.0):
+        self.size = size
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self.entries = OrderedDict()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, host):
+        """(True, address or None) for a live entry, (False, None) if unknown or expired."""
+        entry = self.entries.get(host)
+        if entry is None:
+            return False, None
+        if entry[0] < time.monotonic():
+            del self.entries[host]
+            return False, None
+        self.entries.move_to_end(host)
+        return True, entry[1]
+
+    def put(self, host, address):
+        ttl = self.positive_ttl if address is not None else self.negative_ttl
+        if ttl <= 0 or self.size <= 0:
+            return
+        self.entries[host] = (time.monotonic() + ttl, address)
+        self.entries.move_to_end(host)
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+    def is_dead(self, host):
+        found, address = self.get(host)
+        return found and address is None
+
+
+# Shared by every spider of the process, like Scrapy's own dnscache.
+dns_cache = DNSCache()
+
+
+def host_of(domain):
+    """Host name of a seed domain or URL: 'https://www.in.gr/x' -> 'www.in.gr'."""
+    domain = domain.strip()
+    if '://' not in domain:
+        domain = '//' + domain
+    try:
+        return urlsplit(domain).hostname
+    except ValueError:
+        return None
+
+
+def installed_resolver():
+    return _installed
+
+
+@implementer(IResolverSimple)
+class CachingResolver:
+    """
+    Replacement for Scrapy's CachingThreadedResolver (DNS_RESOLVER): one per
+    process, so every spider of a multi-domain run shares its cache.
+
+    - Successful and failed lookups are cached, for DNS_POSITIVE_TTL and
+      DNS_NEGATIVE_TTL seconds; a host that failed fails again at once.
+    - Concurrent lookups of the same host share one resolution.
+    - Lookups run on their own thread pool (DNS_THREADS), so slow resolvers
+      don't hold up the reactor's pool, and give up after DNS_TIMEOUT.
+    - prefetch() resolves seed hosts ahead of the crawl.
+    """
+
+    def __init__(self, reactor, cache_size=100000, positive_ttl=300.0, negative_ttl=900.0, timeout=60.0,
+                 threads=32, prefetch_concurrency=16):
+        self.reactor = reactor
+        self.timeout = timeout
+        self.prefetch_concurrency = max(1, min(prefetch_concurrency, threads))
+        dns_cache.size = cache_size
+        dns_cache.positive_ttl = positive_ttl
+        dns_cache.negative_ttl = negative_ttl
+        self.pool = ThreadPool(minthreads=0, maxthreads=max(1, threads), name='greek_scraper-dns')
+        self._inflight = {}  # host -> Deferreds waiting for the lookup running for it
+
+    @classmethod
+    def from_crawler(cls, crawler, reactor):
+        settings = crawler.settings
+        return cls(
+            reactor,
+            cache_size=settings.getint('DNSCACHE_SIZE') if settings.getbool('DNSCACHE_ENABLED') else 0,
+            positive_ttl=settings.getfloat('DNS_POSITIVE_TTL', 300.0),
+            negative_ttl=settings.getfloat('DNS_NEGATIVE_TTL', 900.0),
+            timeout=settings.getfloat('DNS_TIMEOUT'),
+            threads=settings.getint('DNS_THREADS', 32),
+            prefetch_concurrency=settings.getint('DNS_PREFETCH_CONCURRENCY', 16),
+        )
+
+    def install_on_reactor(self):
+        global _installed
+        self.reactor.installResolver(self)
+        self.pool.start()
+        self.reactor.addSystemEventTrigger('during', 'shutdown', self.pool.stop)
+        _installed = self
+
+    def is_dead(self, host):
+        return dns_cache.is_dead(host)
+
+    def getHostByName(self, name, timeout=()):
+        found, address = dns_cache.get(name)
+        if found:
+            metrics.inc('dns_lookups_total', result='hit' if address is not None else 'negative')
+            if address is None:
+                return defer.fail(DNSLookupError(f"{name} (cached failure)"))
+            return defer.succeed(address)
+
+        d = defer.Deferred()
+        waiting = self._inflight.get(name)
+        if waiting is not None:
+            metrics.inc('dns_lookups_total', result='shared')
+            waiting.append(d)
+            return d
+        metrics.inc('dns_lookups_total', result='miss')
+        self._inflight[name] = [d]
+        start = time.perf_counter()
+        lookup = deferToThreadPool(self.reactor, self.pool, socket.gethostbyname, name)
+        timer = self.reactor.callLater(self.timeout, self._timed_out, name)
+        lookup.addBoth(self._resolved, name, timer, start)
+        return d
+
+    def _timed_out(self, name):
+        # The thread keeps waiting on the system resolver; its result is ignored.
+        self._finish(name, None, DNSLookupError(f"{name} (timed out after {self.timeout:g}s)"))
+
+    def _resolved(self, result, name, timer, start):
+        if not timer.active():
+            return None  # Already failed by the timeout
+        timer.cancel()
+        metrics.observe('dns_lookup_seconds', time.perf_counter() - start)
+        if isinstance(result, str):
+            self._finish(name, result, None)
+        else:
+            self._finish(name, None, DNSLookupError(f"{name} ({result.getErrorMessage()})"))
+        return None
+
+    def _finish(self, name, address, error):
+        dns_cache.put(name, address)
+        if address is None:
+            metrics.inc('dns_failures_total')
+        for d in self._inflight.pop(name, []):
+            if address is not None:
+                d.callback(address)
+            else:
+                d.errback(error)
+
+    def resolve(self, host):
+        return self.getHostByName(host)
+
+    def prefetch(self, hosts):
+        """
+        Resolves `hosts` (any iterable, consumed lazily) in the background, at
+        most prefetch_concurrency at a time so lookups made by the crawl
+        itself don't queue behind them.
+        Returns a Deferred that fires with the number of dead hosts found.
+        """
+        hosts = iter(hosts)
+        dead = []
+
+        @defer.inlineCallbacks
+        def worker():
+            for host in hosts:  # Shared iterator: each host goes to one worker
+                if not host or dns_cache.get(host)[0]:
+                    continue
+                try:
+                    yield self.getHostByName(host)
+                except DNSLookupError:
+                    dead.append(host)
+
+        workers = [worker() for _ in range(self.prefetch_concurrency)]
+        return defer.DeferredList(workers, consumeErrors=True).addCallback(lambda _: len(dead))
@@ -0,0 +1,149 @@
+# greek_scraper/scheduler.py
+import heapq
+import itertools
+from collections import deque
+
+from greek_scraper.resolver import host_of
+
+
+class DomainScheduler:
+    """
+    Keeps `max_active` domains crawling at once inside one CrawlerProcess and
+    starts the next domain as soon as any running crawl finishes.
+
+    Domains are taken in list order, read lazily from any iterable
+    `read_ahead` at a time, or largest-first when `size_estimates` (domain ->
+    estimated pages) is given, so long crawls start early instead of holding
+    up the tail of the run.
+
+    `source(n)`, if given, is asked for up to n more domains whenever the
+    list runs out (e.g. claims from a shard queue). `on_domain_done(domain,
+    ok)` is called as each crawl ends.
+
+    With a `resolver` (see resolver.py), a domain's host is looked up before
+    its spider is created, and domains whose lookup fails are skipped. Hosts
+    are prefetched as domains are read ahead.
+    """
+
+    def __init__(self, process, spider_cls, domains, max_active=10, size_estimates=None, on_done=None,
+                 source=None, on_domain_done=None, resolver=None, read_ahead=1000, **spider_kwargs):
+        self.process = process
+        self.spider_cls = spider_cls
+        self.max_active = max(1, max_active)
+        self.spider_kwargs = spider_kwargs
+        self.on_done = on_done
+        self.source = source
+        self.on_domain_done = on_domain_done
+        self.resolver = resolver
+        self.read_ahead = max(1, read_ahead)
+        self.active = set()
+        self.finished = 0
+        self.failed = 0
+        self.dead = 0  # Skipped because their host does not resolve
+
+        domains = (d.strip() for d in domains)
+        if size_estimates:
+            counter = itertools.count()  # Keeps list order among equal estimates
+            self._heap = [(-size_estimates.get(d, 0), next(counter), d) for d in domains if d]
+            heapq.heapify(self._heap)
+            self._queue = None
+            self._unread = iter(())
+        else:
+            self._heap = None
+            self._queue = deque()
+            self._unread = (d for d in domains if d)  # Not read yet: the list may not fit in memory
+
+    def __len__(self):
+        """Domains read but not started yet."""
+        return len(self._heap) if self._heap is not None else len(self._queue)
+
+    def start(self):
+        if self._heap is not None and self.resolver is not None:
+            self.resolver.prefetch(host_of(entry[2]) for entry in sorted(self._heap))
+        self._fill()
+
+    def _read_more(self):
+        """Tops the queue up to read_ahead domains, prefetching their hosts."""
+        batch = list(itertools.islice(self._unread, self.read_ahead - len(self._queue)))
+        self._queue.extend(batch)
+        if batch and self.resolver is not None:
+            self.resolver.prefetch(host_of(domain) for domain in batch)
+
+    def _take(self):
+        if self._heap is not None:
+            return heapq.heappop(self._heap)[2] if self._heap else None
+        if len(self._queue) <= self.read_ahead // 2:
+            self._read_more()
+        return self._queue.popleft() if self._queue else None
+
+    def _next_domain(self):
+        domain = self._take()
+        if domain is None and self.source is not None:
+            try:
+                self._extend(self.source(self.max_active - len(self.active)))
+            except Exception as e:
+                print(f"[greek_scraper] ERROR: Could not fetch more domains: {e}")
+            domain = self._take()
+        return domain
+
+    def _extend(self, domains):
+        for domain in domains:
+            if self._heap is not None:
+                heapq.heappush(self._heap, (0, len(self._heap), domain))  # No estimate: after the known ones
+            else:
+                self._queue.append(domain)
+
+    def _fill(self):
+        while len(self.active) < self.max_active:
+            domain = self._next_domain()
+            if domain is None:
+                break
+            if self.resolver is None:
+                self.active.add(domain)
+                self._start(None, domain)
+                continue
+            host = host_of(domain)
+            if host is None or self.resolver.is_dead(host):
+                self._skip(domain)  # Known dead: don't even create a spider for it
+                continue
+            self.active.add(domain)
+            d = self.resolver.resolve(host)
+            d.addCallbacks(self._start, self._unresolvable, callbackArgs=(domain,), errbackArgs=(domain,))
+
+        if not self.active and self.on_done is not None:
+            on_done, self.on_done = self.on_done, None
+            on_done()
+
+    def _start(self, address, domain):
+        d = self.process.crawl(self.spider_cls, seed_domains=[domain], **self.spider_kwargs)
+        d.addCallbacks(self._finished, self._failed, callbackArgs=(domain,), errbackArgs=(domain,))
+
+    def _skip(self, domain):
+        self.dead += 1
+        self._notify(domain, False)
+
+    def _unresolvable(self, failure, domain):
+        self.active.discard(domain)
+        self._skip(domain)
+        self._fill()
+
+    def _finished(self, result, domain):
+        self.finished += 1
+        self._done(domain, True)
+
+    def _failed(self, failure, domain):
+        self.failed += 1
+        print(f"[greek_scraper] ERROR: Crawl of {domain} failed: {failure.getErrorMessage()}")
+        self._done(domain, False)
+
+    def _done(self, domain, ok):
+        self.active.discard(domain)
+        self._notify(domain, ok)
+        self._fill()
+
+    def _notify(self, domain, ok):
+        if self.on_domain_done is not None:
+            try:
+                self.on_domain_done(domain, ok)
+            except Exception as e:
+                print(f"[greek_scraper] ERROR: Could not record the end of {domain}: {e}")
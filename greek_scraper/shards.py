@@ -0,0 +1,411 @@
+# greek_scraper/shards.py
+"""
+Sharded crawling across processes and machines.
+
+Domains are hash-partitioned into shards in a coordination database
+(ShardQueue, SQLite). Each worker process runs its own reactor through
+run_multi_scraper, claims domains of its shard (then those of shards no
+live worker serves) and writes its own output shard. Workers heartbeat into the database; the
+domains of a worker whose heartbeat stops are handed out again.
+
+    python -m greek_scraper.shards add --queue shards.db --shards 8 domains.txt
+    python -m greek_scraper.shards worker --queue shards.db --shard 3 --output data.jsonl
+    python -m greek_scraper.shards status --queue shards.db
+
+run_sharded_scraper does all of this for N local worker processes. For
+several machines, put the queue on storage every node can reach with working
+file locks and start workers on each node with the commands above. The queue
+uses SQLite's rollback journal, not WAL: WAL coordinates through shared
+memory, which only works between processes of one host.
+"""
+import argparse
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+
+from greek_scraper.sources import read_domains
+
+# Domain states
+PENDING = 0
+CLAIMED = 1
+DONE = 2
+FAILED = 3
+STATE_NAMES = {PENDING: 'pending', CLAIMED: 'claimed', DONE: 'done', FAILED: 'failed'}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS domains (
+    id INTEGER PRIMARY KEY,
+    domain TEXT NOT NULL UNIQUE,
+    shard INTEGER NOT NULL,
+    state INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    updated REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS domains_claim ON domains (state, shard, id);
+CREATE TABLE IF NOT EXISTS workers (
+    worker TEXT PRIMARY KEY,
+    shard INTEGER NOT NULL,
+    host TEXT,
+    pid INTEGER,
+    output TEXT,
+    started REAL NOT NULL,
+    heartbeat REAL NOT NULL,
+    alive INTEGER NOT NULL,
+    stats TEXT
+) WITHOUT ROWID;
+"""
+
+
+def shard_of(domain, shards):
+    """Stable shard number of a domain: the same on every machine and every run."""
+    digest = hashlib.blake2b(domain.strip().lower().encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') % shards
+
+
+def shard_path(path, shard):
+    """data.jsonl.gz -> data-shard03.jsonl.gz"""
+    if not path:
+        return path
+    directory, name = os.path.split(path)
+    stem, dot, ext = name.partition('.')
+    return os.path.join(directory, f"{stem}-shard{shard:02d}{dot}{ext}")
+
+
+class ShardQueue:
+    """
+    Domain leases in SQLite, shared by every worker of a sharded crawl.
+
+    A claimed domain belongs to its worker until the worker finishes it or
+    its heartbeat is older than `lease_timeout` seconds; then the next claim
+    puts the domain back in the queue. A domain handed out `max_attempts`
+    times without finishing is marked failed.
+    """
+
+    def __init__(self, path, lease_timeout=120.0, max_attempts=3):
+        self.path = path
+        self.lease_timeout = lease_timeout
+        self.max_attempts = max(1, max_attempts)
+        self._lock = threading.Lock()  # The worker's heartbeat thread shares the connection
+        # timeout: how long a worker waits for another's write lock before giving up.
+        self._conn = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=DELETE')  # Rollback journal: safe on network file systems
+        self._conn.executescript(SCHEMA)
+
+    def _transaction(self, fn, *args):
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')  # Take the write lock up front: no upgrade deadlocks
+            try:
+                result = fn(*args)
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+            self._conn.execute('COMMIT')
+            return result
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # ---- coordinator ----
+
+    def add(self, domains, shards):
+        """Queues new domains over `shards` shards. Returns how many were not queued already."""
+        def insert():
+            before = self._conn.total_changes
+            self._conn.executemany(
+                'INSERT OR IGNORE INTO domains (domain, shard, updated) VALUES (?, ?, ?)',
+                ((d, shard_of(d, shards), time.time()) for d in (d.strip() for d in domains) if d))
+            return self._conn.total_changes - before
+        return self._transaction(insert)
+
+    def release(self, worker):
+        """Marks a worker gone and queues its unfinished domains again."""
+        def release():
+            self._conn.execute('UPDATE workers SET alive = 0 WHERE worker = ?', (worker,))
+            self._requeue('worker = ?', (worker,))
+        self._transaction(release)
+
+    def remaining(self, shard=None):
+        """Domains pending or claimed, in one shard or all."""
+        query = 'SELECT COUNT(*) FROM domains WHERE state IN (?, ?)'
+        params = (PENDING, CLAIMED)
+        if shard is not None:
+            query += ' AND shard = ?'
+            params += (shard,)
+        with self._lock:
+            return self._conn.execute(query, params).fetchone()[0]
+
+    def summary(self):
+        """Domain counts by state, each worker's last stats and the stats summed over all workers."""
+        with self._lock:
+            states = dict(self._conn.execute('SELECT state, COUNT(*) FROM domains GROUP BY state').fetchall())
+            done = dict(((w, s), n) for w, s, n in self._conn.execute(
+                'SELECT worker, state, COUNT(*) FROM domains WHERE worker IS NOT NULL GROUP BY worker, state'))
+            rows = self._conn.execute(
+                'SELECT worker, shard, host, pid, output, alive, heartbeat, stats FROM workers ORDER BY shard, started'
+            ).fetchall()
+        workers = []
+        totals = {}
+        for worker, shard, host, pid, output, alive, heartbeat, stats in rows:
+            stats = json.loads(stats) if stats else {}
+            for key, value in stats.items():
+                if isinstance(value, (int, float)):
+                    totals[key] = totals.get(key, 0) + value
+            workers.append({'worker': worker, 'shard': shard, 'host': host, 'pid': pid, 'output': output,
+                            'alive': bool(alive), 'heartbeat': heartbeat, 'domains_done': done.get((worker, DONE), 0),
+                            'domains_failed': done.get((worker, FAILED), 0), 'stats': stats})
+        return {'domains': {name: states.get(state, 0) for state, name in STATE_NAMES.items()},
+                'workers': workers, 'totals': totals}
+
+    # ---- workers ----
+
+    def register(self, worker, shard, output=None):
+        now = time.time()
+        self._transaction(lambda: self._conn.execute(
+            'INSERT OR REPLACE INTO workers (worker, shard, host, pid, output, started, heartbeat, alive, stats) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, 1, NULL)',
+            (worker, shard, socket.gethostname(), os.getpid(), output, now, now)))
+
+    def heartbeat(self, worker, stats=None):
+        self._transaction(lambda: self._conn.execute(
+            'UPDATE workers SET heartbeat = ?, alive = 1, stats = COALESCE(?, stats) WHERE worker = ?',
+            (time.time(), json.dumps(stats) if stats is not None else None, worker)))
+
+    def claim(self, worker, shard, limit):
+        """
+        Leases up to `limit` pending domains: this shard's first, then those
+        of shards no live worker is serving (dead, finished or never started).
+        """
+        def claim():
+            self._expire_leases()
+            rows = self._conn.execute(
+                'SELECT id, domain FROM domains WHERE state = ? AND shard = ? ORDER BY id LIMIT ?',
+                (PENDING, shard, limit)).fetchall()
+            if len(rows) < limit:
+                rows += self._conn.execute(
+                    'SELECT id, domain FROM domains WHERE state = ? AND shard != ? '
+                    'AND shard NOT IN (SELECT shard FROM workers WHERE alive = 1) ORDER BY id LIMIT ?',
+                    (PENDING, shard, limit - len(rows))).fetchall()
+            self._conn.executemany(
+                'UPDATE domains SET state = ?, worker = ?, attempts = attempts + 1, updated = ? WHERE id = ?',
+                [(CLAIMED, worker, time.time(), row_id) for row_id, _ in rows])
+            return [domain for _, domain in rows]
+        if limit <= 0:
+            return []
+        return self._transaction(claim)
+
+    def finish(self, worker, domain, ok=True):
+        """Records a finished domain, unless its lease has meanwhile gone to another worker."""
+        self._transaction(lambda: self._conn.execute(
+            'UPDATE domains SET state = ?, updated = ? WHERE domain = ? AND worker = ? AND state = ?',
+            (DONE if ok else FAILED, time.time(), domain, worker, CLAIMED)))
+
+    def retire(self, worker, stats=None):
+        """A worker's clean exit: final stats, anything still claimed goes back to the queue."""
+        def retire():
+            self._conn.execute('UPDATE workers SET alive = 0, heartbeat = ?, stats = COALESCE(?, stats) '
+                               'WHERE worker = ?',
+                               (time.time(), json.dumps(stats) if stats is not None else None, worker))
+            self._requeue('worker = ?', (worker,))
+        self._transaction(retire)
+
+    # ---- inside a transaction ----
+
+    def _expire_leases(self):
+        self._conn.execute('UPDATE workers SET alive = 0 WHERE alive = 1 AND heartbeat < ?',
+                           (time.time() - self.lease_timeout,))
+        self._requeue('worker IN (SELECT worker FROM workers WHERE alive = 0)', ())
+
+    def _requeue(self, where, params):
+        self._conn.execute(
+            f'UPDATE domains SET state = CASE WHEN attempts >= ? THEN ? ELSE ? END, updated = ? '
+            f'WHERE state = ? AND {where}',
+            (self.max_attempts, FAILED, PENDING, time.time(), CLAIMED) + params)
+
+
+class _Heartbeat:
+    """Reports a worker's progress from a background thread while its reactor runs."""
+
+    def __init__(self, queue, worker, interval):
+        self.queue = queue
+        self.worker = worker
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='greek_scraper-heartbeat', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.queue.heartbeat(self.worker, worker_stats())
+            except Exception as e:
+                print(f"[greek_scraper] ERROR: Heartbeat failed: {e}")
+
+
+def worker_stats():
+    """This process's crawl totals, from the metrics registry."""
+    from greek_scraper.metrics import metrics
+    gauges = metrics.read_gauges()
+    return {
+        'pages': metrics.total('pages_total'),
+        'bytes_downloaded': metrics.total('response_bytes_total'),
+        'items': metrics.total('items_total'),
+        'items_dropped': metrics.total('items_dropped_total'),
+        'bytes_written': sum(v for (name, _), v in gauges.items() if name == 'writer_bytes_written'),
+    }
+
+
+def run_shard_worker(queue_path, shard, output_file="scraped_data.jsonl", worker_id=None, lease_timeout=120.0,
+                     heartbeat_interval=10.0, **scraper_kwargs):
+    """
+    Crawls domains claimed from the queue until none are left, writing to
+    `output_file` (give each worker its own). `scraper_kwargs` go to
+    run_multi_scraper.
+    """
+    from greek_scraper.cli import run_multi_scraper
+
+    worker = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    queue = ShardQueue(queue_path, lease_timeout=lease_timeout)
+    queue.register(worker, shard, output_file)
+    heartbeat = _Heartbeat(queue, worker, heartbeat_interval)
+    heartbeat.start()
+    try:
+        run_multi_scraper([], output_file=output_file,
+                          domain_source=lambda n: queue.claim(worker, shard, n),
+                          on_domain_done=lambda domain, ok: queue.finish(worker, domain, ok),
+                          **scraper_kwargs)
+    finally:
+        heartbeat.stop()
+        queue.retire(worker, worker_stats())
+        queue.close()
+
+
+def _worker_options(scraper_kwargs, shard):
+    """Per-worker copies of options that cannot be shared between processes."""
+    options = dict(scraper_kwargs)
+    if options.get('metrics_port'):
+        options['metrics_port'] += shard  # One endpoint per worker: port, port + 1, ...
+    # The frontier and validator stores are single-process SQLite files with in-memory state.
+    for key in ('metrics_file', 'profile_file', 'frontier_path', 'validators_path'):
+        options[key] = shard_path(options.get(key), shard)
+    return options
+
+
+def run_sharded_scraper(domains, workers=4, queue_path=None, output_file="scraped_data.jsonl", lease_timeout=120.0,
+                        heartbeat_interval=10.0, max_restarts=3, **scraper_kwargs):
+    """
+    Runs `workers` local worker processes over the domains, each with its own
+    reactor and output shard (data-shard00.jsonl, ...). A worker that dies is
+    restarted (up to `max_restarts` times per shard) and its unfinished
+    domains are queued again. Re-running with the same queue file resumes.
+    Returns the queue summary with the stats summed over all workers.
+    """
+    workers = max(1, workers)
+    if queue_path is None:
+        directory, name = os.path.split(output_file)
+        queue_path = os.path.join(directory, name.split('.', 1)[0] + '.shards.db')  # data.jsonl -> data.shards.db
+    queue = ShardQueue(queue_path, lease_timeout=lease_timeout)
+    added = queue.add(domains, workers)
+    print(f"[greek_scraper] Sharded crawl: {added} new domains, {queue.remaining()} to crawl "
+          f"over {workers} workers (queue: {queue_path})")
+
+    def start(shard, attempt):
+        worker_id = f"{socket.gethostname()}-shard{shard:02d}-{attempt}"
+        # Registered before it starts, so the other workers leave its shard alone meanwhile
+        queue.register(worker_id, shard, shard_path(output_file, shard))
+        options = {'lease_timeout': lease_timeout, 'heartbeat_interval': heartbeat_interval,
+                   **_worker_options(scraper_kwargs, shard)}
+        command = [sys.executable, '-m', 'greek_scraper.shards', 'worker', '--queue', queue_path,
+                   '--shard', str(shard), '--output', shard_path(output_file, shard),
+                   '--worker-id', worker_id, '--options', json.dumps(options)]
+        return worker_id, subprocess.Popen(command)
+
+    running = {shard: (start(shard, 0), 0) for shard in range(workers)}  # shard -> ((id, process), restarts)
+    try:
+        while running:
+            time.sleep(1.0)
+            for shard, ((worker_id, process), restarts) in list(running.items()):
+                code = process.poll()
+                if code is None:
+                    continue
+                del running[shard]
+                if code == 0:
+                    continue
+                queue.release(worker_id)  # Don't wait for the lease to run out
+                if restarts < max_restarts and queue.remaining():
+                    print(f"[greek_scraper] ERROR: Worker {worker_id} exited with {code}, restarting")
+                    running[shard] = (start(shard, restarts + 1), restarts + 1)
+                else:
+                    print(f"[greek_scraper] ERROR: Worker {worker_id} exited with {code}")
+    except KeyboardInterrupt:
+        for (worker_id, process), _ in running.values():
+            process.terminate()
+        for (worker_id, process), _ in running.values():
+            process.wait()
+            queue.release(worker_id)
+        raise
+    finally:
+        summary = queue.summary()
+        queue.close()
+
+    for w in summary['workers']:
+        print(f"[greek_scraper] {w['worker']}: {w['domains_done']} domains, "
+              f"{w['stats'].get('items', 0):.0f} items -> {w['output']}")
+    totals = summary['totals']
+    print(f"[greek_scraper] Total: {totals.get('pages', 0):.0f} pages, {totals.get('items', 0):.0f} items, "
+          f"{totals.get('bytes_written', 0):.0f} bytes; domains {summary['domains']}")
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m greek_scraper.shards', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    add = commands.add_parser('add', help='queue domains from a file (one per line, may be compressed)')
+    add.add_argument('--queue', required=True)
+    add.add_argument('--shards', type=int, required=True)
+    add.add_argument('file')
+
+    worker = commands.add_parser('worker', help='crawl domains from the queue until it is empty')
+    worker.add_argument('--queue', required=True)
+    worker.add_argument('--shard', type=int, required=True)
+    worker.add_argument('--output', required=True, help='this worker\'s output file')
+    worker.add_argument('--worker-id')
+    worker.add_argument('--options', default='{}',
+                        help='JSON keyword arguments for run_multi_scraper; frontier_path and validators_path '
+                             'must be this worker\'s own files')
+
+    status = commands.add_parser('status', help='print the queue summary as JSON')
+    status.add_argument('--queue', required=True)
+
+    args = parser.parse_args(argv)
+    if args.command == 'add':
+        queue = ShardQueue(args.queue)
+        added = queue.add(read_domains(args.file, '\n'), args.shards)
+        print(f"[greek_scraper] Queued {added} new domains over {args.shards} shards")
+        queue.close()
+    elif args.command == 'worker':
+        run_shard_worker(args.queue, args.shard, output_file=args.output, worker_id=args.worker_id,
+                         **json.loads(args.options))
+    else:
+        queue = ShardQueue(args.queue)
+        print(json.dumps(queue.summary(), indent=1))
+        queue.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+# greek_scraper/sources.py
+import bz2
+import gzip
+import io
+import lzma
+import re
+
+from greek_scraper.dupefilters import HashSet, url_hash
+
+# Compression is recognised from the first bytes, whatever the file is called.
+MAGIC = [
+    (b'\x1f\x8b', 'gzip'),
+    (b'BZh', 'bz2'),
+    (b'\xfd7zXZ\x00', 'xz'),
+    (b'\x28\xb5\x2f\xfd', 'zstd'),
+]
+SCHEME_RE = re.compile(r'^[a-z][a-z0-9+.-]*://', re.IGNORECASE)
+CHUNK_CHARS = 1 << 20
+
+
+def open_domain_file(source):
+    """
+    Opens a domain list for reading as text: a path or a binary file object,
+    plain or gzip/bz2/xz/zstd compressed.
+    """
+    raw = open(source, 'rb') if isinstance(source, str) else source
+    if not hasattr(raw, 'peek'):
+        raw = io.BufferedReader(raw)
+    head = raw.peek(6)[:6]
+    compression = next((name for magic, name in MAGIC if head.startswith(magic)), None)
+    if compression == 'gzip':
+        raw = gzip.GzipFile(fileobj=raw, mode='rb')
+    elif compression == 'bz2':
+        raw = bz2.BZ2File(raw, mode='rb')
+    elif compression == 'xz':
+        raw = lzma.LZMAFile(raw, mode='rb')
+    elif compression == 'zstd':
+        import zstandard  # Optional dependency, only needed for .zst domain lists
+        raw = zstandard.ZstdDecompressor().stream_reader(raw)
+    return io.TextIOWrapper(raw, encoding='utf-8', errors='replace')
+
+
+def domain_key(domain):
+    """Dedup key: 'https://In.gr/' and 'in.gr' are the same seed."""
+    return SCHEME_RE.sub('', domain.strip().lower()).rstrip('/')
+
+
+def unique_domains(domains):
+    """Yields each domain the first time it is seen, keeping 8-byte hashes instead of the strings."""
+    seen = HashSet()
+    for domain in domains:
+        domain = domain.strip()
+        if domain and seen.add(url_hash(domain_key(domain))):
+            yield domain
+
+
+def split_domains(f, separator=','):
+    """Domains from a text stream, split on `separator` and line breaks, read in chunks."""
+    splitter = re.compile('|'.join(re.escape(s) for s in {separator, '\r\n', '\n', '\r'} if s))
+    tail = ''
+    while True:
+        chunk = f.read(CHUNK_CHARS)
+        if not chunk:
+            break
+        parts = splitter.split(tail + chunk)
+        tail = parts.pop()  # May continue in the next chunk
+        for part in parts:
+            part = part.strip()
+            if part:
+                yield part
+    if tail.strip():
+        yield tail.strip()
+
+
+def read_domains(source, separator=',', dedup=True):
+    """
+    Streams the domains of a (possibly compressed) list without loading it:
+    separated by `separator` and/or one per line, duplicates dropped as they
+    come in. The file is opened right away, so a missing one raises here.
+    """
+    f = open_domain_file(source)
+
+    def domains():
+        with f:
+            yield from split_domains(f, separator)
+
+    return unique_domains(domains()) if dedup else domains()
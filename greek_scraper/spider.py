@@ -1,26 +1,29 @@
 # greek_scraper/spider.py
 import scrapy
-import cupy as cp
 import re
 import json
 import os
-import numpy as np
 import argparse
 import html
 import chardet
 import unicodedata
+from collections import deque
 from urllib.parse import urlparse, urljoin
 from scrapy.crawler import CrawlerProcess
 from scrapy import signals
 from scrapy.exceptions import DontCloseSpider
-from trafilatura import extract  # robust text extraction
+from scrapy.utils.response import get_base_url
 from tldextract import extract as tld_extract
 from bs4 import BeautifulSoup  # For alternative text extraction (if needed)
 from twisted.internet.error import DNSLookupError
 from twisted.internet.threads import deferToThread
 from scrapy.dupefilters import RFPDupeFilter
 
-from greek_scraper.gpu_processor import GPUTextProcessor # Import GPU Processor - ensure correct relative import
+from greek_scraper.links import extract_links
+from greek_scraper.language import LanguageDetector
+from greek_scraper.discovery import acquire_discovery, release_discovery, discovery_options
+from greek_scraper.validators import acquire_validator_store, release_validator_store
+from greek_scraper.frontier import acquire_frontier, release_frontier, DONE, FAILED, DOMAIN_ACTIVE, DOMAIN_FINISHED
 
 class ScraperSpider(scrapy.Spider): # Renamed class to ScraperSpider
     name = "generic_greek_scraper_json_output" # Generic spider name
@@ -28,12 +31,12 @@ class ScraperSpider(scrapy.Spider): # Renamed class to ScraperSpider
     custom_settings = {
         # Aggressive global concurrency, but we limit domain seeds to 100 concurrently.
         'CONCURRENT_REQUESTS': 100,
-        'CONCURRENT_REQUESTS_PER_DOMAIN': 8,  # Allow a few concurrent requests within each domain
-        'DOWNLOAD_DELAY': 0.125,
+        # Per-host concurrency and delay start from CONCURRENT_REQUESTS_PER_DOMAIN / DOWNLOAD_DELAY
+        # (threads/speed) and are then adjusted per host by AdaptiveThrottleMiddleware.
         'HTTPCACHE_ENABLED': True,
-        'AUTOTHROTTLE_ENABLED': True,
-        'AUTOTHROTTLE_START_DELAY': 0.5,
-        'AUTOTHROTTLE_MAX_DELAY': 2.0,
+        'HTTPCACHE_STORAGE': 'greek_scraper.httpcache.SqliteCacheStorage', # One SQLite file, compressed and size-capped
+        'HTTPCACHE_IGNORE_HTTP_CODES': [429, 503], # A cached "slow down" would be replayed on every run
+        'AUTOTHROTTLE_ENABLED': False, # Replaced by the adaptive throttle; both would set the slot delays
         'RANDOMIZE_DOWNLOAD_DELAY': True,
         'RETRY_ENABLED': True,
         'RETRY_TIMES': 3,
@@ -44,30 +47,50 @@ class ScraperSpider(scrapy.Spider): # Renamed class to ScraperSpider
         'DEPTH_LIMIT': 10,
         'ROBOTSTXT_OBEY': True,
         'ITEM_PIPELINES': {
+            'greek_scraper.pipelines.ExtractionPipeline': 200, # Package aware path
             'greek_scraper.pipelines.TextPipeline': 300, # Package aware path
+            'greek_scraper.pipelines.DedupPipeline': 350, # Package aware path
             'greek_scraper.pipelines.StoragePipeline': 400, # Package aware path
         },
         'JOBDIR': None,  # Will be overridden from command-line args.
+        'DUPEFILTER_CLASS': 'greek_scraper.dupefilters.CompactDupeFilter', # 8-byte URL hashes instead of SHA1 hex strings
+        'SCHEDULER_PRIORITY_QUEUE': 'scrapy.pqueues.DownloaderAwarePriorityQueue', # Hand free slots to the least busy host first
         'DOWNLOADER_MIDDLEWARES': {
+            'greek_scraper.middlewares.DeadHostMiddleware': 50, # Before robots.txt lookups too
+            'greek_scraper.middlewares.LanguageFilterMiddleware': 90, # Before robots.txt lookups
             'greek_scraper.middlewares.RobustEncodingMiddleware': 543, # Package aware path
             'scrapy.downloadermiddlewares.retry.RetryMiddleware': None,
             'greek_scraper.middlewares.CustomRetryMiddleware': 544, # Package aware path
+            'greek_scraper.middlewares.ConditionalRequestMiddleware': 580, # Package aware path
+            'greek_scraper.middlewares.ResponseSizeMiddleware': 585, # After decompression (590), before validators are recorded (580)
+            'greek_scraper.middlewares.AdaptiveThrottleMiddleware': 950, # Next to the downloader: sees uncached responses first
+        },
+        'EXTENSIONS': {
+            'greek_scraper.metrics.MetricsExtension': 500, # Progress line and optional metrics export
         }
     }
 
-    def __init__(self, seed_domains=[], autodiscover=False, max_domains=5000, use_cpu=False, output_file='scraped_data_robust.jsonl', target_language=None, **kwargs): # Added target_language
+    def __init__(self, seed_domains=[], autodiscover=False, max_domains=5000, promote_domains=True, use_cpu=False, output_file='scraped_data_robust.jsonl', target_language=None, **kwargs): # Added target_language
         super().__init__(**kwargs)
         self.autodiscover = autodiscover
         self.max_domains = max_domains
+        self.promote_domains = promote_domains # Seed discovered domains itself (False when a DomainScheduler does it)
         self.discovered_domains = set()
         self.processed_urls = set()
         self.blocked_domains = set()
-        self.pending_domains = list(seed_domains)
+        self.pending_domains = deque(seed_domains)
         self.active_domains = set()
         self.concurrent_domain_limit = 100
         self.use_cpu = use_cpu
         self.output_file = output_file
         self.target_language = target_language # Store target language
+        self.frontier = None # On-disk frontier, opened in from_crawler when FRONTIER_PATH is set
+        self.validators = None # ValidatorStore, opened in from_crawler when VALIDATORS_PATH is set
+        self.language = None # LanguageDetector, set up in from_crawler for Greek crawls
+        self.discovery = None # DomainDiscovery shared by the process, set up in from_crawler when autodiscover is on
+        self.depth_limit = 0
+        self.hold_links = False # Follow links only after DedupPipeline has seen the page (DEDUP_SKIP_LINKS)
+        self.held_links = {} # url -> (links, domain, depth)
 
         if self.target_language == 'gr' or self.target_language == 'greek':
             self.target_tlds = ['.gr'] # Set Greek TLDs if language is greek
@@ -76,19 +99,67 @@ class ScraperSpider(scrapy.Spider): # Renamed class to ScraperSpider
 
     def start_requests(self):
         # Schedule up to concurrent_domain_limit seed domains.
-        count = 0
-        while self.pending_domains and count < self.concurrent_domain_limit:
-            domain = self.pending_domains.pop(0).strip()
-            if domain:
-                url = self._normalize_url(domain)
-                self.discovered_domains.add(urlparse(url).netloc)
-                self.active_domains.add(urlparse(url).netloc)
-                yield scrapy.Request(url, callback=self.parse, errback=self.handle_error, dont_filter=True)
-                count += 1
+        yield from self._next_seed_requests(dont_filter=True)
+
+    def _next_seed_requests(self, dont_filter=False):
+        """Takes pending seed domains until concurrent_domain_limit are active, yielding their requests."""
+        while self.pending_domains and len(self.active_domains) < self.concurrent_domain_limit:
+            domain = self.pending_domains.popleft().strip()
+            if not domain:
+                continue
+            url = self._normalize_url(domain)
+            netloc = urlparse(url).netloc
+            if netloc in self.discovered_domains or len(self.discovered_domains) >= self.max_domains:
+                continue
+            if self.discovery is not None and not self.discovery.claim(url):
+                continue # Seeded already, by this spider or another one of the process
+            self.discovered_domains.add(netloc)
+            self.active_domains.add(netloc)
+            yield from self._seed_requests(url, dont_filter=dont_filter)
+
+    def _seed_requests(self, url, dont_filter=False):
+        """
+        Requests for a seed domain: the seed itself, whatever the frontier still
+        has queued for it, and the pages the validator store knows from earlier runs.
+        """
+        netloc = urlparse(url).netloc
+        if self.frontier is None:
+            yield scrapy.Request(url, callback=self.parse, errback=self.handle_error, dont_filter=dont_filter)
+            yield from self._revisit_requests(netloc)
+            return
+
+        if self.frontier.domain_state(netloc) == DOMAIN_FINISHED:
+            return  # Fully crawled in an earlier run
+        self.frontier.mark_domain(netloc, DOMAIN_ACTIVE)
+        if self.frontier.add(url, netloc):
+            yield scrapy.Request(url, callback=self.parse, errback=self.handle_error, dont_filter=dont_filter)
+        # Resume: URLs queued but never fetched before the last run stopped, streamed from disk.
+        for queued_url, depth in self.frontier.queued(netloc):
+            yield scrapy.Request(queued_url, callback=self.parse, errback=self.handle_error, meta={'depth': depth})
+        yield from self._revisit_requests(netloc)
+
+    def _revisit_requests(self, netloc):
+        """Known pages of a domain, revalidated by ConditionalRequestMiddleware; pages that changed often go first."""
+        if self.validators is None:
+            return
+        for url, priority in self.validators.revisit(netloc):
+            if self.frontier is not None and not self.frontier.add(url, netloc):
+                continue # Already queued or fetched in this crawl
+            yield scrapy.Request(url, callback=self.parse, errback=self.handle_error, priority=priority)
 
     def parse(self, response):
         current_domain = urlparse(response.url).netloc
         item = {'url': response.url, 'text': '', 'links': []}
+        depth = response.meta.get('depth', 0) + 1 # Depth of the links found on this page
+
+        if self.frontier is not None:
+            for url in response.meta.get('redirect_urls', []) + [response.url]:
+                self.frontier.mark(url, current_domain, DONE)
+
+        # --- Unchanged since the last run (see ConditionalRequestMiddleware): no new text to extract ---
+        unchanged = response.meta.get('unchanged', False)
+        if response.status == 304:
+            return
 
         # --- Check Content Type ---
         try:
@@ -98,32 +169,79 @@ class ScraperSpider(scrapy.Spider): # Renamed class to ScraperSpider
         except Exception:
             return
 
-        # --- Extract Cleaned Text ---
+        # --- Hand the HTML to ExtractionPipeline, which runs trafilatura in worker processes ---
         try:
-            extracted_text = extract(response.text) or ""
-            item['text'] = unicodedata.normalize('NFKC', extracted_text).strip()
+            item['html'] = response.text
         except Exception:
-            item['text'] = ""
+            item['html'] = ""
 
         # --- Extract and Process Links ---
+        # One pass over the page's lxml tree; filtered and deduplicated before any Request exists.
+        external = set() if self.discovery is not None else None
         try:
-            links = response.css('a::attr(href)').getall()
+            links = extract_links(response.selector.root, get_base_url(response), current_domain, external)
         except Exception:
             links = []
+        if external:
+            counted = self.discovery.record(current_domain, external, self._is_target_domain)
+            self.crawler.stats.inc_value('discovery/outlinks', counted, spider=self)
 
-        for link in links:
-            try:
-                full_url = response.urljoin(link)
-                parsed = urlparse(full_url)
-                if parsed.scheme in ['http', 'https'] and parsed.netloc == current_domain:
-                    yield scrapy.Request(full_url, callback=self.parse, errback=self.handle_error)
-                    item['links'].append(full_url)
-            except Exception:
-                continue
+        # --- Early language check: non-Greek pages are not extracted, their links come last ---
+        greek = True
+        if self.language is not None:
+            greek = self.language.is_greek(item['html'])
+            self.language.record(response.url, greek)
+            if not greek:
+                self.crawler.stats.inc_value('language/non_greek', spider=self)
+
+        item['links'] = links
+        if self.language is not None and self.language.pruned:
+            # Subtrees (e.g. /en/) that keep yielding non-Greek pages are not followed any further
+            kept = [url for url in links if not self.language.is_pruned(url)]
+            self.crawler.stats.inc_value('language/pruned_links', len(links) - len(kept), spider=self)
+            links = kept
+
+        if not greek:
+            yield from self._link_requests(links, current_domain, depth, priority=self.language.link_priority)
+            return
+        if unchanged:
+            yield from self._link_requests(links, current_domain, depth)
+            return # Same body as last time: its text is already in an earlier run's output
+        if self.hold_links:
+            self.held_links[response.url] = (links, current_domain, depth) # Released by DedupPipeline
+        else:
+            yield from self._link_requests(links, current_domain, depth)
 
-        print(f"✅ Domain successfully crawled: {current_domain}")
         yield item
 
+    def _link_requests(self, links, domain, depth, priority=0):
+        """Requests for the links found on a page, minus any the frontier already knows."""
+        if self.frontier is None:
+            for url in links:
+                yield scrapy.Request(url, callback=self.parse, errback=self.handle_error, priority=priority)
+            return
+        if self.depth_limit and depth > self.depth_limit:
+            return # DepthMiddleware would drop them; don't queue them on disk either
+        for url in links:
+            if not self.frontier.add(url, domain, depth):
+                continue # Queued, fetched or failed already (possibly in an earlier run)
+            yield scrapy.Request(url, callback=self.parse, errback=self.handle_error, priority=priority)
+
+    def release_links(self, url, follow=True):
+        """
+        Called by DedupPipeline once it knows whether the page at `url` had new
+        content: schedules the links held back from it, or forgets them.
+        """
+        held = self.held_links.pop(url, None)
+        if held is None or not follow:
+            return
+        links, domain, depth = held
+        if self.depth_limit and depth > self.depth_limit:
+            return # Scheduled directly, so DepthMiddleware never sees these
+        for req in self._link_requests(links, domain, depth):
+            req.meta['depth'] = depth
+            self.crawler.engine.crawl(req)
+
     def _normalize_url(self, domain):
         if not domain.startswith("http"):
             return f"https://{domain}"
@@ -131,6 +249,8 @@ class ScraperSpider(scrapy.Spider): # Renamed class to ScraperSpider
 
     def handle_error(self, failure):
         request = failure.request
+        if self.frontier is not None:
+            self.frontier.mark(request.url, urlparse(request.url).netloc, FAILED, request.meta.get('depth', 0))
         # You could add more sophisticated error handling and retries here.
 
     def _is_target_domain(self, domain):
@@ -146,7 +266,41 @@ class ScraperSpider(scrapy.Spider): # Renamed class to ScraperSpider
 
         # Pass parameters to pipelines
         settings = crawler.settings
+        spider.depth_limit = settings.getint('DEPTH_LIMIT')
+
+        # Persistent frontier, shared by every spider of this process using the same file.
+        if settings.get('FRONTIER_PATH'):
+            spider.frontier = acquire_frontier(
+                settings.get('FRONTIER_PATH'),
+                flush_interval=settings.getfloat('FRONTIER_FLUSH_INTERVAL', 1.0),
+                flush_ops=settings.getint('FRONTIER_FLUSH_OPS', 5000),
+            )
+        # Validators from earlier runs for conditional re-crawls.
+        if settings.get('VALIDATORS_PATH'):
+            spider.validators = acquire_validator_store(
+                settings.get('VALIDATORS_PATH'),
+                flush_interval=settings.getfloat('FRONTIER_FLUSH_INTERVAL', 1.0),
+                flush_ops=settings.getint('FRONTIER_FLUSH_OPS', 5000),
+            )
+        # Autodiscovery: outlinks counted per registrable domain, the best ones seeded once the seed list runs out.
+        if spider.autodiscover:
+            spider.discovery = acquire_discovery(**discovery_options(settings))
+        if spider.frontier is not None or spider.validators is not None or spider.discovery is not None:
+            crawler.signals.connect(spider.spider_closed, signal=signals.spider_closed)
+
+        # Early Greek detection: skips extraction of non-Greek pages and prunes non-Greek subtrees.
+        if spider.target_tlds == ['.gr'] and settings.getbool('LANGUAGE_FILTER_ENABLED', True):
+            spider.language = LanguageDetector(
+                sample_chars=settings.getint('LANGUAGE_SAMPLE_CHARS', 20000),
+                min_ratio=settings.getfloat('LANGUAGE_MIN_RATIO', 0.3),
+                subtree_min_pages=settings.getint('LANGUAGE_SUBTREE_MIN_PAGES', 5),
+                subtree_max_ratio=settings.getfloat('LANGUAGE_SUBTREE_MAX_RATIO', 0.8),
+                link_priority=settings.getint('LANGUAGE_LINK_PRIORITY', -10),
+            )
+
         pipelines = settings.getdict('ITEM_PIPELINES')
+        spider.hold_links = (settings.getbool('DEDUP_SKIP_LINKS')
+                             and 'greek_scraper.pipelines.DedupPipeline' in pipelines)
 
         if 'greek_scraper.pipelines.TextPipeline' in pipelines:
             pipelines['greek_scraper.pipelines.TextPipeline'] = cls.create_text_pipeline(spider, settings)
@@ -173,19 +327,45 @@ class ScraperSpider(scrapy.Spider): # Renamed class to ScraperSpider
 
     def spider_idle(self):
         """
-        When the spider is idle, check if there are still seed domains waiting.
-        If yes and we are below our concurrent domain limit, schedule a new one and
-        prevent the spider from closing.
+        When the spider is idle every active domain has run out of requests.
+        Retire them and refill up to concurrent_domain_limit from the seed
+        domains still waiting, keeping the spider open while there are any.
         """
-        if self.pending_domains and len(self.active_domains) < self.concurrent_domain_limit:
-            domain = self.pending_domains.pop(0).strip()
-            if domain:
-                url = self._normalize_url(domain)
-                netloc = urlparse(url).netloc
-                if netloc not in self.discovered_domains and len(self.discovered_domains) < self.max_domains:
-                    self.discovered_domains.add(netloc)
-                    self.active_domains.add(netloc)
-                    req = scrapy.Request(url, callback=self.parse, errback=self.handle_error)
-                    self.crawler.engine.crawl(req, self)
-                    raise DontCloseSpider("Scheduling new seed domain")
-        # If no pending seed domain, let the spider close normally.
\ No newline at end of file
+        while True:
+            for domain in self.active_domains:
+                if self.frontier is not None:
+                    self.frontier.mark_domain(domain, DOMAIN_FINISHED)
+            self.active_domains.clear()
+            if not self.pending_domains and self.discovery is not None and self.promote_domains:
+                # Seed list done: continue with the best-linked domains found so far.
+                promoted = self.discovery.promote(self.concurrent_domain_limit, self.max_domains)
+                self.crawler.stats.inc_value('discovery/promoted', len(promoted), spider=self)
+                self.pending_domains.extend(promoted)
+
+            scheduled = False
+            for req in self._next_seed_requests():
+                self.crawler.engine.crawl(req)
+                scheduled = True
+            if scheduled:
+                raise DontCloseSpider("Scheduling new seed domains")
+            if not self.pending_domains:
+                break  # Nothing left to seed: let the spider close normally.
+            # Every domain just taken was already finished in an earlier run; take the next ones.
+
+    def spider_closed(self, spider, reason):
+        if self.frontier is not None and reason == 'finished':
+            # Ran out of requests on its own: nothing left to resume for these domains.
+            for domain in self.active_domains:
+                self.frontier.mark_domain(domain, DOMAIN_FINISHED)
+        # Commit and close off the reactor thread if this was the last spider using them.
+        return deferToThread(self._release_stores)
+
+    def _release_stores(self):
+        if self.frontier is not None:
+            if release_frontier(self.frontier) and self.frontier.last_error is not None:
+                self.logger.error(f"[ScraperSpider] Error writing to the frontier: {self.frontier.last_error}")
+        if self.validators is not None:
+            if release_validator_store(self.validators) and self.validators.last_error is not None:
+                self.logger.error(f"[ScraperSpider] Error writing to the validator store: {self.validators.last_error}")
+        if self.discovery is not None:
+            release_discovery(self.discovery)
\ No newline at end of file
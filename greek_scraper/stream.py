@@ -0,0 +1,150 @@
+# greek_scraper/stream.py
+"""
+Cleaned items as a Python iterator, without an output file.
+
+The crawl runs in a child process (Twisted's reactor cannot be restarted,
+and this keeps it out of the caller's threads). The child writes through the
+'pipe' output format: chunks of items, pickled, over an inherited pipe.
+Buffering is bounded end to end. A few small chunks wait in the child's
+writer, and when the caller stops reading, the writer blocks and the
+pipelines hold back.
+
+    for item in iter_items(["in.gr", "kathimerini.gr"], language="greek"):
+        index(item)
+
+    async for item in aiter_items(domain_file="domains.txt.gz"):
+        await index(item)
+
+Domains given as an iterable are fed to the child's stdin as it reads
+them, so they can come from a generator. A `domain_file` is read by the child
+itself (see sources.read_domains).
+"""
+import argparse
+import asyncio
+import json
+import os
+import pickle
+import subprocess
+import sys
+import threading
+from multiprocessing.connection import Connection
+
+from greek_scraper.sources import read_domains
+
+
+class ItemStream:
+    """A crawl in a child process, read back as batches of items. Use as a context manager."""
+
+    def __init__(self, domains=None, domain_file=None, separator=',', batch_items=100, max_batches=4,
+                 **scraper_kwargs):
+        if (domains is None) == (domain_file is None):
+            raise ValueError("Give either domains or domain_file")
+        settings = dict(scraper_kwargs.pop('settings', None) or {})
+        settings.setdefault('OUTPUT_FLUSH_ITEMS', batch_items)
+        settings.setdefault('OUTPUT_MAX_PENDING', max_batches)
+        options = dict(scraper_kwargs, settings=settings)
+
+        read_fd, write_fd = os.pipe()
+        command = [sys.executable, '-m', 'greek_scraper.stream', '--items-fd', str(write_fd),
+                   '--options', json.dumps(options)]
+        if domain_file is not None:
+            command += ['--domains', domain_file, '--separator', separator]
+        try:
+            self.process = subprocess.Popen(command, stdin=subprocess.DEVNULL if domain_file else subprocess.PIPE,
+                                            pass_fds=(write_fd,))
+        finally:
+            os.close(write_fd)  # Only the child writes; its exit ends the stream
+        self.conn = Connection(read_fd, writable=False)
+        self.feed_error = None
+        self._feeder = None
+        if domain_file is None:
+            self._feeder = threading.Thread(target=self._feed, args=(domains,), name='greek_scraper-feeder',
+                                            daemon=True)
+            self._feeder.start()
+
+    def _feed(self, domains):
+        try:
+            with self.process.stdin as pipe:
+                for domain in domains:
+                    pipe.write(domain.strip().encode('utf-8') + b'\n')
+        except (BrokenPipeError, ValueError):
+            pass  # The crawl ended or was stopped before reading everything
+        except Exception as e:
+            self.feed_error = e
+
+    def next_batch(self):
+        """The next list of items, or None at the end of the crawl. Blocks until one is written."""
+        try:
+            return pickle.loads(self.conn.recv_bytes())
+        except EOFError:
+            code = self.process.wait()
+            if self.feed_error is not None:
+                raise self.feed_error
+            if code != 0:
+                raise RuntimeError(f"Crawl process exited with code {code}")
+            return None
+
+    def close(self):
+        """Stops the crawl if it is still running."""
+        self.conn.close()  # A writer blocked on the pipe gets an error instead of waiting forever
+        if self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def iter_items(domains=None, domain_file=None, separator=',', batch_items=100, max_batches=4, **scraper_kwargs):
+    """
+    Yields cleaned items as the crawl produces them. `scraper_kwargs` go to
+    run_multi_scraper. Stopping early (break, close()) stops the crawl.
+    """
+    with ItemStream(domains, domain_file, separator, batch_items, max_batches, **scraper_kwargs) as stream:
+        while True:
+            batch = stream.next_batch()
+            if batch is None:
+                return
+            yield from batch
+
+
+async def aiter_items(domains=None, domain_file=None, separator=',', batch_items=100, max_batches=4,
+                      **scraper_kwargs):
+    """iter_items for asyncio: batches are awaited in a worker thread, so the event loop never blocks."""
+    loop = asyncio.get_running_loop()
+    with ItemStream(domains, domain_file, separator, batch_items, max_batches, **scraper_kwargs) as stream:
+        while True:
+            batch = await loop.run_in_executor(None, stream.next_batch)
+            if batch is None:
+                return
+            for item in batch:
+                yield item
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m greek_scraper.stream',
+                                     description='Crawl child process of iter_items/aiter_items.')
+    parser.add_argument('--items-fd', type=int, required=True, help='inherited pipe to send the items over')
+    parser.add_argument('--domains', help='domain list file (default: one domain per line on stdin)')
+    parser.add_argument('--separator', default=',')
+    parser.add_argument('--options', default='{}', help='JSON keyword arguments for run_multi_scraper')
+    args = parser.parse_args(argv)
+
+    from greek_scraper.cli import run_multi_scraper
+
+    if args.domains:
+        domains = read_domains(args.domains, args.separator)
+    else:
+        domains = read_domains(sys.stdin.buffer, '\n')
+    run_multi_scraper(domains, output_file=f"pipe:{args.items_fd}", **json.loads(args.options))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,245 @@
+# greek_scraper/throttle.py
+import email.utils
+import threading
+import time
+import weakref
+
+# One controller per process, shared by every spider of a multi-domain run so
+# that hosts compete for the same budget of requests in flight.
+_shared_throttle = None
+_shared_lock = threading.Lock()
+
+# Responses that mean "slow down" rather than "this page is broken".
+BACKOFF_STATUSES = (429, 503)
+BACKOFF_DELAY = 0.5  # First delay after a backoff when the host had none
+LATENCY_WEIGHT = 0.2  # Weight of each response in the short-term latency average
+BASELINE_WEIGHT = 0.02  # ... and in the long-term one it is compared with
+ERROR_RATE_LIMIT = 0.15  # 5xx and connection errors back off once this share of recent downloads fails
+
+
+def retry_after_seconds(value):
+    """Seconds to wait from a Retry-After header (delta-seconds or an HTTP date), or None."""
+    if not value:
+        return None
+    if isinstance(value, bytes):
+        value = value.decode('latin-1')
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+class HostState:
+    __slots__ = ('window', 'delay', 'latency', 'baseline', 'errors', 'paused_until', 'last_decrease', 'users',
+                 'slots')
+
+    def __init__(self, window, delay):
+        self.window = float(window)  # Requests in flight allowed; fractional so it can grow by 1/window
+        self.delay = delay
+        self.latency = None  # Short-term moving average of download latency
+        self.baseline = None  # Long-term one: what the host's latency normally is
+        self.errors = 0.0  # Moving average of the share of downloads that failed
+        self.paused_until = 0.0  # time.monotonic() until which Retry-After holds the host
+        self.last_decrease = 0.0
+        self.users = 0  # Spiders crawling the host
+        self.slots = weakref.WeakSet()  # Their Scrapy downloader slots for it
+
+    def rate(self):
+        """Requests per second the host is currently allowed to serve."""
+        rate = self.window / self.latency if self.latency else float('inf')
+        return min(rate, 1.0 / self.delay) if self.delay else rate
+
+
+class AdaptiveThrottle:
+    """
+    Per-host concurrency and delay, adjusted from each download and set on
+    Scrapy's downloader slots:
+
+    - Requests in flight follow AIMD: +1 per window of responses while the
+      host has requests waiting and its recent latency stays within
+      `latency_tolerance` x its long-term average; -1 when it climbs past
+      that; halved on 429/503, and on 5xx and connection errors once
+      they make up ERROR_RATE_LIMIT of recent downloads. Decreases happen at
+      most once per round trip.
+    - The delay between requests doubles on the same errors, up to
+      `max_delay`, and shrinks by 10% per healthy response down to `min_delay`.
+    - A Retry-After on a 429/503 holds the host at least that long (capped at
+      `max_retry_after`).
+    - The windows of all hosts share `budget`. Once it is used up, a host
+      grows only by taking from a host that serves fewer requests per second,
+      so slots drift to the hosts answering fastest.
+    """
+
+    def __init__(self, start_concurrency=2, min_concurrency=1, max_concurrency=16, start_delay=0.25,
+                 min_delay=0.05, max_delay=30.0, budget=100, latency_tolerance=2.0, max_retry_after=600.0):
+        self.min_concurrency = max(1, min_concurrency)
+        self.max_concurrency = max(self.min_concurrency, max_concurrency)
+        self.start_concurrency = min(max(start_concurrency, self.min_concurrency), self.max_concurrency)
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.start_delay = min(max(start_delay, min_delay), max_delay)
+        self.budget = budget
+        self.latency_tolerance = latency_tolerance
+        self.max_retry_after = max_retry_after
+        self.hosts = {}
+        self.allocated = 0.0  # Sum of the hosts' windows
+        self.refs = 0
+
+    # ---- hosts ----
+
+    def attach(self, host):
+        """Registers a spider crawling `host`. Returns the host's state, shared with other spiders."""
+        state = self.hosts.get(host)
+        if state is None:
+            state = HostState(self.start_concurrency, self.start_delay)
+            self.hosts[host] = state
+            self.allocated += state.window
+        state.users += 1
+        return state
+
+    def detach(self, host):
+        """A spider is done with `host`; its state is dropped once no spider uses it."""
+        state = self.hosts.get(host)
+        if state is None:
+            return
+        state.users -= 1
+        if state.users <= 0:
+            del self.hosts[host]
+            self.allocated -= state.window
+
+    def bind(self, state, slot):
+        """Applies the host's limits to a downloader slot (new, or recreated after Scrapy dropped an idle one)."""
+        if slot not in state.slots:
+            state.slots.add(slot)
+            self._apply(state)
+
+    def _apply(self, state):
+        concurrency = max(1, int(state.window))
+        delay = state.delay
+        paused = state.paused_until - time.monotonic()
+        for slot in state.slots:
+            slot.concurrency = concurrency
+            # A randomized delay can be as short as half the value: double it so the pause is at least honoured.
+            slot.delay = max(delay, paused * 2 if slot.randomize_delay else paused)
+
+    # ---- feedback ----
+
+    def on_response(self, state, latency, status, retry_after=None):
+        """
+        Updates `state` from a downloaded response. Returns why the host was
+        slowed down ('throttled', 'error' or 'slow'), or None.
+        """
+        now = time.monotonic()
+        if status in BACKOFF_STATUSES:
+            if retry_after is not None:
+                state.paused_until = max(state.paused_until, now + min(retry_after, self.max_retry_after))
+            self._back_off(state, now)
+            self._apply(state)
+            return 'throttled'
+        if status >= 500:
+            return self.on_error(state)
+        state.errors *= 0.9
+        if latency is None or not 200 <= status < 300:
+            return None  # Redirects, 404s (robots.txt) and the like are answered faster than pages
+
+        if state.latency is None:
+            state.latency = state.baseline = latency
+        state.latency += LATENCY_WEIGHT * (latency - state.latency)
+        state.baseline += BASELINE_WEIGHT * (latency - state.baseline)
+        if state.latency > state.baseline * self.latency_tolerance:
+            slowed = self._decrease(state, now, state.window - 1)
+            self._apply(state)
+            return 'slow' if slowed else None
+
+        state.delay = max(self.min_delay, state.delay * 0.9)
+        if any(slot.queue for slot in state.slots):  # The window, not the demand, is what limits the host
+            self._grow(state, 1.0 / state.window)
+        self._apply(state)
+        return None
+
+    def on_error(self, state):
+        """A 5xx, timeout or connection error from the host. Returns 'error' if the host was slowed down."""
+        state.errors = 0.9 * state.errors + 0.1
+        if state.errors < ERROR_RATE_LIMIT or not self._back_off(state, time.monotonic()):
+            return None
+        self._apply(state)
+        return 'error'
+
+    def _back_off(self, state, now):
+        if not self._decrease(state, now, state.window / 2):
+            return False
+        state.delay = min(self.max_delay, max(state.delay * 2, BACKOFF_DELAY))
+        return True
+
+    def _decrease(self, state, now, window):
+        if now - state.last_decrease < (state.latency or 0.0):
+            return False  # Already decreased for this round trip
+        state.last_decrease = now
+        window = max(self.min_concurrency, window)
+        self.allocated += window - state.window
+        state.window = window
+        return True
+
+    def _grow(self, state, step):
+        step = min(step, self.max_concurrency - state.window)
+        if step <= 0:
+            return
+        if self.allocated + step > self.budget and not self._take(state, step):
+            return
+        state.window += step
+        self.allocated += step
+
+    def _take(self, state, step):
+        """Moves `step` of window to `state` from the slowest host, if that host is slower. Returns True if it did."""
+        rate = state.rate()
+        victim = min((other for other in self.hosts.values()
+                      if other is not state and other.window - step >= self.min_concurrency),
+                     key=HostState.rate, default=None)
+        if victim is None or victim.rate() >= rate:
+            return False
+        victim.window -= step
+        self.allocated -= step
+        self._apply(victim)
+        return True
+
+
+def throttle_options(settings):
+    """
+    AdaptiveThrottle arguments from the ADAPTIVE_THROTTLE_* settings. The
+    starting point is CONCURRENT_REQUESTS_PER_DOMAIN and DOWNLOAD_DELAY, which
+    threads() and speed() set.
+    """
+    return {
+        'start_concurrency': settings.getint('CONCURRENT_REQUESTS_PER_DOMAIN'),
+        'min_concurrency': settings.getint('ADAPTIVE_THROTTLE_MIN_CONCURRENCY', 1),
+        'max_concurrency': settings.getint('ADAPTIVE_THROTTLE_MAX_CONCURRENCY', 16),
+        'start_delay': settings.getfloat('DOWNLOAD_DELAY'),
+        'min_delay': settings.getfloat('ADAPTIVE_THROTTLE_MIN_DELAY', 0.05),
+        'max_delay': settings.getfloat('ADAPTIVE_THROTTLE_MAX_DELAY', 30.0),
+        'budget': settings.getint('ADAPTIVE_THROTTLE_BUDGET', 100),
+        'latency_tolerance': settings.getfloat('ADAPTIVE_THROTTLE_LATENCY_TOLERANCE', 2.0),
+        'max_retry_after': settings.getfloat('ADAPTIVE_THROTTLE_MAX_RETRY_AFTER', 600.0),
+    }
+
+
+def acquire_throttle(**kwargs):
+    """Returns the process-wide AdaptiveThrottle, creating it on first use."""
+    global _shared_throttle
+    with _shared_lock:
+        if _shared_throttle is None:
+            _shared_throttle = AdaptiveThrottle(**kwargs)
+        _shared_throttle.refs += 1
+        return _shared_throttle
+
+
+def release_throttle(throttle):
+    """Drops one reference; the last one discards the controller and its host states."""
+    global _shared_throttle
+    with _shared_lock:
+        throttle.refs -= 1
+        if throttle.refs <= 0 and _shared_throttle is throttle:
+            _shared_throttle = None
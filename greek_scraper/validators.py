@@ -0,0 +1,207 @@
+# greek_scraper/validators.py
+import hashlib
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from greek_scraper.dupefilters import HashSet
+from greek_scraper.frontier import hashset_key, url_fingerprint
+
+# Process-wide stores keyed by absolute database path, shared by every spider
+# of a multi-domain run.
+_shared_stores = {}
+_shared_lock = threading.Lock()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    fp INTEGER PRIMARY KEY,
+    url TEXT NOT NULL,
+    domain TEXT NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    content_hash BLOB,
+    checks INTEGER NOT NULL,
+    changes INTEGER NOT NULL,
+    priority INTEGER NOT NULL,
+    last_fetch REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS pages_revisit ON pages (domain, priority DESC, fp);
+"""
+
+# Revisit priority: smoothed fraction of fetches that found new content, 0-100.
+PRIORITY_SQL = "(100 * ({changes} + 1)) / ({checks} + 2)"
+
+
+def content_hash(body):
+    return hashlib.blake2b(body, digest_size=16).digest()
+
+
+class ValidatorStore:
+    """
+    Per-URL HTTP validators (ETag, Last-Modified), a hash of the last body
+    and how often the page changed, kept in SQLite across runs.
+
+    Like Frontier, writes are collected in memory and committed in batches by
+    a background thread, and the fingerprints of known URLs are kept in a
+    HashSet loaded on open: a URL the store never saw is answered without
+    touching the database. Lookups of known URLs go to a separate read
+    connection.
+    """
+
+    def __init__(self, path, flush_interval=1.0, flush_ops=5000):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.flush_ops = max(1, flush_ops)
+        self.refs = 0
+        self.last_error = None
+
+        self._write_conn = self._connect()  # Used only by the writer thread after this
+        self._write_conn.executescript(SCHEMA)
+        self._write_conn.commit()
+        self._read_conn = self._connect()
+        self._known = self._load_known()
+
+        self._lock = threading.Lock()
+        self._pending = {}  # fp -> row values, not yet handed to the writer
+        self._wakeup = queue.Queue()
+        self._closed = False
+
+        self._thread = threading.Thread(target=self._run, name='greek_scraper-validators', daemon=True)
+        self._thread.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def _load_known(self):
+        count = self._read_conn.execute('SELECT COUNT(*) FROM pages').fetchone()[0]
+        known = HashSet(capacity=max(1 << 16, count))
+        for (fp,) in self._read_conn.execute('SELECT fp FROM pages'):
+            known.add(hashset_key(fp))
+        return known
+
+    # ---- lookups (reactor thread) ----
+
+    def get(self, url):
+        """Returns (etag, last_modified, content_hash) from the last run, or None for a new URL."""
+        fp = url_fingerprint(url)
+        if hashset_key(fp) not in self._known:
+            return None
+        return self._read_conn.execute(
+            'SELECT etag, last_modified, content_hash FROM pages WHERE fp = ?', (fp,)).fetchone()
+
+    def revisit(self, domain, batch_size=1000):
+        """Yields (url, priority) for every known page of `domain`, most often changed first."""
+        # Keyset pagination on (priority, fp): no read transaction stays open between batches.
+        last = None
+        while True:
+            if last is None:
+                rows = self._read_conn.execute(
+                    'SELECT fp, url, priority FROM pages WHERE domain = ? '
+                    'ORDER BY priority DESC, fp LIMIT ?', (domain, batch_size)).fetchall()
+            else:
+                rows = self._read_conn.execute(
+                    'SELECT fp, url, priority FROM pages WHERE domain = ? '
+                    'AND (priority < ? OR (priority = ? AND fp > ?)) '
+                    'ORDER BY priority DESC, fp LIMIT ?',
+                    (domain, last[1], last[1], last[0], batch_size)).fetchall()
+            if not rows:
+                return
+            last = (rows[-1][0], rows[-1][2])
+            for _, url, priority in rows:
+                yield url, priority
+
+    # ---- updates (reactor thread, committed in the background) ----
+
+    def record(self, url, domain, etag=None, last_modified=None, body_hash=None, changed=True):
+        """
+        Records a fetch of `url`. `body_hash` None keeps the stored hash and
+        validators (a 304 carries no body).
+        """
+        entry = (url, domain, etag, last_modified, body_hash, int(changed), time.time())
+        fp = url_fingerprint(url)
+        self._known.add(hashset_key(fp))
+        with self._lock:
+            self._pending[fp] = entry
+            size = len(self._pending)
+        if size >= self.flush_ops:
+            self._wakeup.put(True)
+
+    def close(self):
+        """Commits everything still pending and closes the database."""
+        if self._closed:
+            return
+        self._closed = True
+        self._wakeup.put(None)
+        self._thread.join()
+        self._read_conn.close()
+
+    # ---- writer thread ----
+
+    def _run(self):
+        try:
+            while True:
+                try:
+                    stop = self._wakeup.get(timeout=self.flush_interval) is None
+                except queue.Empty:
+                    stop = False
+                self._commit()
+                if stop:
+                    return
+        finally:
+            self._write_conn.close()
+
+    def _commit(self):
+        with self._lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, {}
+        try:
+            with self._write_conn:
+                self._write_conn.executemany(
+                    'INSERT INTO pages (fp, url, domain, etag, last_modified, content_hash, checks, changes, '
+                    'priority, last_fetch) '
+                    f'VALUES (?, ?, ?, ?, ?, ?, 1, 0, {PRIORITY_SQL.format(checks=1, changes=0)}, ?) '
+                    'ON CONFLICT(fp) DO UPDATE SET '
+                    'etag = COALESCE(excluded.etag, CASE WHEN excluded.content_hash IS NULL THEN etag END), '
+                    'last_modified = COALESCE(excluded.last_modified, '
+                    'CASE WHEN excluded.content_hash IS NULL THEN last_modified END), '
+                    'content_hash = COALESCE(excluded.content_hash, content_hash), '
+                    'checks = checks + 1, '
+                    'changes = changes + ?, '
+                    f'priority = {PRIORITY_SQL.format(checks="checks + 1", changes="changes + ?")}, '
+                    'last_fetch = excluded.last_fetch',
+                    [(fp, url, domain, etag, last_modified, body_hash, fetched, changed, changed)
+                     for fp, (url, domain, etag, last_modified, body_hash, changed, fetched) in pending.items()],
+                )
+        except Exception as e:
+            self.last_error = e
+
+
+def acquire_validator_store(path, **kwargs):
+    """Returns the process-wide validator store for `path`, opening it on first use."""
+    key = os.path.abspath(path)
+    with _shared_lock:
+        store = _shared_stores.get(key)
+        if store is None or store._closed:
+            store = ValidatorStore(path, **kwargs)
+            _shared_stores[key] = store
+        store.refs += 1
+        return store
+
+
+def release_validator_store(store):
+    """Drops one reference; the last one commits and closes the store. Returns True if it closed."""
+    with _shared_lock:
+        store.refs -= 1
+        if store.refs > 0:
+            return False
+        key = os.path.abspath(store.path)
+        if _shared_stores.get(key) is store:
+            del _shared_stores[key]
+    store.close()
+    return True
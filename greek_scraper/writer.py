@@ -0,0 +1,178 @@
+# greek_scraper/writer.py
+import os
+import queue
+import threading
+import time
+from collections import Counter
+
+from greek_scraper.formats import open_sink
+
+# Process-wide writers keyed by absolute output path, shared by every spider
+# (and StoragePipeline) that writes to the same file.
+_shared_writers = {}
+_shared_lock = threading.Lock()
+
+
+class BufferedWriter:
+    """
+    Collects serialized records in memory and hands them in bulk to a dedicated
+    writer thread, so the reactor thread never touches the disk.
+
+    A chunk is handed over once `flush_items` records or `flush_bytes` bytes are
+    buffered, or `flush_interval` seconds have passed. At most `max_pending`
+    chunks wait for the writer thread; beyond that `write` returns False and the
+    caller should wait on `wait_for_space` (from a worker thread).
+
+    `fsync_interval` is the durability knob: None leaves syncing to the OS,
+    0 fsyncs after every chunk, N fsyncs at most every N seconds.
+
+    The on-disk format (plain/compressed JSONL or Parquet, optionally sharded)
+    is handled by the sink from `formats.open_sink`; `sink_options` go there.
+    """
+
+    def __init__(self, path, flush_items=500, flush_bytes=1 << 20, flush_interval=1.0,
+                 max_pending=64, fsync_interval=None, **sink_options):
+        self.path = path
+        self.flush_items = max(1, flush_items)
+        self.flush_bytes = max(1, flush_bytes)
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+
+        self.sink = open_sink(path, **sink_options)
+        self.items_written = 0
+        self.last_error = None
+        self.domain_counts = Counter()
+        self.refs = 0
+
+        self._lock = threading.Lock()
+        self._drain_lock = threading.Lock()
+        self._buffer = []
+        self._buffer_bytes = 0
+        self._stalled = []  # Chunks that did not fit into the queue, kept in order
+        self._queue = queue.Queue(maxsize=max(1, max_pending))
+        self._last_fsync = time.monotonic()
+        self._closed = False
+
+        self._thread = threading.Thread(target=self._run, name='greek_scraper-writer', daemon=True)
+        self._thread.start()
+
+    @property
+    def queue_depth(self):
+        return self._queue.qsize() + len(self._stalled)
+
+    @property
+    def closed(self):
+        return self._closed
+
+    @property
+    def bytes_written(self):
+        return self.sink.bytes_written
+
+    def serialize(self, item):
+        """Turns an item into a record for `write`, in the sink's format."""
+        return self.sink.serialize(item)
+
+    def write(self, data, domain=None):
+        """Buffers one serialized record. Returns False when the caller should back off."""
+        with self._lock:
+            if domain is not None:
+                self.domain_counts[domain] += 1
+            self._buffer.append(data)
+            self._buffer_bytes += self.sink.record_size(data)
+            if len(self._buffer) < self.flush_items and self._buffer_bytes < self.flush_bytes:
+                return not self._stalled
+            chunk = self._take_buffer()
+            if not self._stalled:
+                try:
+                    self._queue.put_nowait(chunk)
+                    return True
+                except queue.Full:
+                    pass
+            self._stalled.append(chunk)
+            return False
+
+    def wait_for_space(self):
+        """Blocks until every stalled chunk has been queued. Call from a worker thread."""
+        with self._drain_lock:
+            while True:
+                with self._lock:
+                    if not self._stalled:
+                        return
+                    chunk = self._stalled[0]
+                self._queue.put(chunk)
+                with self._lock:
+                    self._stalled.pop(0)
+
+    def close(self):
+        """Drains everything still buffered, stops the writer thread and closes the file."""
+        if self._closed:
+            return
+        with self._lock:
+            if self._buffer:
+                self._stalled.append(self._take_buffer())
+        self.wait_for_space()
+        self._queue.put(None)
+        self._thread.join()
+        self._closed = True
+        if self.fsync_interval is not None:
+            self.sink.sync()
+        self.sink.close()
+
+    def _take_buffer(self):
+        chunk = self._buffer
+        self._buffer = []
+        self._buffer_bytes = 0
+        return chunk
+
+    def _run(self):
+        while True:
+            try:
+                chunk = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                # Nothing came in for a whole interval: write out the partial buffer.
+                with self._lock:
+                    if self._stalled or not self._buffer:
+                        continue
+                    chunk = self._take_buffer()
+            if chunk is None:
+                return
+            self._write_chunk(chunk)
+
+    def _write_chunk(self, chunk):
+        try:
+            self.sink.write(chunk)
+            self.items_written += len(chunk)
+            if self.fsync_interval is not None:
+                now = time.monotonic()
+                if now - self._last_fsync >= self.fsync_interval:
+                    self.sink.sync()
+                    self._last_fsync = now
+            else:
+                self.sink.flush()
+        except Exception as e:
+            self.last_error = e
+
+
+def acquire_shared_writer(path, **kwargs):
+    """Returns the process-wide writer for `path`, opening it on first use."""
+    key = os.path.abspath(path)
+    with _shared_lock:
+        writer = _shared_writers.get(key)
+        if writer is None or writer.closed:
+            writer = BufferedWriter(path, **kwargs)
+            _shared_writers[key] = writer
+        writer.refs += 1
+        return writer
+
+
+def release_shared_writer(writer):
+    """Drops one reference; the last one drains and closes the writer. Returns True if it closed."""
+    with _shared_lock:
+        writer.refs -= 1
+        if writer.refs > 0:
+            return False
+        key = os.path.abspath(writer.path)
+        if _shared_writers.get(key) is writer:
+            del _shared_writers[key]
+    writer.close()
+    return True
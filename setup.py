@@ -22,7 +22,6 @@ setup(
     packages=find_packages(),
     install_requires=[
         "scrapy",
-        "cupy-cuda12x",
         "trafilatura",
         "tldextract",
         "beautifulsoup4",
@@ -61,6 +60,15 @@ setup(
         "python-dateutil",
     ],
     extras_require={
+        "gpu": [
+            "cupy-cuda12x",
+        ],
+        "zstd": [
+            "zstandard",
+        ],
+        "parquet": [
+            "pyarrow",
+        ],
         "dev": [
             "pytest",
             "flake8",
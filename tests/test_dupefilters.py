@@ -0,0 +1,58 @@
+import os
+
+from scrapy import Request
+
+from greek_scraper.dupefilters import CompactDupeFilter, HashSet, ScalableBloomFilter, url_hash
+
+
+def test_hashset_grows_and_keeps_its_members():
+    hashes = HashSet(capacity=16)
+    keys = [url_hash(f'http://a.gr/{i}') for i in range(1000)]
+    assert all(hashes.add(key) for key in keys)
+    assert not any(hashes.add(key) for key in keys)
+    assert len(hashes) == 1000 and all(key in hashes for key in keys)
+
+
+def test_scalable_bloom_filter_has_no_false_negatives():
+    bloom = ScalableBloomFilter(capacity=100, error_rate=0.01)
+    keys = [url_hash(f'http://a.gr/{i}') for i in range(1000)]
+    for key in keys:
+        bloom.add(key)
+    assert all(key in bloom for key in keys)
+
+
+def test_equivalent_urls_are_duplicates():
+    dupefilter = CompactDupeFilter()
+    assert not dupefilter.request_seen(Request('http://a.gr/p?b=2&a=1#top'))
+    assert dupefilter.request_seen(Request('http://A.gr/p?a=1&b=2'))
+    assert not dupefilter.request_seen(Request('http://a.gr/p?a=1&b=2', method='POST', body=b'x'))
+
+
+def test_filter_persists_across_runs(tmp_path):
+    path = str(tmp_path / 'seen.bin')
+    for mode in ('hashset', 'bloom'):
+        dupefilter = CompactDupeFilter(path=f'{path}.{mode}', mode=mode)
+        dupefilter.request_seen(Request('http://a.gr/'))
+        dupefilter.close('finished')
+        dupefilter = CompactDupeFilter(path=f'{path}.{mode}', mode=mode)
+        assert dupefilter.request_seen(Request('http://a.gr/'))
+        dupefilter.close('finished')
+
+
+def test_spiders_sharing_a_path_share_one_filter(tmp_path):
+    path = str(tmp_path / 'seen.bin')
+    first, second = CompactDupeFilter(path=path), CompactDupeFilter(path=path)
+    first.request_seen(Request('http://a.gr/'))
+    second.request_seen(Request('http://b.gr/'))
+    assert second.request_seen(Request('http://a.gr/'))
+
+    first.close('finished')
+    assert not os.path.exists(path)  # Written once, by the last one out
+    second.close('finished')
+
+    dupefilter = CompactDupeFilter(path=path)
+    try:
+        assert dupefilter.request_seen(Request('http://a.gr/'))
+        assert dupefilter.request_seen(Request('http://b.gr/'))
+    finally:
+        dupefilter.close('finished')
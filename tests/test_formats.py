@@ -0,0 +1,124 @@
+import gzip
+import json
+
+import pytest
+
+from greek_scraper.formats import detect_format, open_sink
+
+
+def read_manifest(tmp_path, name):
+    with open(tmp_path / f"{name}.manifest.json", encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_detect_format():
+    assert detect_format('out.jsonl') == 'jsonl'
+    assert detect_format('out.JSONL.GZ') == 'jsonl.gz'
+    assert detect_format('out.jsonl.zst') == 'jsonl.zst'
+    assert detect_format('out.parquet') == 'parquet'
+    assert detect_format('pipe:5') == 'pipe'
+
+
+def test_unknown_format_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        open_sink(str(tmp_path / 'out.csv'), output_format='csv')
+
+
+def test_jsonl_without_limits_appends_to_path(tmp_path):
+    path = tmp_path / 'out.jsonl'
+    path.write_text('{"url": "old"}\n', encoding='utf-8')
+    sink = open_sink(str(path))
+    sink.write([sink.serialize({'url': 'new', 'text': 'κείμενο'})])
+    sink.close()
+    lines = [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines()]
+    assert [line['url'] for line in lines] == ['old', 'new']
+    assert lines[1]['text'] == 'κείμενο'
+
+
+def test_jsonl_gz_shards_rotate_and_are_listed_in_the_manifest(tmp_path):
+    sink = open_sink(str(tmp_path / 'out.jsonl.gz'), shard_max_records=2)
+    for i in range(5):
+        sink.write([sink.serialize({'url': f'u{i}'})])
+    sink.close()
+
+    manifest = read_manifest(tmp_path, 'out')
+    assert manifest['records'] == 5
+    assert [s['records'] for s in manifest['shards']] == [2, 2, 1]
+    urls = []
+    for shard in manifest['shards']:
+        with gzip.open(tmp_path / shard['path'], 'rt', encoding='utf-8') as f:
+            urls += [json.loads(line)['url'] for line in f]
+    assert urls == [f'u{i}' for i in range(5)]
+
+
+def test_sharded_jsonl_continues_numbering_after_a_restart(tmp_path):
+    for run in range(2):
+        sink = open_sink(str(tmp_path / 'out.jsonl'), shard_max_records=10)
+        sink.write([sink.serialize({'url': f'run{run}'})])
+        sink.close()
+    manifest = read_manifest(tmp_path, 'out')
+    assert [s['path'] for s in manifest['shards']] == ['out-00000.jsonl', 'out-00001.jsonl']
+
+
+class TestParquet:
+    @pytest.fixture(autouse=True)
+    def pyarrow(self):
+        return pytest.importorskip('pyarrow')
+
+    def read_rows(self, tmp_path):
+        import pyarrow.parquet as pq
+        rows = []
+        for shard in read_manifest(tmp_path, 'out')['shards']:
+            rows += pq.read_table(tmp_path / shard['path']).to_pylist()
+        return rows
+
+    def test_columns_first_seen_in_a_later_row_of_a_group_are_kept(self, tmp_path):
+        sink = open_sink(str(tmp_path / 'out.parquet'), row_group_size=10)
+        sink.write([
+            {'url': 'a', 'text': 'x', 'links': []},
+            {'url': 'b', 'text': 'x', 'links': [], 'duplicate': 'near', 'duplicate_of': 'a'},
+            {'url': 'c', 'text': 'y', 'links': ['l'], 'extra': 3},
+        ])
+        sink.close()
+        rows = self.read_rows(tmp_path)
+        assert rows[1]['duplicate'] == 'near' and rows[1]['duplicate_of'] == 'a'
+        assert rows[0]['duplicate'] is None
+        assert [row['extra'] for row in rows] == [None, None, 3]
+
+    def test_columns_first_seen_in_a_later_group_start_a_new_shard(self, tmp_path):
+        sink = open_sink(str(tmp_path / 'out.parquet'), row_group_size=2)
+        sink.write([{'url': 'a', 'text': 'x', 'links': []}, {'url': 'b', 'text': 'y', 'links': []}])
+        sink.write([{'url': 'c', 'text': 'z', 'links': [], 'duplicate': 'exact', 'duplicate_of': 'a'},
+                    {'url': 'd', 'text': 'w', 'links': []}])
+        sink.close()
+        assert len(read_manifest(tmp_path, 'out')['shards']) == 2
+        rows = self.read_rows(tmp_path)
+        assert [row['url'] for row in rows] == ['a', 'b', 'c', 'd']
+        assert rows[2]['duplicate_of'] == 'a'
+
+    def test_a_column_that_was_all_null_takes_its_first_real_type(self, tmp_path):
+        sink = open_sink(str(tmp_path / 'out.parquet'), row_group_size=1)
+        sink.write([{'url': 'a', 'text': '', 'links': [], 'title': None}])
+        sink.write([{'url': 'b', 'text': 'x', 'links': [], 'title': 'Τίτλος'}])
+        sink.close()
+        assert [row['title'] for row in self.read_rows(tmp_path)] == [None, 'Τίτλος']
+
+    def test_known_fields_keep_fixed_types(self, tmp_path):
+        import pyarrow.parquet as pq
+        sink = open_sink(str(tmp_path / 'out.parquet'), row_group_size=2)
+        sink.write([{'url': 'a', 'text': None, 'links': []}, {'url': 'b', 'text': None, 'links': []}])
+        sink.close()
+        shard = read_manifest(tmp_path, 'out')['shards'][0]['path']
+        schema = pq.read_schema(tmp_path / shard)
+        assert str(schema.field('text').type) == 'string'
+        assert str(schema.field('links').type) == 'list<element: string>'
+
+
+def test_sinks_must_report_their_open_shard_size(tmp_path):
+    from greek_scraper.formats import ShardedSink
+
+    class NoSize(ShardedSink):
+        output_format = 'jsonl'
+
+    with pytest.raises(TypeError):
+        NoSize(str(tmp_path / 'out.jsonl'))
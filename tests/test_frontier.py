@@ -0,0 +1,110 @@
+import pytest
+
+from greek_scraper.frontier import (DOMAIN_ACTIVE, DOMAIN_FINISHED, DONE, FAILED, QUEUED, Frontier,
+                                    acquire_frontier, hashset_key, release_frontier, url_fingerprint)
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'frontier.db')
+
+
+def test_hashset_key_is_unsigned_and_never_zero():
+    assert hashset_key(0) == 1
+    assert hashset_key(-1) == 0xFFFFFFFFFFFFFFFF
+    assert hashset_key(url_fingerprint('http://a.gr/')) == url_fingerprint('http://a.gr/') & 0xFFFFFFFFFFFFFFFF
+
+
+def test_add_is_deduplicated_and_answered_before_commit(path):
+    frontier = Frontier(path, flush_interval=60)
+    try:
+        assert frontier.add('http://a.gr/1', 'a.gr')
+        assert not frontier.add('http://a.gr/1', 'a.gr')
+        assert frontier.seen('http://a.gr/1') and not frontier.seen('http://a.gr/2')
+        assert frontier.state('http://a.gr/1') == QUEUED
+        frontier.mark('http://a.gr/1', 'a.gr', DONE)
+        assert frontier.state('http://a.gr/1') == DONE
+    finally:
+        frontier.close()
+
+
+def test_unknown_urls_are_answered_without_the_database(path):
+    frontier = Frontier(path)
+    try:
+        frontier._read_conn.close()  # Any query would now raise
+        assert frontier.state('http://a.gr/never-seen') is None
+        assert not frontier.seen('http://a.gr/never-seen')
+    finally:
+        frontier._read_conn = frontier._connect()
+        frontier.close()
+
+
+def test_a_reopened_frontier_resumes_where_it_stopped(path):
+    frontier = Frontier(path)
+    frontier.add('http://a.gr/', 'a.gr')
+    frontier.add('http://a.gr/1', 'a.gr', depth=1)
+    frontier.add('http://a.gr/2', 'a.gr', depth=1)
+    frontier.add('http://b.gr/', 'b.gr')
+    frontier.mark('http://a.gr/', 'a.gr', DONE)
+    frontier.mark('http://a.gr/2', 'a.gr', FAILED, depth=1)
+    frontier.mark_domain('a.gr', DOMAIN_ACTIVE)
+    frontier.mark_domain('b.gr', DOMAIN_FINISHED)
+    frontier.close()
+
+    frontier = Frontier(path)
+    try:
+        assert frontier.last_error is None
+        assert not frontier.add('http://a.gr/1', 'a.gr')  # Still known after the restart
+        assert frontier.state('http://a.gr/') == DONE
+        assert frontier.state('http://a.gr/2') == FAILED
+        assert list(frontier.queued('a.gr')) == [('http://a.gr/1', 1)]
+        assert frontier.queued_counts() == {'a.gr': 1, 'b.gr': 1}
+        assert frontier.counts() == {QUEUED: 2, DONE: 1, FAILED: 1}
+        assert frontier.domain_state('a.gr') == DOMAIN_ACTIVE
+        assert frontier.domain_state('b.gr') == DOMAIN_FINISHED
+        assert frontier.domain_state('c.gr') is None
+    finally:
+        frontier.close()
+
+
+def test_a_late_add_does_not_requeue_a_finished_url(path):
+    frontier = Frontier(path)
+    frontier.mark('http://a.gr/', 'a.gr', DONE)
+    frontier.close()
+    frontier = Frontier(path)
+    frontier._known = type(frontier._known)()  # As if another process had written the row
+    frontier.add('http://a.gr/', 'a.gr')
+    frontier.close()
+
+    frontier = Frontier(path)
+    try:
+        assert frontier.state('http://a.gr/') == DONE
+    finally:
+        frontier.close()
+
+
+def test_queued_pages_through_every_url(path):
+    frontier = Frontier(path)
+    urls = {f'http://a.gr/{i}' for i in range(25)}
+    for url in urls:
+        frontier.add(url, 'a.gr')
+    frontier.close()
+    frontier = Frontier(path)
+    try:
+        assert {url for url, _ in frontier.queued(batch_size=4)} == urls
+    finally:
+        frontier.close()
+
+
+def test_spiders_share_one_frontier_per_path(path):
+    first = acquire_frontier(path)
+    second = acquire_frontier(path)
+    assert first is second
+    first.add('http://a.gr/', 'a.gr')
+    assert not release_frontier(first)
+    assert release_frontier(second)
+    third = acquire_frontier(path)
+    try:
+        assert third is not first and third.seen('http://a.gr/')
+    finally:
+        release_frontier(third)
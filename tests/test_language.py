@@ -0,0 +1,64 @@
+from greek_scraper.language import LanguageDetector, greek_ratio
+
+GREEK = 'Η ελληνική γλώσσα είναι μία από τις αρχαιότερες γλώσσες του κόσμου. ' * 20
+ENGLISH = 'The quick brown fox jumps over the lazy dog near the river bank. ' * 20
+LONG_HEAD = ('<style>' + '.menu-item a { color: #333; text-decoration: none; } ' * 300 + '</style>'
+             + '<script>' + 'window.dataLayer = window.dataLayer || []; function gtag(){} ' * 250 + '</script>')
+
+
+def page(body, lang=None, head=''):
+    lang_attr = f' lang="{lang}"' if lang else ''
+    return f'<!DOCTYPE html><html{lang_attr}><head><title>t</title>{head}</head><body><p>{body}</p></body></html>'
+
+
+def test_greek_ratio_ignores_markup_scripts_and_styles():
+    ratio, letters = greek_ratio('<div class="content"><script>var x = "abc";</script><p>αβγ</p></div>')
+    assert ratio == 1.0 and letters == 3
+
+
+def test_greek_ratio_ignores_unterminated_script_and_style():
+    assert greek_ratio('<p>αβγδ</p><script>var analytics = function () { track')[0] == 1.0
+    assert greek_ratio('<p>αβγδ</p><style>.menu a { color: red')[0] == 1.0
+    assert greek_ratio('<p>αβγδ</p><a href="https://example.com/path')[0] == 1.0
+
+
+def test_greek_and_english_pages():
+    detector = LanguageDetector()
+    assert detector.is_greek(page(GREEK, lang='el'))
+    assert not detector.is_greek(page(ENGLISH, lang='en'))
+
+
+def test_long_inline_head_does_not_hide_a_greek_body():
+    html = page(GREEK, lang='el', head=LONG_HEAD)
+    assert len(LONG_HEAD) > 20000
+    assert LanguageDetector(sample_chars=20000).is_greek(html)
+
+
+def test_sample_ending_inside_a_script_in_the_body():
+    html = page(GREEK + '<script>' + 'var tracking = {enabled: true, id: "UA-1"}; ' * 1000, lang='el')
+    assert LanguageDetector(sample_chars=5000).is_greek(html)
+
+
+def test_short_pages_fall_back_to_the_lang_attribute():
+    detector = LanguageDetector()
+    assert not detector.is_greek(page('Contact us', lang='en'))
+    assert detector.is_greek(page('Contact', lang='el'))
+    assert detector.is_greek(page('Contact'))  # No way to tell: kept
+
+
+def test_subtrees_are_pruned_after_repeated_non_greek_pages_and_recover():
+    detector = LanguageDetector(subtree_min_pages=3, subtree_max_ratio=0.8)
+    for i in range(3):
+        detector.record(f'http://site.gr/en/page{i}', greek=False)
+    assert detector.is_pruned('http://site.gr/en/other')
+    assert not detector.is_pruned('http://site.gr/el/page')
+    assert not detector.is_pruned('http://site.gr/index.html')
+
+    for i in range(2):
+        detector.record(f'http://site.gr/en/greek{i}', greek=True)
+    assert not detector.is_pruned('http://site.gr/en/other')
+
+
+def test_root_files_share_the_root_subtree():
+    assert LanguageDetector.subtree('http://Site.gr/index.html') == ('site.gr', '')
+    assert LanguageDetector.subtree('http://site.gr/EN/a/b') == ('site.gr', 'en')
@@ -0,0 +1,36 @@
+from scrapy.http import HtmlResponse
+
+from greek_scraper.middlewares import RobustEncodingMiddleware
+
+GREEK = 'Καλημέρα κόσμε, αυτή είναι μια δοκιμαστική σελίδα.'
+
+
+def response(body, url='http://site.gr/page', content_type='text/html'):
+    return HtmlResponse(url, body=body, headers={'Content-Type': content_type})
+
+
+def test_declared_charset_wins():
+    middleware = RobustEncodingMiddleware()
+    result = middleware._process_response(response(GREEK.encode('iso8859-7'),
+                                                   content_type='text/html; charset=iso-8859-7'))
+    assert result.text == GREEK
+
+
+def test_ascii_pages_are_utf8():
+    middleware = RobustEncodingMiddleware()
+    assert middleware._process_response(response(b'<p>hello</p>')).encoding == 'utf-8'
+
+
+def test_utf8_pages_are_not_read_with_a_cached_single_byte_encoding():
+    middleware = RobustEncodingMiddleware()
+    middleware.host_encodings['site.gr'] = 'iso8859-7'  # An earlier legacy page from the same host
+    result = middleware._process_response(response(f'<p>{GREEK}</p>'.encode('utf-8')))
+    assert result.encoding == 'utf-8' and GREEK in result.text
+    assert middleware.host_encodings['site.gr'] == 'iso8859-7'
+
+
+def test_cached_encoding_is_used_when_utf8_fails():
+    middleware = RobustEncodingMiddleware()
+    middleware.host_encodings['site.gr'] = 'iso8859-7'
+    result = middleware._process_response(response(f'<p>{GREEK}</p>'.encode('iso8859-7')))
+    assert GREEK in result.text
@@ -0,0 +1,123 @@
+import sqlite3
+import time
+
+import pytest
+
+from greek_scraper.shards import ShardQueue, _worker_options, shard_of, shard_path
+
+DOMAINS = [f'site{i}.gr' for i in range(40)]
+
+
+@pytest.fixture
+def queue(tmp_path):
+    q = ShardQueue(str(tmp_path / 'q.db'), lease_timeout=60)
+    yield q
+    q.close()
+
+
+def test_shard_of_is_stable_and_case_insensitive():
+    assert shard_of('Example.GR ', 8) == shard_of('example.gr', 8)
+    assert {shard_of(d, 4) for d in DOMAINS} == {0, 1, 2, 3}
+
+
+def test_shard_path():
+    assert shard_path('out/data.jsonl.gz', 3) == 'out/data-shard03.jsonl.gz'
+    assert shard_path(None, 3) is None
+
+
+def test_worker_options_give_every_worker_its_own_files():
+    options = _worker_options({'metrics_port': 9000, 'frontier_path': 'crawl.db', 'validators_path': 'v.db',
+                               'metrics_file': None}, 2)
+    assert options == {'metrics_port': 9002, 'frontier_path': 'crawl-shard02.db',
+                       'validators_path': 'v-shard02.db', 'metrics_file': None, 'profile_file': None}
+
+
+def test_queue_uses_a_rollback_journal(queue):
+    conn = sqlite3.connect(queue.path)
+    try:
+        assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'delete'
+    finally:
+        conn.close()
+
+
+def test_add_is_idempotent(queue):
+    assert queue.add(DOMAINS, 4) == len(DOMAINS)
+    assert queue.add(DOMAINS + ['new.gr'], 4) == 1
+    assert queue.remaining() == len(DOMAINS) + 1
+
+
+def test_workers_claim_their_own_shard_first(queue):
+    queue.add(DOMAINS, 2)
+    queue.register('w0', 0)
+    queue.register('w1', 1)
+    claimed = queue.claim('w0', 0, 100)
+    assert claimed and all(shard_of(d, 2) == 0 for d in claimed)
+    assert queue.remaining(shard=1) == len(DOMAINS) - len(claimed)
+
+
+def test_shards_without_a_live_worker_are_taken_over(queue):
+    queue.add(DOMAINS, 2)
+    queue.register('w0', 0)
+    claimed = queue.claim('w0', 0, 100)
+    assert len(claimed) == len(DOMAINS)  # Nobody serves shard 1
+
+
+def test_finished_domains_are_not_handed_out_again(queue):
+    queue.add(DOMAINS, 1)
+    queue.register('w0', 0)
+    first = queue.claim('w0', 0, 5)
+    for domain in first:
+        queue.finish('w0', domain, ok=True)
+    queue.retire('w0')
+    queue.register('w1', 0)
+    rest = queue.claim('w1', 0, 100)
+    assert not set(first) & set(rest)
+    assert queue.summary()['domains']['done'] == 5
+
+
+def test_a_released_worker_s_domains_are_queued_again(queue):
+    queue.add(DOMAINS[:3], 1)
+    queue.register('w0', 0)
+    claimed = queue.claim('w0', 0, 3)
+    queue.release('w0')
+    queue.register('w1', 0)
+    assert sorted(queue.claim('w1', 0, 3)) == sorted(claimed)
+
+
+def test_expired_leases_are_reclaimed_and_late_finishes_ignored(tmp_path):
+    queue = ShardQueue(str(tmp_path / 'q.db'), lease_timeout=0.05)
+    try:
+        queue.add(['a.gr'], 1)
+        queue.register('w0', 0)
+        assert queue.claim('w0', 0, 1) == ['a.gr']
+        time.sleep(0.1)  # w0 stops heartbeating
+        queue.register('w1', 0)
+        assert queue.claim('w1', 0, 1) == ['a.gr']
+        queue.finish('w0', 'a.gr', ok=True)  # The lease is w1's now
+        assert queue.summary()['domains']['claimed'] == 1
+    finally:
+        queue.close()
+
+
+def test_domains_fail_after_max_attempts(tmp_path):
+    queue = ShardQueue(str(tmp_path / 'q.db'), max_attempts=2)
+    try:
+        queue.add(['a.gr'], 1)
+        for attempt in range(2):
+            queue.register(f'w{attempt}', 0)
+            assert queue.claim(f'w{attempt}', 0, 1) == ['a.gr']
+            queue.release(f'w{attempt}')
+        assert queue.summary()['domains']['failed'] == 1
+        assert queue.remaining() == 0
+    finally:
+        queue.close()
+
+
+def test_summary_sums_worker_stats(queue):
+    queue.register('w0', 0)
+    queue.register('w1', 1)
+    queue.heartbeat('w0', {'pages': 10, 'items': 4})
+    queue.retire('w1', {'pages': 5, 'items': 1})
+    summary = queue.summary()
+    assert summary['totals'] == {'pages': 15, 'items': 5}
+    assert [w['alive'] for w in summary['workers']] == [True, False]
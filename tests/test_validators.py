@@ -0,0 +1,64 @@
+import pytest
+
+from greek_scraper.validators import ValidatorStore, content_hash
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'validators.db')
+
+
+def test_validators_survive_a_reopen(path):
+    store = ValidatorStore(path)
+    store.record('http://a.gr/1', 'a.gr', etag='"x"', last_modified='Mon, 01 Jan 2024 00:00:00 GMT',
+                 body_hash=content_hash(b'one'))
+    assert store.get('http://a.gr/2') is None
+    store.close()
+
+    store = ValidatorStore(path)
+    try:
+        assert store.get('http://a.gr/1') == ('"x"', 'Mon, 01 Jan 2024 00:00:00 GMT', content_hash(b'one'))
+        assert store.get('http://a.gr/2') is None
+    finally:
+        store.close()
+
+
+def test_unknown_urls_are_answered_without_the_database(path):
+    store = ValidatorStore(path)
+    try:
+        store._read_conn.close()  # Any query would now raise
+        assert store.get('http://a.gr/never-seen') is None
+    finally:
+        store._read_conn = store._connect()
+        store.close()
+
+
+def test_a_304_keeps_the_stored_validators_and_hash(path):
+    store = ValidatorStore(path)
+    store.record('http://a.gr/1', 'a.gr', etag='"x"', body_hash=content_hash(b'one'))
+    store.close()
+    store = ValidatorStore(path)
+    store.record('http://a.gr/1', 'a.gr', changed=False)
+    store.close()
+
+    store = ValidatorStore(path)
+    try:
+        assert store.get('http://a.gr/1') == ('"x"', None, content_hash(b'one'))
+    finally:
+        store.close()
+
+
+def test_pages_that_change_often_are_revisited_first(path):
+    store = ValidatorStore(path)
+    for run in range(3):
+        store.record('http://a.gr/news', 'a.gr', body_hash=content_hash(b'%d' % run), changed=True)
+        store.record('http://a.gr/about', 'a.gr', body_hash=content_hash(b'same'), changed=run == 0)
+        store._commit()
+    store.record('http://b.gr/', 'b.gr', body_hash=content_hash(b'b'))
+    store.close()
+
+    store = ValidatorStore(path)
+    try:
+        assert [url for url, _ in store.revisit('a.gr', batch_size=1)] == ['http://a.gr/news', 'http://a.gr/about']
+    finally:
+        store.close()